@@ -0,0 +1,25 @@
+"""esquema inicial
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+As tabelas são criadas por init_db.py (Base.metadata.create_all). Esta revisão
+marca esse ponto de partida: em bancos já existentes rode `alembic stamp 0001`
+antes do primeiro `alembic upgrade head`.
+"""
+from collections.abc import Sequence
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    pass
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,65 @@
+"""índices para os filtros dos repositories
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Índices compostos/parciais declarados também em app/model/model.py (create_all os
+cria em bancos novos, por isso IF NOT EXISTS) e índices trigram, apenas no Postgres,
+para as buscas ilike '%x%'.
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: str | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# (nome, tabela, colunas, predicado do índice parcial por dialeto)
+INDICES = [
+    ("ix_reservas_carro_status_periodo", "reservas", '"carroId", status, "dataRetirada", "dataDevolucao"', None),
+    ("ix_reservas_cliente", "reservas", '"clienteId"', None),
+    ("ix_reservas_status_retirada", "reservas", 'status, "dataRetirada"', None),
+    ("ix_avaliacoes_carro", "avaliacoes", '"carroId"', None),
+    ("ix_avaliacoes_cliente", "avaliacoes", '"clienteId"', None),
+    ("ix_avaliacoes_nota", "avaliacoes", "nota", None),
+    ("ix_metricas_dashboard_tipo", "metricas", '"dashboardId", tipo', None),
+    ("ix_carros_localizacao", "carros", '"localizacaoId"', None),
+    ("ix_carros_disponivel_parcial", "carros", '"localizacaoId", categoria',
+     {"postgresql": "disponivel IS true", "sqlite": "disponivel IS 1"}),
+    ("ix_carros_destaque_parcial", "carros", "id",
+     {"postgresql": "destaque IS true", "sqlite": "destaque IS 1"}),
+]
+
+# Atendem ilike '%x%' (find_by_marca, find_by_nome, find_by_cargo, find_by_tipo)
+INDICES_TRIGRAM = [
+    ("ix_carros_marca_trgm", "carros", "marca"),
+    ("ix_carros_modelo_trgm", "carros", "modelo"),
+    ("ix_localizacoes_nome_trgm", "localizacoes", "nome"),
+    ("ix_admins_cargo_trgm", "admins", "cargo"),
+    ("ix_metricas_tipo_trgm", "metricas", "tipo"),
+]
+
+
+def upgrade() -> None:
+    dialeto = op.get_context().dialect.name
+    for nome, tabela, colunas, predicados in INDICES:
+        where = f" WHERE {predicados[dialeto]}" if predicados and dialeto in predicados else ""
+        op.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({colunas}){where}")
+
+    if dialeto == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for nome, tabela, coluna in INDICES_TRIGRAM:
+            op.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} USING gin ({coluna} gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        for nome, _, _ in INDICES_TRIGRAM:
+            op.execute(f"DROP INDEX IF EXISTS {nome}")
+    for nome, _, _, _ in INDICES:
+        if nome != "ix_reservas_carro_status_periodo":  # criado junto com a verificação de sobreposição
+            op.execute(f"DROP INDEX IF EXISTS {nome}")
@@ -0,0 +1,78 @@
+"""busca textual de carros e localizações
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Postgres: índices GIN de tsvector ('portuguese') e trigram sobre as mesmas
+expressões usadas em app/busca/repository.py. SQLite: tabelas FTS5 de conteúdo
+externo mantidas por triggers (as mesmas que create_all cria em bancos novos).
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: str | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+DOCUMENTO_CARROS = (
+    "coalesce(marca, '') || ' ' || coalesce(modelo, '') || ' ' || "
+    "coalesce(categoria, '') || ' ' || coalesce(descricao, '')"
+)
+TITULO_CARROS = "coalesce(marca, '') || ' ' || coalesce(modelo, '')"
+DOCUMENTO_LOCALIZACOES = "coalesce(nome, '') || ' ' || coalesce(endereco, '')"
+
+INDICES_POSTGRES = [
+    ("ix_carros_busca_tsv", "carros", f"to_tsvector('portuguese', {DOCUMENTO_CARROS})", ""),
+    ("ix_carros_titulo_trgm", "carros", f"({TITULO_CARROS})", " gin_trgm_ops"),
+    ("ix_localizacoes_busca_tsv", "localizacoes", f"to_tsvector('portuguese', {DOCUMENTO_LOCALIZACOES})", ""),
+]
+
+TABELAS_FTS = {
+    "carros": ("marca", "modelo", "categoria", "descricao"),
+    "localizacoes": ("nome", "endereco"),
+}
+
+
+def ddl_fts5(tabela: str, colunas: tuple[str, ...]) -> list[str]:
+    fts = f"{tabela}_fts"
+    lista = ", ".join(colunas)
+    novos = ", ".join(f"new.{coluna}" for coluna in colunas)
+    antigos = ", ".join(f"old.{coluna}" for coluna in colunas)
+    remover = f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {antigos});"
+    inserir = f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({lista}, content='{tabela}', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN {inserir} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN {remover} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {tabela} BEGIN {remover} {inserir} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def upgrade() -> None:
+    dialeto = op.get_context().dialect.name
+    if dialeto == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for nome, tabela, expressao, operador in INDICES_POSTGRES:
+            op.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} USING gin (({expressao}){operador})")
+    elif dialeto == "sqlite":
+        for tabela, colunas in TABELAS_FTS.items():
+            for sql in ddl_fts5(tabela, colunas):
+                op.execute(sql)
+
+
+def downgrade() -> None:
+    dialeto = op.get_context().dialect.name
+    if dialeto == "postgresql":
+        for nome, _, _, _ in INDICES_POSTGRES:
+            op.execute(f"DROP INDEX IF EXISTS {nome}")
+    elif dialeto == "sqlite":
+        for tabela in TABELAS_FTS:
+            for sufixo in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {tabela}_fts_{sufixo}")
+            op.execute(f"DROP TABLE IF EXISTS {tabela}_fts")
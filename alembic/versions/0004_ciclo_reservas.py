@@ -0,0 +1,34 @@
+"""índices das varreduras do ciclo de vida das reservas
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+(status, criadoEm) atende a expiração das pendentes e (status, dataDevolucao) a
+conclusão das confirmadas (app/reservas/ciclo.py). Declarados também em
+app/model/model.py, por isso IF NOT EXISTS.
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: str | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDICES = [
+    ("ix_reservas_status_criado", "reservas", 'status, "criadoEm"'),
+    ("ix_reservas_status_devolucao", "reservas", 'status, "dataDevolucao"'),
+]
+
+
+def upgrade() -> None:
+    for nome, tabela, colunas in INDICES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({colunas})")
+
+
+def downgrade() -> None:
+    for nome, _, _ in INDICES:
+        op.execute(f"DROP INDEX IF EXISTS {nome}")
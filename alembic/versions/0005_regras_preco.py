@@ -0,0 +1,51 @@
+"""regras de preço
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Tabela lida pelo motor de preços (app/precos/motor.py). Bancos criados por
+init_db.py já a têm (create_all), por isso a verificação antes de criar.
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: str | None = "0004"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+TIPOS = ("SAZONAL", "FIM_DE_SEMANA", "LONGA_DURACAO", "TAXA_DEVOLUCAO")
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("regras_preco"):
+        return
+    op.create_table(
+        "regras_preco",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nome", sa.String(200), nullable=False),
+        sa.Column("tipo", sa.Enum(*TIPOS, name="tiporegrapreco"), nullable=False),
+        sa.Column("categoria", sa.String(100), nullable=True),
+        sa.Column("localizacaoId", sa.Integer(), sa.ForeignKey("localizacoes.id"), nullable=True),
+        sa.Column("inicio", sa.Date(), nullable=True),
+        sa.Column("fim", sa.Date(), nullable=True),
+        sa.Column("multiplicador", sa.Float(), nullable=False),
+        sa.Column("valorFixo", sa.Float(), nullable=False),
+        sa.Column("diasMinimos", sa.Integer(), nullable=True),
+        sa.Column("ativa", sa.Boolean(), nullable=False),
+        sa.Column("criadoEm", sa.DateTime(), nullable=False),
+        sa.Column("atualizadoEm", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_regras_preco_id", "regras_preco", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_regras_preco_id", table_name="regras_preco")
+    op.drop_table("regras_preco")
+    if op.get_context().dialect.name == "postgresql":
+        op.execute("DROP TYPE IF EXISTS tiporegrapreco")
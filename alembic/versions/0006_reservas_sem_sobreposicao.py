@@ -0,0 +1,42 @@
+"""restrição de exclusão contra reservas sobrepostas (Postgres)
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+EXCLUDE USING gist sobre ("carroId", tsrange(dataRetirada, dataDevolucao)) para as
+reservas pendentes e confirmadas: duas transações concorrentes não conseguem gravar
+períodos sobrepostos para o mesmo carro. Requer btree_gist. Falha se o banco já tiver
+sobreposições; resolva-as (cancelando uma das reservas) antes de aplicar.
+
+No SQLite a proteção é o INSERT ... SELECT ... WHERE NOT EXISTS de
+ReservasService.criar, atômico sob o lock de escrita do banco.
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: str | None = "0005"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+RESTRICAO = "reservas_sem_sobreposicao"
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(f"ALTER TABLE reservas DROP CONSTRAINT IF EXISTS {RESTRICAO}")
+    op.execute(
+        f'ALTER TABLE reservas ADD CONSTRAINT {RESTRICAO} EXCLUDE USING gist '
+        '("carroId" WITH =, tsrange("dataRetirada", "dataDevolucao") WITH &&) '
+        "WHERE (status IN ('PENDENTE', 'CONFIRMADA'))"
+    )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == "postgresql":
+        op.execute(f"ALTER TABLE reservas DROP CONSTRAINT IF EXISTS {RESTRICAO}")
@@ -0,0 +1,55 @@
+"""tabelas de agregados: resumo das avaliações e rollup diário das reservas
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+avaliacoes_resumo (gravada a cada escrita de avaliação) e rollup_reservas_diario
+(gravada a cada mudança de status das reservas). Bancos marcados com `alembic stamp
+0001` depois de um create_all antigo podem já tê-las, por isso a verificação antes de
+criar. As tabelas nascem vazias: rode `python backfill_rollups.py` em seguida para
+calculá-las a partir do histórico.
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: str | None = "0006"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    inspetor = sa.inspect(op.get_bind())
+    if not inspetor.has_table("avaliacoes_resumo"):
+        op.create_table(
+            "avaliacoes_resumo",
+            sa.Column("carroId", sa.Integer(), sa.ForeignKey("carros.id"), primary_key=True),
+            sa.Column("total", sa.Integer(), nullable=False),
+            sa.Column("soma", sa.Integer(), nullable=False),
+            sa.Column("nota1", sa.Integer(), nullable=False),
+            sa.Column("nota2", sa.Integer(), nullable=False),
+            sa.Column("nota3", sa.Integer(), nullable=False),
+            sa.Column("nota4", sa.Integer(), nullable=False),
+            sa.Column("nota5", sa.Integer(), nullable=False),
+            sa.Column("atualizadoEm", sa.DateTime(), nullable=False),
+        )
+    if not inspetor.has_table("rollup_reservas_diario"):
+        op.create_table(
+            "rollup_reservas_diario",
+            sa.Column("dia", sa.Date(), primary_key=True),
+            sa.Column("localizacaoId", sa.Integer(), sa.ForeignKey("localizacoes.id"), primary_key=True),
+            sa.Column("categoria", sa.String(100), primary_key=True),
+            sa.Column("receita", sa.Float(), nullable=False),
+            sa.Column("reservas", sa.Integer(), nullable=False),
+            sa.Column("carroDias", sa.Float(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("rollup_reservas_diario")
+    op.drop_table("avaliacoes_resumo")
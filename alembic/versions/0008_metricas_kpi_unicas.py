@@ -0,0 +1,33 @@
+"""índice único das métricas de KPI por dashboard e nome
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Alvo do INSERT ... ON CONFLICT de KpisService.persistir_snapshot: snapshots
+concorrentes de vários processos não duplicam métricas. Duplicatas já gravadas são
+removidas antes, mantendo a mais recente (maior id) de cada (dashboardId, nome).
+"""
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: str | None = "0007"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDICE = "uq_metricas_kpi"
+
+
+def upgrade() -> None:
+    op.execute(
+        "DELETE FROM metricas WHERE tipo = 'kpi' AND id NOT IN "
+        "(SELECT MAX(id) FROM metricas WHERE tipo = 'kpi' GROUP BY \"dashboardId\", nome)"
+    )
+    op.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {INDICE} ON metricas (\"dashboardId\", nome) WHERE tipo = 'kpi'")
+
+
+def downgrade() -> None:
+    op.execute(f"DROP INDEX IF EXISTS {INDICE}")
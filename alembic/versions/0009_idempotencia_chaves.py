@@ -0,0 +1,38 @@
+"""chaves de idempotência compartilhadas entre os workers
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+Respostas guardadas dos POST com Idempotency-Key (app/idempotencia.py). A chave
+primária garante uma única execução por chave mesmo com vários workers.
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: str | None = "0008"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "idempotencia_chaves",
+        sa.Column("chave", sa.String(64), primary_key=True),
+        sa.Column("digest", sa.String(64), nullable=False),
+        sa.Column("status", sa.Integer(), nullable=True),
+        sa.Column("cabecalhos", sa.Text(), nullable=True),
+        sa.Column("corpo", sa.LargeBinary(), nullable=True),
+        sa.Column("criadoEm", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_idempotencia_chaves_criado", "idempotencia_chaves", ["criadoEm"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotencia_chaves_criado", table_name="idempotencia_chaves")
+    op.drop_table("idempotencia_chaves")
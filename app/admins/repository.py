@@ -1,14 +1,36 @@
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..model.model import Admin
-from ..security import verify_password
+from ..pagination import Page, PageParams, paginate
+from ..repository import AsyncRepository, BaseRepository
+from ..security import verify_and_update_password
 
 
-class AdminsRepository:
+class AdminsRepository(BaseRepository):
+    model = Admin
+    nao_encontrado = "Admin não encontrado"
+
+    FILTROS = {"email": Admin.email, "cargo": Admin.cargo}
+    ORDENACOES = {"id": Admin.id, "criadoEm": Admin.criadoEm}
+    # Sem senha: o hash nunca sai da camada de banco nas listagens
+    COLUNAS_LISTAGEM = (
+        Admin.id, Admin.nome, Admin.email, Admin.telefone, Admin.cargo,
+        Admin.dataCadastro, Admin.criadoEm, Admin.atualizadoEm,
+    )
+
     @staticmethod
-    def find_all(database: Session) -> list[Admin]:
-        '''Função para fazer uma query de todos os admins da DB'''
-        return database.query(Admin).all()
+    def find_all(database: Session, params: PageParams) -> Page:
+        '''Função para fazer uma query paginada por cursor de todos os admins da DB'''
+        return paginate(
+            database,
+            AdminsRepository.projecao(),
+            params,
+            id_coluna=Admin.id,
+            ordenacoes=AdminsRepository.ORDENACOES,
+            filtros=AdminsRepository.FILTROS,
+        )
 
     @staticmethod
     def save(database: Session, admin: Admin) -> Admin:
@@ -21,36 +43,24 @@ class AdminsRepository:
         database.refresh(admin)
         return admin
 
-    @staticmethod
-    def find_by_id(database: Session, id: int) -> Admin:
-        '''Função para fazer uma query por ID de um objeto admin na DB'''
-        return database.query(Admin).filter(Admin.id == id).first()
-
-    @staticmethod
-    def exists_by_id(database: Session, id: int) -> bool:
-        '''Função que verifica se o ID dado existe na DB'''
-        return database.query(Admin).filter(Admin.id == id).first() is not None
-
-    @staticmethod
-    def delete_by_id(database: Session, id: int) -> None:
-        '''Função para excluir um objeto admin da DB dado o ID'''
-        admin = database.query(Admin).filter(Admin.id == id).first()
-        if admin is not None:
-            database.delete(admin)
-            database.commit()
-
     @staticmethod
     def find_by_email(database: Session, email: str) -> Admin:
         '''Função para fazer uma query por email de um admin na DB'''
         return database.query(Admin).filter(Admin.email == email).first()
 
     @staticmethod
-    def authenticate(database: Session, email: str, senha: str) -> Admin:
-        '''Função para autenticar um admin'''
-        admin = AdminsRepository.find_by_email(database, email)
-        if admin and verify_password(senha, admin.senha):
-            return admin
-        return None
+    async def authenticate(database: AsyncSession, email: str, senha: str) -> Admin | None:
+        '''Função para autenticar um admin; o bcrypt roda no pool dedicado e hashes antigos são refeitos'''
+        admin = await database.run_sync(AdminsRepository.find_by_email, email)
+        if not admin:
+            return None
+        valida, novo_hash = await verify_and_update_password(senha, admin.senha)
+        if not valida:
+            return None
+        if novo_hash:
+            admin.senha = novo_hash
+            await database.commit()
+        return admin
 
     @staticmethod
     def count_all(database: Session) -> int:
@@ -58,6 +68,9 @@ class AdminsRepository:
         return database.query(Admin).count()
 
     @staticmethod
-    def find_by_cargo(database: Session, cargo: str) -> list[Admin]:
-        '''Função para fazer uma query por cargo de admins na DB'''
-        return database.query(Admin).filter(Admin.cargo.ilike(f"%{cargo}%")).all()
+    def find_by_cargo(database: Session, cargo: str) -> list[Row]:
+        '''Função para fazer uma query por cargo de admins na DB (só as colunas de resposta)'''
+        return list(database.execute(AdminsRepository.projecao().where(Admin.cargo.ilike(f"%{cargo}%"))))
+
+
+AsyncAdminsRepository = AsyncRepository(AdminsRepository)
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from ..condicional import condicional_item, condicional_lista
+from ..database import get_async_db as get_async_database
 from ..database import get_db as get_database
 from ..model.model import Admin
-from ..security import get_password_hash
-from .repository import AdminsRepository
+from ..pagination import PageParams, page_params
+from ..security import hash_password
+from ..serializacao import resposta_lista
+from .repository import AdminsRepository, AsyncAdminsRepository
 from .schema import (
     AdminLoginRequest,
     AdminLoginResponse,
@@ -24,10 +29,10 @@ router = APIRouter(
     response_model=AdminResponse,
     status_code=status.HTTP_201_CREATED
 )
-def create(request: AdminRequest, database: Session = Depends(get_database)):
+async def create(request: AdminRequest, database: AsyncSession = Depends(get_async_database)):
     '''Cria e salva um objeto admin por meio do método POST'''
     # Verificar se email já existe
-    if AdminsRepository.find_by_email(database, request.email):
+    if await AsyncAdminsRepository.find_by_email(database, request.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email já cadastrado"
@@ -35,10 +40,10 @@ def create(request: AdminRequest, database: Session = Depends(get_database)):
     
     # Criar admin com senha hasheada
     admin_data = request.dict()
-    admin_data['senha'] = get_password_hash(admin_data['senha'])
+    admin_data['senha'] = await hash_password(admin_data['senha'])
     admin_data['tipo'] = 'admin'
     
-    admin = AdminsRepository.save(database, Admin(**admin_data))
+    admin = await AsyncAdminsRepository.save(database, Admin(**admin_data))
     return admin
 
 # LOGIN
@@ -46,9 +51,9 @@ def create(request: AdminRequest, database: Session = Depends(get_database)):
     response_model=AdminLoginResponse,
     status_code=status.HTTP_200_OK
 )
-def login(request: AdminLoginRequest, database: Session = Depends(get_database)):
+async def login(request: AdminLoginRequest, database: AsyncSession = Depends(get_async_database)):
     '''Autentica um admin por meio do método POST'''
-    admin = AdminsRepository.authenticate(database, request.email, request.senha)
+    admin = await AsyncAdminsRepository.authenticate(database, request.email, request.senha)
     if not admin:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,56 +69,51 @@ def login(request: AdminLoginRequest, database: Session = Depends(get_database))
     )
 
 # READ ALL
-@router.get("/", response_model=list[AdminResponse])
-def find_all(database: Session = Depends(get_database)):
-    '''Faz uma query de todos os objetos admin na DB (sem paginação)'''
-    admins = AdminsRepository.find_all(database)
-    return [AdminResponse.from_orm(admin) for admin in admins]
+@router.get("/", response_model=list[AdminResponse], dependencies=[condicional_lista(Admin)])
+def find_all(
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: Session = Depends(get_database),
+):
+    '''Faz uma query paginada por cursor dos objetos admin na DB (próximo cursor em X-Next-Cursor)'''
+    pagina = AdminsRepository.find_all(database, params)
+    pagina.aplicar_headers(response)
+    return resposta_lista(AdminResponse, pagina.itens, response)
 
 # READ BY ID
-@router.get("/{id}", response_model=AdminResponse)
+@router.get("/{id}", response_model=AdminResponse, dependencies=[condicional_item(Admin)])
 def find_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID como parâmetro, encontra o admin com esse ID'''
-    admin = AdminsRepository.find_by_id(database, id)
-    if not admin:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Admin não encontrado"
-        )
+    admin = AdminsRepository.get_or_404(database, id)
     return AdminResponse.from_orm(admin)
 
 # UPDATE BY ID
 @router.put("/{id}", response_model=AdminResponse)
-def update(id: int, request: AdminUpdateRequest, database: Session = Depends(get_database)):
+async def update(id: int, request: AdminUpdateRequest, database: AsyncSession = Depends(get_async_database)):
     '''Dado o ID do admin, atualiza os dados na DB por meio do método PUT'''
-    if not AdminsRepository.exists_by_id(database, id):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Admin não encontrado"
-        )
-    
-    # Buscar o admin existente
-    admin_existente = AdminsRepository.find_by_id(database, id)
+    # Uma única busca: 404 se não existir
+    admin_existente = await AsyncAdminsRepository.get_or_404(database, id)
     
     # Atualizar os campos fornecidos
     update_data = request.dict(exclude_unset=True)
     if 'senha' in update_data and update_data['senha']:
-        update_data['senha'] = get_password_hash(update_data['senha'])
+        update_data['senha'] = await hash_password(update_data['senha'])
     
     for field, value in update_data.items():
         setattr(admin_existente, field, value)
     
     # Salvar as alterações
-    admin_atualizado = AdminsRepository.save(database, admin_existente)
+    admin_atualizado = await AsyncAdminsRepository.save(database, admin_existente)
     return AdminResponse.from_orm(admin_atualizado)
 
 # DELETE BY ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID do admin, deleta o objeto da DB por meio do método DELETE'''
-    if not AdminsRepository.exists_by_id(database, id):
+    if not AdminsRepository.delete_by_id(database, id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Admin não encontrado"
         )
-    AdminsRepository.delete_by_id(database, id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # GET COUNT
@@ -128,4 +128,4 @@ def count_all(database: Session = Depends(get_database)):
 def find_by_cargo(cargo: str, database: Session = Depends(get_database)):
     '''Dado o cargo como parâmetro, encontra os admins com esse cargo'''
     admins = AdminsRepository.find_by_cargo(database, cargo)
-    return [AdminResponse.from_orm(admin) for admin in admins]
+    return resposta_lista(AdminResponse, admins)
@@ -1,43 +1,85 @@
-from sqlalchemy import func
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
 from sqlalchemy.orm import Session
 
-from ..model.model import Avaliacao
+from ..model.model import Avaliacao, AvaliacaoResumo, Carros
+from ..pagination import Page, PageParams, paginate
+from ..repository import AsyncRepository, BaseRepository, upsert_incremental
+
+
+class AvaliacoesRepository(BaseRepository):
+    model = Avaliacao
+    nao_encontrado = "Avaliação não encontrada"
 
+    FILTROS = {"clienteId": Avaliacao.clienteId, "carroId": Avaliacao.carroId, "nota": Avaliacao.nota}
+    ORDENACOES = {"id": Avaliacao.id, "criadoEm": Avaliacao.criadoEm}
+    COLUNAS_LISTAGEM = (
+        Avaliacao.id, Avaliacao.nota, Avaliacao.comentario, Avaliacao.clienteId, Avaliacao.carroId,
+        Avaliacao.data, Avaliacao.criadoEm, Avaliacao.atualizadoEm,
+    )
 
-class AvaliacoesRepository:
     @staticmethod
-    def find_all(database: Session) -> list[Avaliacao]:
-        '''Função para fazer uma query de todas as avaliações da DB'''
-        return database.query(Avaliacao).all()
+    def find_all(database: Session, params: PageParams) -> Page:
+        '''Função para fazer uma query paginada por cursor de todas as avaliações da DB'''
+        return paginate(
+            database,
+            AvaliacoesRepository.projecao(),
+            params,
+            id_coluna=Avaliacao.id,
+            ordenacoes=AvaliacoesRepository.ORDENACOES,
+            filtros=AvaliacoesRepository.FILTROS,
+        )
 
     @staticmethod
     def save(database: Session, avaliacao: Avaliacao) -> Avaliacao:
-        '''Função para salvar um objeto avaliação na DB'''
+        '''Função para salvar um objeto avaliação na DB (e atualizar o resumo do carro)'''
         if avaliacao.id:
+            anterior = database.execute(
+                select(Avaliacao.carroId, Avaliacao.nota).where(Avaliacao.id == avaliacao.id)
+            ).first()
             database.merge(avaliacao)
+            if anterior is not None:
+                AvaliacoesRepository._ajustar_resumo(database, anterior.carroId, {anterior.nota: -1})
+            AvaliacoesRepository._ajustar_resumo(database, avaliacao.carroId, {avaliacao.nota: 1})
         else:
             database.add(avaliacao)
+            AvaliacoesRepository._ajustar_resumo(database, avaliacao.carroId, {avaliacao.nota: 1})
         database.commit()
         database.refresh(avaliacao)
         return avaliacao
 
-    @staticmethod
-    def find_by_id(database: Session, id: int) -> Avaliacao:
-        '''Função para fazer uma query por ID de um objeto avaliação na DB'''
-        return database.query(Avaliacao).filter(Avaliacao.id == id).first()
+    @classmethod
+    def update_by_id(cls, database: Session, id: int, valores: dict):
+        '''Função que atualiza por ID; quando a nota muda, ajusta o resumo na mesma transação'''
+        if "nota" not in valores:
+            return super().update_by_id(database, id, valores)
 
-    @staticmethod
-    def exists_by_id(database: Session, id: int) -> bool:
-        '''Função que verifica se o ID dado existe na DB'''
-        return database.query(Avaliacao).filter(Avaliacao.id == id).first() is not None
+        tabela = Avaliacao.__table__
+        anterior = database.execute(
+            select(tabela.c.carroId, tabela.c.nota).where(tabela.c.id == id).with_for_update()
+        ).first()
+        if anterior is None:
+            return None
+        linha = database.execute(
+            update(tabela).where(tabela.c.id == id).values(**valores).returning(*tabela.c)
+        ).one()
+        if linha.nota != anterior.nota:
+            cls._ajustar_resumo(database, linha.carroId, {anterior.nota: -1, linha.nota: 1})
+        database.commit()
+        return linha
 
-    @staticmethod
-    def delete_by_id(database: Session, id: int) -> None:
-        '''Função para excluir um objeto avaliação da DB dado o ID'''
-        avaliacao = database.query(Avaliacao).filter(Avaliacao.id == id).first()
-        if avaliacao is not None:
-            database.delete(avaliacao)
-            database.commit()
+    @classmethod
+    def delete_by_id(cls, database: Session, id: int) -> bool:
+        '''Função que exclui por ID com DELETE ... RETURNING e desconta a nota do resumo'''
+        tabela = Avaliacao.__table__
+        removida = database.execute(
+            delete(tabela).where(tabela.c.id == id).returning(tabela.c.carroId, tabela.c.nota)
+        ).first()
+        if removida is not None:
+            cls._ajustar_resumo(database, removida.carroId, {removida.nota: -1})
+        database.commit()
+        return removida is not None
 
     @staticmethod
     def count_all(database: Session) -> int:
@@ -55,19 +97,93 @@ class AvaliacoesRepository:
         return database.query(Avaliacao).filter(Avaliacao.carroId == carro_id).all()
 
     @staticmethod
-    def calcular_media_carro(database: Session, carro_id: int) -> dict:
-        '''Função para calcular a média de avaliações de um carro'''
-        result = database.query(
-            func.avg(Avaliacao.nota).label('media'),
-            func.count(Avaliacao.id).label('total')
-        ).filter(Avaliacao.carroId == carro_id).first()
-        
+    def _resumo_dict(resumo) -> dict:
+        if resumo is None or not resumo.total:
+            return {'media': 0.0, 'total': 0, 'distribuicao': {nota: 0 for nota in range(1, 6)}}
         return {
-            'media': float(result.media) if result.media else 0.0,
-            'total': result.total if result.total else 0
+            'media': resumo.soma / resumo.total,
+            'total': resumo.total,
+            'distribuicao': {nota: getattr(resumo, f"nota{nota}") for nota in range(1, 6)},
+        }
+
+    @staticmethod
+    def calcular_media_carro(database: Session, carro_id: int) -> dict | None:
+        '''Função que lê o resumo materializado de um carro; retorna None se o carro não existe'''
+        linha = database.execute(
+            select(Carros.id, AvaliacaoResumo)
+            .outerjoin(AvaliacaoResumo, AvaliacaoResumo.carroId == Carros.id)
+            .where(Carros.id == carro_id)
+        ).first()
+        if linha is None:
+            return None
+        return AvaliacoesRepository._resumo_dict(linha.AvaliacaoResumo)
+
+    @staticmethod
+    def resumos_por_carro(database: Session, carro_ids: list[int]) -> dict[int, dict]:
+        '''Função que lê os resumos de vários carros em uma única query (IN)'''
+        resumos = {
+            resumo.carroId: resumo
+            for resumo in database.scalars(
+                select(AvaliacaoResumo).where(AvaliacaoResumo.carroId.in_(carro_ids))
+            )
+        }
+        return {carro_id: AvaliacoesRepository._resumo_dict(resumos.get(carro_id)) for carro_id in carro_ids}
+
+    @staticmethod
+    def _ajustar_resumo(database: Session, carro_id: int, notas: dict[int, int]) -> None:
+        '''Aplica incrementos/decrementos por nota no resumo do carro com um único upsert'''
+        valores = {
+            "total": sum(notas.values()),
+            "soma": sum(nota * quantidade for nota, quantidade in notas.items()),
         }
+        for nota in range(1, 6):
+            valores[f"nota{nota}"] = notas.get(nota, 0)
+        if not any(valores.values()):
+            return
+
+        upsert_incremental(
+            database,
+            AvaliacaoResumo.__table__,
+            ["carroId"],
+            [{"carroId": carro_id, **valores, "atualizadoEm": datetime.now()}],
+            substituir=("atualizadoEm",),
+        )
+
+    @staticmethod
+    def descontar_cliente(database: Session, cliente_id: int) -> None:
+        '''Remove dos resumos as avaliações de um cliente que será excluído'''
+        linhas = database.execute(
+            select(Avaliacao.carroId, Avaliacao.nota, func.count())
+            .where(Avaliacao.clienteId == cliente_id)
+            .group_by(Avaliacao.carroId, Avaliacao.nota)
+        ).all()
+        por_carro: dict[int, dict[int, int]] = {}
+        for carro_id, nota, quantidade in linhas:
+            por_carro.setdefault(carro_id, {})[nota] = -quantidade
+        for carro_id, notas in por_carro.items():
+            AvaliacoesRepository._ajustar_resumo(database, carro_id, notas)
+
+    @staticmethod
+    def reconstruir_resumos(database: Session) -> None:
+        '''Recalcula todos os resumos a partir da tabela de avaliações (carga inicial/reparo)'''
+        database.execute(delete(AvaliacaoResumo))
+        colunas = [
+            Avaliacao.carroId,
+            func.count(Avaliacao.id),
+            func.sum(Avaliacao.nota),
+            *[func.sum(case((Avaliacao.nota == nota, 1), else_=0)) for nota in range(1, 6)],
+            func.max(Avaliacao.atualizadoEm),
+        ]
+        database.execute(insert(AvaliacaoResumo).from_select(
+            ["carroId", "total", "soma", "nota1", "nota2", "nota3", "nota4", "nota5", "atualizadoEm"],
+            select(*colunas).group_by(Avaliacao.carroId),
+        ))
+        database.commit()
 
     @staticmethod
     def find_by_nota(database: Session, nota: int) -> list[Avaliacao]:
         '''Função para fazer uma query por nota de avaliações na DB'''
         return database.query(Avaliacao).filter(Avaliacao.nota == nota).all()
+
+
+AsyncAvaliacoesRepository = AsyncRepository(AvaliacoesRepository)
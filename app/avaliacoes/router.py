@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..carros.repository import CarrosRepository
 from ..clientes.repository import ClientesRepository
+from ..condicional import condicional_item, condicional_lista
+from ..config import settings
+from ..database import get_async_db as get_async_database
 from ..database import get_db as get_database
 from ..model.model import Avaliacao
-from .repository import AvaliacoesRepository
+from ..pagination import PageParams, page_params
+from ..serializacao import resposta_lista
+from .repository import AsyncAvaliacoesRepository, AvaliacoesRepository
 from .schema import (
     AvaliacaoMediaResponse,
     AvaliacaoRequest,
     AvaliacaoResponse,
+    AvaliacaoResumoResponse,
     AvaliacaoUpdateRequest,
 )
 
@@ -51,36 +58,44 @@ def create(request: AvaliacaoRequest, database: Session = Depends(get_database))
     return avaliacao
 
 # READ ALL
-@router.get("/", response_model=list[AvaliacaoResponse])
-def find_all(database: Session = Depends(get_database)):
-    '''Faz uma query de todos os objetos avaliação na DB (sem paginação)'''
-    avaliacoes = AvaliacoesRepository.find_all(database)
-    return [AvaliacaoResponse.from_orm(avaliacao) for avaliacao in avaliacoes]
+@router.get("/", response_model=list[AvaliacaoResponse], dependencies=[condicional_lista(Avaliacao, assincrona=True)])
+async def find_all(
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: AsyncSession = Depends(get_async_database),
+):
+    '''Faz uma query paginada por cursor dos objetos avaliação na DB (próximo cursor em X-Next-Cursor)'''
+    pagina = await AsyncAvaliacoesRepository.find_all(database, params)
+    pagina.aplicar_headers(response)
+    return resposta_lista(AvaliacaoResponse, pagina.itens, response)
 
-# READ BY ID
-@router.get("/{id}", response_model=AvaliacaoResponse)
-def find_by_id(id: int, database: Session = Depends(get_database)):
-    '''Dado o ID como parâmetro, encontra a avaliação com esse ID'''
-    avaliacao = AvaliacoesRepository.find_by_id(database, id)
-    if not avaliacao:
+# GET RESUMOS BY CARROS
+@router.get("/resumos", response_model=list[AvaliacaoResumoResponse])
+async def find_resumos(
+    carroIds: list[int] = Query(..., description="IDs dos carros (repita o parâmetro para cada carro)"),
+    database: AsyncSession = Depends(get_async_database),
+):
+    '''Retorna média, total e distribuição de notas de vários carros em uma única query'''
+    if len(carroIds) > settings.pagination_max_limit:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Avaliação não encontrada"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Informe no máximo {settings.pagination_max_limit} carros"
         )
+    carro_ids = list(dict.fromkeys(carroIds))
+    resumos = await AsyncAvaliacoesRepository.resumos_por_carro(database, carro_ids)
+    return [AvaliacaoResumoResponse(carroId=carro_id, **resumos[carro_id]) for carro_id in carro_ids]
+
+# READ BY ID
+@router.get("/{id}", response_model=AvaliacaoResponse, dependencies=[condicional_item(Avaliacao, assincrona=True)])
+async def find_by_id(id: int, database: AsyncSession = Depends(get_async_database)):
+    '''Dado o ID como parâmetro, encontra a avaliação com esse ID'''
+    avaliacao = await AsyncAvaliacoesRepository.get_or_404(database, id)
     return AvaliacaoResponse.from_orm(avaliacao)
 
 # UPDATE BY ID
 @router.put("/{id}", response_model=AvaliacaoResponse)
 def update(id: int, request: AvaliacaoUpdateRequest, database: Session = Depends(get_database)):
     '''Dado o ID da avaliação, atualiza os dados na DB por meio do método PUT'''
-    if not AvaliacoesRepository.exists_by_id(database, id):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Avaliação não encontrada"
-        )
-    
-    # Buscar a avaliação existente
-    avaliacao_existente = AvaliacoesRepository.find_by_id(database, id)
-    
-    # Atualizar os campos fornecidos
     update_data = request.dict(exclude_unset=True)
     
     # Validar nota se fornecida
@@ -91,61 +106,60 @@ def update(id: int, request: AvaliacaoUpdateRequest, database: Session = Depends
                 detail="Nota deve estar entre 1 e 5"
             )
     
-    for field, value in update_data.items():
-        setattr(avaliacao_existente, field, value)
-    
-    # Salvar as alterações
-    avaliacao_atualizada = AvaliacoesRepository.save(database, avaliacao_existente)
+    # Um único UPDATE ... RETURNING com os campos fornecidos
+    avaliacao_atualizada = AvaliacoesRepository.update_by_id(database, id, update_data)
+    if avaliacao_atualizada is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Avaliação não encontrada"
+        )
     return AvaliacaoResponse.from_orm(avaliacao_atualizada)
 
 # DELETE BY ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID da avaliação, deleta o objeto da DB por meio do método DELETE'''
-    if not AvaliacoesRepository.exists_by_id(database, id):
+    if not AvaliacoesRepository.delete_by_id(database, id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Avaliação não encontrada"
         )
-    AvaliacoesRepository.delete_by_id(database, id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # GET COUNT
 @router.get("/count/")
-def count_all(database: Session = Depends(get_database)):
+async def count_all(database: AsyncSession = Depends(get_async_database)):
     '''Faz uma query de contagem de avaliações na DB'''
-    count = AvaliacoesRepository.count_all(database)
+    count = await AsyncAvaliacoesRepository.count_all(database)
     return {"count": count}
 
 # GET BY CLIENTE
-@router.get("/cliente/{cliente_id}", response_model=list[AvaliacaoResponse])
-def find_by_cliente(cliente_id: int, database: Session = Depends(get_database)):
+@router.get("/cliente/{cliente_id}", response_model=list[AvaliacaoResponse], dependencies=[condicional_lista(Avaliacao, assincrona=True, clienteId="cliente_id")])
+async def find_by_cliente(cliente_id: int, response: Response, database: AsyncSession = Depends(get_async_database)):
     '''Dado o ID do cliente, encontra as avaliações desse cliente'''
-    avaliacoes = AvaliacoesRepository.find_by_cliente(database, cliente_id)
-    return [AvaliacaoResponse.from_orm(avaliacao) for avaliacao in avaliacoes]
+    avaliacoes = await AsyncAvaliacoesRepository.find_by_cliente(database, cliente_id)
+    return resposta_lista(AvaliacaoResponse, avaliacoes, response)
 
 # GET BY CARRO
-@router.get("/carro/{carro_id}", response_model=list[AvaliacaoResponse])
-def find_by_carro(carro_id: int, database: Session = Depends(get_database)):
+@router.get("/carro/{carro_id}", response_model=list[AvaliacaoResponse], dependencies=[condicional_lista(Avaliacao, assincrona=True, carroId="carro_id")])
+async def find_by_carro(carro_id: int, response: Response, database: AsyncSession = Depends(get_async_database)):
     '''Dado o ID do carro, encontra as avaliações desse carro'''
-    avaliacoes = AvaliacoesRepository.find_by_carro(database, carro_id)
-    return [AvaliacaoResponse.from_orm(avaliacao) for avaliacao in avaliacoes]
+    avaliacoes = await AsyncAvaliacoesRepository.find_by_carro(database, carro_id)
+    return resposta_lista(AvaliacaoResponse, avaliacoes, response)
 
 # GET MEDIA BY CARRO
 @router.get("/carro/{carro_id}/media", response_model=AvaliacaoMediaResponse)
-def calcular_media_carro(carro_id: int, database: Session = Depends(get_database)):
-    '''Calcula a média de avaliações de um carro'''
-    if not CarrosRepository.exists_by_id(database, carro_id):
+async def calcular_media_carro(carro_id: int, database: AsyncSession = Depends(get_async_database)):
+    '''Retorna a média de avaliações de um carro a partir do resumo materializado'''
+    resultado = await AsyncAvaliacoesRepository.calcular_media_carro(database, carro_id)
+    if resultado is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Carro não encontrado"
         )
-    
-    resultado = AvaliacoesRepository.calcular_media_carro(database, carro_id)
     return AvaliacaoMediaResponse(**resultado)
 
 # GET BY NOTA
-@router.get("/nota/{nota}", response_model=list[AvaliacaoResponse])
-def find_by_nota(nota: int, database: Session = Depends(get_database)):
+@router.get("/nota/{nota}", response_model=list[AvaliacaoResponse], dependencies=[condicional_lista(Avaliacao, assincrona=True, nota="nota")])
+async def find_by_nota(nota: int, response: Response, database: AsyncSession = Depends(get_async_database)):
     '''Dado a nota, encontra as avaliações com essa nota'''
     if nota < 1 or nota > 5:
         raise HTTPException(
@@ -153,5 +167,5 @@ def find_by_nota(nota: int, database: Session = Depends(get_database)):
             detail="Nota deve estar entre 1 e 5"
         )
     
-    avaliacoes = AvaliacoesRepository.find_by_nota(database, nota)
-    return [AvaliacaoResponse.from_orm(avaliacao) for avaliacao in avaliacoes]
+    avaliacoes = await AsyncAvaliacoesRepository.find_by_nota(database, nota)
+    return resposta_lista(AvaliacaoResponse, avaliacoes, response)
@@ -40,6 +40,11 @@ class AvaliacaoMediaResponse(BaseModel):
     '''Classe para resposta de média de avaliações'''
     media: float
     total: int
+    distribuicao: dict[int, int] = Field(default_factory=dict, description="Quantidade de avaliações por nota")
     
     class Config:
         from_attributes = True
+
+class AvaliacaoResumoResponse(AvaliacaoMediaResponse):
+    '''Classe para resposta do resumo de avaliações de um carro (consulta em lote)'''
+    carroId: int
@@ -0,0 +1,48 @@
+from ..conftest import client, criar_carro, criar_cliente, criar_localizacao
+
+
+def test_resumo_avaliacoes_incremental():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    outro_cliente_id = criar_cliente()
+    carro_id = criar_carro(loc)
+    sem_avaliacoes_id = criar_carro(loc)
+
+    ids = []
+    for cliente, nota in [(cliente_id, 5), (cliente_id, 3), (outro_cliente_id, 4)]:
+        resp = client.post(
+            "/avaliacoes/",
+            json={"nota": nota, "clienteId": cliente, "carroId": carro_id},
+        )
+        assert resp.status_code == 201
+        ids.append(resp.json()["id"])
+
+    resp = client.get(f"/avaliacoes/carro/{carro_id}/media")
+    assert resp.status_code == 200
+    assert resp.json() == {"media": 4.0, "total": 3, "distribuicao": {"1": 0, "2": 0, "3": 1, "4": 1, "5": 1}}
+
+    resp = client.put(f"/avaliacoes/{ids[1]}", json={"nota": 1})
+    assert resp.status_code == 200
+    resp = client.delete(f"/avaliacoes/{ids[0]}")
+    assert resp.status_code == 204
+
+    resp = client.get(f"/avaliacoes/carro/{carro_id}/media")
+    assert resp.json()["total"] == 2
+    assert resp.json()["media"] == 2.5
+    assert resp.json()["distribuicao"]["1"] == 1
+
+    # Excluir o cliente remove as avaliações dele (cascade) e o resumo acompanha
+    resp = client.delete(f"/clientes/{outro_cliente_id}")
+    assert resp.status_code == 204
+
+    resp = client.get(
+        "/avaliacoes/resumos", params={"carroIds": [carro_id, sem_avaliacoes_id]}
+    )
+    assert resp.status_code == 200
+    resumos = {item["carroId"]: item for item in resp.json()}
+    assert resumos[carro_id]["total"] == 1
+    assert resumos[carro_id]["media"] == 1.0
+    assert resumos[sem_avaliacoes_id]["total"] == 0
+
+    resp = client.get("/avaliacoes/carro/999999/media")
+    assert resp.status_code == 404
@@ -0,0 +1,86 @@
+import re
+
+from sqlalchemy import column, func, literal, literal_column, or_, select, table, text
+from sqlalchemy.orm import Session
+
+from ..model.model import Carros, Localizacao
+from ..repository import AsyncRepository
+
+# Mesmas expressões dos índices da migração 0003 (o Postgres só usa o índice se forem idênticas)
+DOCUMENTO_CARROS = (
+    "coalesce(carros.marca, '') || ' ' || coalesce(carros.modelo, '') || ' ' || "
+    "coalesce(carros.categoria, '') || ' ' || coalesce(carros.descricao, '')"
+)
+TITULO_CARROS = "coalesce(carros.marca, '') || ' ' || coalesce(carros.modelo, '')"
+DOCUMENTO_LOCALIZACOES = "coalesce(localizacoes.nome, '') || ' ' || coalesce(localizacoes.endereco, '')"
+CONFIGURACAO_TEXTO = "'portuguese'"
+
+
+def termos(consulta: str) -> list[str]:
+    '''Palavras da consulta, sem pontuação nem operadores'''
+    return re.findall(r"\w+", consulta.lower())
+
+
+class BuscaRepository:
+    @staticmethod
+    def _buscar_postgres(database: Session, modelo, documento: str, titulo, consulta: str, limite: int):
+        '''tsvector para palavras inteiras + trigram (word_similarity) para prefixos e erros de digitação'''
+        config = literal_column(CONFIGURACAO_TEXTO)
+        vetor = func.to_tsvector(config, literal_column(documento))
+        tsquery = func.websearch_to_tsquery(config, consulta)
+        relevancia = func.greatest(func.ts_rank(vetor, tsquery), func.word_similarity(consulta, titulo))
+        stmt = (
+            select(modelo, relevancia.label("relevancia"))
+            .where(or_(vetor.op("@@")(tsquery), literal(consulta).op("<%")(titulo)))
+            .order_by(relevancia.desc(), modelo.id)
+            .limit(limite)
+        )
+        return [(objeto, float(valor)) for objeto, valor in database.execute(stmt)]
+
+    @staticmethod
+    def _buscar_sqlite(database: Session, modelo, consulta: str, limite: int):
+        '''FTS5 com prefixo em cada termo, ordenado por bm25'''
+        palavras = termos(consulta)
+        if not palavras:
+            return []
+        fts = table(f"{modelo.__tablename__}_fts", column("rowid"))
+        bm25 = func.bm25(literal_column(fts.name))
+        stmt = (
+            select(modelo, (-bm25).label("relevancia"))
+            .join(fts, fts.c.rowid == modelo.id)
+            .where(text(f"{fts.name} MATCH :consulta").bindparams(
+                consulta=" ".join(f'"{palavra}"*' for palavra in palavras)
+            ))
+            .order_by(bm25, modelo.id)
+            .limit(limite)
+        )
+        return [(objeto, float(valor)) for objeto, valor in database.execute(stmt)]
+
+    @staticmethod
+    def buscar_carros(database: Session, consulta: str, limite: int) -> list[tuple[Carros, float]]:
+        '''Função para buscar carros por marca, modelo, categoria e descrição'''
+        if database.get_bind().dialect.name == "postgresql":
+            return BuscaRepository._buscar_postgres(
+                database, Carros, DOCUMENTO_CARROS, literal_column(TITULO_CARROS), consulta, limite
+            )
+        return BuscaRepository._buscar_sqlite(database, Carros, consulta, limite)
+
+    @staticmethod
+    def buscar_localizacoes(database: Session, consulta: str, limite: int) -> list[tuple[Localizacao, float]]:
+        '''Função para buscar localizações por nome e endereço'''
+        if database.get_bind().dialect.name == "postgresql":
+            return BuscaRepository._buscar_postgres(
+                database, Localizacao, DOCUMENTO_LOCALIZACOES, Localizacao.nome, consulta, limite
+            )
+        return BuscaRepository._buscar_sqlite(database, Localizacao, consulta, limite)
+
+    @staticmethod
+    def buscar(database: Session, consulta: str, limite: int) -> dict:
+        '''Função que busca carros e localizações; cada lista vem ordenada por relevância'''
+        return {
+            "carros": BuscaRepository.buscar_carros(database, consulta, limite),
+            "localizacoes": BuscaRepository.buscar_localizacoes(database, consulta, limite),
+        }
+
+
+AsyncBuscaRepository = AsyncRepository(BuscaRepository)
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..carros.schema import CarrosResponse
+from ..database import get_async_db as get_async_database
+from ..localizacoes.schema import LocalizacaoResponse
+from .repository import AsyncBuscaRepository
+from .schema import BuscaResponse, CarroBuscaResponse, LocalizacaoBuscaResponse
+
+router = APIRouter(
+    prefix='/busca',
+    tags=['busca'],
+)
+
+# BUSCA UNIFICADA
+@router.get("/", response_model=BuscaResponse)
+async def buscar(
+    q: str = Query(..., min_length=2, max_length=100, description="Texto da busca"),
+    limit: int = Query(20, ge=1, le=100, description="Máximo de itens por tipo"),
+    database: AsyncSession = Depends(get_async_database),
+):
+    '''Busca carros (marca, modelo, categoria, descrição) e localizações (nome, endereço) por relevância'''
+    resultado = await AsyncBuscaRepository.buscar(database, q, limit)
+    return BuscaResponse(
+        carros=[
+            CarroBuscaResponse(**CarrosResponse.from_orm(carro).dict(), relevancia=relevancia)
+            for carro, relevancia in resultado["carros"]
+        ],
+        localizacoes=[
+            LocalizacaoBuscaResponse(**LocalizacaoResponse.from_orm(localizacao).dict(), relevancia=relevancia)
+            for localizacao, relevancia in resultado["localizacoes"]
+        ],
+    )
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+from ..carros.schema import CarrosResponse
+from ..localizacoes.schema import LocalizacaoResponse
+
+
+class CarroBuscaResponse(CarrosResponse):
+    '''Classe para um carro encontrado na busca'''
+    relevancia: float
+
+class LocalizacaoBuscaResponse(LocalizacaoResponse):
+    '''Classe para uma localização encontrada na busca'''
+    relevancia: float
+
+class BuscaResponse(BaseModel):
+    '''Classe para resposta da busca unificada'''
+    carros: list[CarroBuscaResponse]
+    localizacoes: list[LocalizacaoBuscaResponse]
@@ -0,0 +1,69 @@
+'''Cache em memória com expiração (TTL) compartilhado pelos módulos da API'''
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class TTLCache:
+    '''Cache LRU limitado em que cada entrada expira ttl segundos após ser gravada
+
+    Seguro para uso entre threads (handlers síncronos rodam no threadpool do Starlette).
+    '''
+
+    def __init__(self, ttl: float, max_itens: int = 1024):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def get(self, chave: Hashable, padrao: Any = None) -> Any:
+        '''Retorna o valor da chave ou padrao se ausente/expirado'''
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[0] <= time.monotonic():
+                if item is not None:
+                    del self._itens[chave]
+                self.faltas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def set(self, chave: Hashable, valor: Any) -> None:
+        '''Grava o valor e descarta a entrada menos usada se o limite foi atingido'''
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def get_or_set(self, chave: Hashable, fabrica: Callable[[], Any]) -> Any:
+        '''Retorna o valor em cache ou calcula com fabrica() e grava'''
+        ausente = object()
+        valor = self.get(chave, ausente)
+        if valor is ausente:
+            valor = fabrica()
+            self.set(chave, valor)
+        return valor
+
+    def invalidate(self, chave: Hashable | None = None) -> None:
+        '''Remove uma chave, ou todas se nenhuma for informada'''
+        with self._lock:
+            if chave is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(chave, None)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "itens": len(self._itens),
+                "ttl": self.ttl,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+            }
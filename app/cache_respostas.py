@@ -0,0 +1,264 @@
+'''Cache de leitura das respostas do catálogo (bytes já serializados) com invalidação por escrita
+
+As rotas registradas em ROTAS_CACHEADAS são servidas pelo middleware direto do
+cache, antes do roteamento: um acerto não abre sessão nem executa SQL. Cada
+entrada é associada a namespaces ("carros", "localizacoes"); os repositories
+invalidam o namespace após o commit de uma escrita. A invalidação incrementa a
+versão do namespace, que faz parte da chave, então respostas calculadas durante
+a escrita nunca são lidas depois dela.
+
+A invalidação só é precisa dentro do backend: no backend em memória (padrão) as
+versões são do processo, então uma escrita não invalida os demais workers. Com mais
+de um worker (WEB_CONCURRENCY > 1, que o uvicorn usa como --workers) é obrigatório
+um backend compartilhado (RESPONSE_CACHE_URL=redis://...); criar_backend recusa a
+combinação.
+'''
+
+import hashlib
+import threading
+from collections.abc import Iterable
+
+from .cache import TTLCache
+from .condicional import etag_confere
+from .config import settings
+
+# Caminho exato -> (namespaces de que a resposta depende, parâmetros que desativam o cache)
+ROTAS_CACHEADAS: dict[str, tuple[tuple[str, ...], frozenset[str]]] = {
+    "/carros/": (("carros",), frozenset()),
+    "/carros/destaque/": (("carros",), frozenset()),
+    # Com inicio/fim a resposta depende das reservas do período
+    "/carros/disponivel": (("carros",), frozenset({"inicio", "fim"})),
+    "/carros/disponivel/": (("carros",), frozenset({"inicio", "fim"})),
+    "/carros/count/": (("carros",), frozenset()),
+    "/carros/count/disponivel": (("carros",), frozenset()),
+    "/carros/count/destaque": (("carros",), frozenset()),
+    "/localizacoes/": (("localizacoes",), frozenset()),
+    "/localizacoes/count/": (("localizacoes",), frozenset()),
+}
+
+# Cabeçalhos da resposta original que são guardados junto com o corpo
+CABECALHOS_CACHEADOS = (b"content-type", b"x-next-cursor", b"etag", b"cache-control")
+CACHE_HEADER = "X-Cache"
+
+
+class MemoriaBackend:
+    '''Backend em processo: LRU com TTL e versões dos namespaces em um dict local
+
+    Só para um único worker: as escritas não invalidam o cache dos outros processos.
+    '''
+
+    def __init__(self, ttl: float, max_itens: int = 2048):
+        self._itens = TTLCache(ttl, max_itens=max_itens)
+        self._versoes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def versoes(self, namespaces: Iterable[str]) -> list[int]:
+        with self._lock:
+            return [self._versoes.get(namespace, 0) for namespace in namespaces]
+
+    def incrementar(self, namespace: str) -> None:
+        with self._lock:
+            self._versoes[namespace] = self._versoes.get(namespace, 0) + 1
+
+    def get(self, chave: str) -> bytes | None:
+        return self._itens.get(chave)
+
+    def set(self, chave: str, valor: bytes) -> None:
+        self._itens.set(chave, valor)
+
+    def limpar(self) -> None:
+        self._itens.invalidate()
+
+    def metrics(self) -> dict:
+        return {"backend": "memoria", **self._itens.metrics()}
+
+
+class RedisBackend:
+    '''Backend compartilhado entre processos/workers
+
+    Aceita qualquer cliente com a interface do redis-py (get/set/mget/incr), por
+    exemplo fakeredis.FakeRedis em desenvolvimento. As versões não expiram; as
+    respostas expiram com SET ... EX ttl.
+    '''
+
+    def __init__(self, cliente, ttl: float, prefixo: str = "ceva:respostas:"):
+        self._cliente = cliente
+        self.ttl = ttl
+        self.prefixo = prefixo
+        self.acertos = 0
+        self.faltas = 0
+
+    def versoes(self, namespaces: Iterable[str]) -> list[int]:
+        valores = self._cliente.mget([f"{self.prefixo}versao:{namespace}" for namespace in namespaces])
+        return [int(valor or 0) for valor in valores]
+
+    def incrementar(self, namespace: str) -> None:
+        self._cliente.incr(f"{self.prefixo}versao:{namespace}")
+
+    def get(self, chave: str) -> bytes | None:
+        valor = self._cliente.get(self.prefixo + chave)
+        if valor is None:
+            self.faltas += 1
+        else:
+            self.acertos += 1
+        return valor
+
+    def set(self, chave: str, valor: bytes) -> None:
+        self._cliente.set(self.prefixo + chave, valor, ex=max(int(self.ttl), 1))
+
+    def limpar(self) -> None:
+        for chave in self._cliente.scan_iter(f"{self.prefixo}*"):
+            self._cliente.delete(chave)
+
+    def metrics(self) -> dict:
+        return {"backend": "redis", "ttl": self.ttl, "acertos": self.acertos, "faltas": self.faltas}
+
+
+def criar_backend(url: str | None, ttl: float, workers: int = 1):
+    '''memoria (padrão, um worker), redis://... ou fakeredis:// para simular o Redis localmente'''
+    if not url or url == "memoria":
+        if workers > 1 and ttl > 0:
+            raise RuntimeError(
+                f"Cache de respostas em memória com {workers} workers serviria dados desatualizados: "
+                "defina RESPONSE_CACHE_URL=redis://... ou RESPONSE_CACHE_TTL=0"
+            )
+        return MemoriaBackend(ttl)
+    if url.startswith("fakeredis://"):
+        import fakeredis
+
+        return RedisBackend(fakeredis.FakeRedis(), ttl)
+    import redis
+
+    return RedisBackend(redis.Redis.from_url(url), ttl)
+
+
+class CacheRespostas:
+    def __init__(self, backend, ativo: bool = True):
+        self.backend = backend
+        self.ativo = ativo
+
+    @staticmethod
+    def regra(caminho: str, query: str) -> tuple[str, ...] | None:
+        '''Namespaces da rota, ou None se a requisição não pode ser servida do cache'''
+        regra = ROTAS_CACHEADAS.get(caminho)
+        if regra is None:
+            return None
+        namespaces, parametros_excluidos = regra
+        if parametros_excluidos and any(
+            parametro.split("=", 1)[0] in parametros_excluidos for parametro in query.split("&")
+        ):
+            return None
+        return namespaces
+
+    def chave(self, caminho: str, query: str, namespaces: tuple[str, ...]) -> str:
+        '''Rota + parâmetros (ordenados) + versões atuais dos namespaces'''
+        parametros = "&".join(sorted(parametro for parametro in query.split("&") if parametro))
+        versoes = ".".join(str(versao) for versao in self.backend.versoes(namespaces))
+        resumo = hashlib.sha1(parametros.encode()).hexdigest()
+        return f"{caminho}?{resumo}@{versoes}"
+
+    def get(self, chave: str) -> bytes | None:
+        return self.backend.get(chave)
+
+    def set(self, chave: str, valor: bytes) -> None:
+        self.backend.set(chave, valor)
+
+    def invalidar(self, *namespaces: str) -> None:
+        '''Chamado pelos repositories após o commit de uma escrita'''
+        if not self.ativo:
+            return
+        for namespace in namespaces:
+            self.backend.incrementar(namespace)
+
+    def metrics(self) -> dict:
+        return {"ativo": self.ativo, **self.backend.metrics()}
+
+
+def _empacotar(cabecalhos: list[tuple[bytes, bytes]], corpo: bytes) -> bytes:
+    '''Cabeçalhos e corpo em um único valor de bytes (compatível com o Redis)'''
+    linhas = b"\n".join(nome + b":" + valor for nome, valor in cabecalhos)
+    return len(linhas).to_bytes(4, "big") + linhas + corpo
+
+
+def _desempacotar(valor: bytes) -> tuple[list[tuple[bytes, bytes]], bytes]:
+    tamanho = int.from_bytes(valor[:4], "big")
+    linhas = valor[4:4 + tamanho]
+    cabecalhos = [tuple(linha.split(b":", 1)) for linha in linhas.split(b"\n")] if linhas else []
+    return cabecalhos, valor[4 + tamanho:]
+
+
+class CacheRespostasMiddleware:
+    '''Middleware ASGI que serve e preenche o cache das rotas em ROTAS_CACHEADAS
+
+    Somente GETs com status 200 são guardados. As respostas indicam X-Cache: HIT/MISS.
+    Um acerto cuja ETag confere com o If-None-Match vira 304 sem corpo.
+    '''
+
+    def __init__(self, app, cache: "CacheRespostas"):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not self.cache.ativo:
+            await self.app(scope, receive, send)
+            return
+        query = scope.get("query_string", b"").decode("latin-1")
+        namespaces = self.cache.regra(scope["path"], query)
+        if namespaces is None:
+            await self.app(scope, receive, send)
+            return
+
+        chave = self.cache.chave(scope["path"], query, namespaces)
+        valor = self.cache.get(chave)
+        if valor is not None:
+            cabecalhos, corpo = _desempacotar(valor)
+            if_none_match = dict(scope["headers"]).get(b"if-none-match")
+            etag = dict(cabecalhos).get(b"etag")
+            if if_none_match and etag and etag_confere(if_none_match.decode("latin-1"), etag.decode("latin-1")):
+                await send({
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [
+                        (nome, valor) for nome, valor in cabecalhos if nome in (b"etag", b"cache-control")
+                    ] + [(CACHE_HEADER.lower().encode(), b"HIT")],
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    *cabecalhos,
+                    (b"content-length", str(len(corpo)).encode()),
+                    (CACHE_HEADER.lower().encode(), b"HIT"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": corpo})
+            return
+
+        inicio: dict = {}
+        partes: list[bytes] = []
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                inicio.update(mensagem)
+                mensagem = {**mensagem, "headers": [*mensagem.get("headers", []), (CACHE_HEADER.lower().encode(), b"MISS")]}
+            elif mensagem["type"] == "http.response.body" and inicio.get("status") == 200:
+                partes.append(mensagem.get("body", b""))
+                if not mensagem.get("more_body", False):
+                    cabecalhos = [
+                        (nome, valor) for nome, valor in inicio.get("headers", [])
+                        if nome.lower() in CABECALHOS_CACHEADOS
+                    ]
+                    # A chave usa as versões lidas antes da consulta: se houve escrita
+                    # no meio tempo, a entrada fica órfã e expira pelo TTL
+                    self.cache.set(chave, _empacotar(cabecalhos, b"".join(partes)))
+            await send(mensagem)
+
+        await self.app(scope, receive, enviar)
+
+
+cache_respostas = CacheRespostas(
+    criar_backend(settings.response_cache_url, settings.response_cache_ttl, settings.web_concurrency),
+    ativo=settings.response_cache_ttl > 0,
+)
@@ -1,13 +1,50 @@
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from ..model.model import Carros
+from ..importacao import CRIADO, LinhaImportacao, erro_linha
+from ..model.model import Avaliacao, AvaliacaoResumo, Carros, Localizacao, Reserva, StatusCarro
+from ..pagination import Page, PageParams, paginate
+from ..repository import AsyncRepository, BaseRepository, inserir_varios
+from ..reservas.repository import STATUS_ATIVOS, ReservasRepository
+from ..reservas.rollups import RollupsService
+
+
+class CarrosRepository(BaseRepository):
+    model = Carros
+    nao_encontrado = "Carro não encontrado"
+    cache_namespaces = ("carros",)
 
+    FILTROS = {
+        "marca": Carros.marca,
+        "modelo": Carros.modelo,
+        "categoria": Carros.categoria,
+        "status": Carros.status,
+        "ano": Carros.ano,
+        "disponivel": Carros.disponivel,
+        "destaque": Carros.destaque,
+        "localizacaoId": Carros.localizacaoId,
+    }
+    ORDENACOES = {"id": Carros.id, "criadoEm": Carros.criadoEm, "precoDia": Carros.precoDia}
+    COLUNAS_LISTAGEM = (
+        Carros.id, Carros.placa, Carros.marca, Carros.modelo, Carros.ano, Carros.cor, Carros.precoDia,
+        Carros.categoria, Carros.status, Carros.descricao, Carros.disponivel, Carros.destaque,
+        Carros.localizacaoId, Carros.criadoEm, Carros.atualizadoEm,
+    )
 
-class CarrosRepository:
     @staticmethod
-    def find_all(database: Session) -> list[Carros]:
-        '''Função para fazer uma query de todos os carros da DB'''
-        return database.query(Carros).all()
+    def find_all(database: Session, params: PageParams) -> Page:
+        '''Função para fazer uma query paginada por cursor de todos os carros da DB'''
+        return paginate(
+            database,
+            CarrosRepository.projecao(),
+            params,
+            id_coluna=Carros.id,
+            ordenacoes=CarrosRepository.ORDENACOES,
+            filtros=CarrosRepository.FILTROS,
+        )
 
     @staticmethod
     def save(database: Session, carros: Carros) -> Carros:
@@ -17,26 +54,61 @@ class CarrosRepository:
         else:
             database.add(carros)
         database.commit()
+        CarrosRepository._invalidar_cache()
         database.refresh(carros)
         return carros
 
     @staticmethod
-    def find_by_id(database: Session, id: int) -> Carros:
-        '''Função para fazer uma query por ID de um objeto carro na DB'''
-        return database.query(Carros).filter(Carros.id == id).first()
+    def bulk_insert(database: Session, linhas: list[tuple[int, dict]], repetir: bool = True) -> list[LinhaImportacao]:
+        '''Insere um lote de carros já validados em uma transação e relata cada linha
 
-    @staticmethod
-    def exists_by_id(database: Session, id: int) -> bool:
-        '''Função que verifica se o ID dado existe na DB'''
-        return database.query(Carros).filter(Carros.id == id).first() is not None
+        Placas repetidas (no lote ou já cadastradas) e localizacaoId inexistente são
+        recusadas com duas queries IN antes do INSERT.
+        '''
+        placas = {dados["placa"] for _, dados in linhas}
+        localizacoes = {dados["localizacaoId"] for _, dados in linhas if dados.get("localizacaoId") is not None}
+        cadastradas = set(database.scalars(select(Carros.placa).where(Carros.placa.in_(placas))))
+        existentes = set(database.scalars(select(Localizacao.id).where(Localizacao.id.in_(localizacoes))))
 
-    @staticmethod
-    def delete_by_id(database: Session, id: int) -> None:
-        '''Função para excluir um objeto carro da DB dado o ID'''
-        carros = database.query(Carros).filter(Carros.id == id).first()
-        if carros is not None:
-            database.delete(carros)
+        relatorio, validas, vistas = [], [], set()
+        for numero, dados in linhas:
+            if dados["placa"] in cadastradas or dados["placa"] in vistas:
+                relatorio.append(erro_linha(numero, f"Placa duplicada: {dados['placa']}"))
+            elif dados.get("localizacaoId") is not None and dados["localizacaoId"] not in existentes:
+                relatorio.append(erro_linha(numero, f"Localização não encontrada: {dados['localizacaoId']}"))
+            else:
+                vistas.add(dados["placa"])
+                validas.append((numero, dados))
+
+        try:
+            ids = inserir_varios(database, Carros.__table__, [dados for _, dados in validas])
             database.commit()
+        except IntegrityError:
+            database.rollback()
+            if not repetir:
+                raise
+            # Outra importação gravou as mesmas placas entre a checagem e o INSERT: refaz o lote
+            return CarrosRepository.bulk_insert(database, linhas, repetir=False)
+        CarrosRepository._invalidar_cache()
+        relatorio.extend(
+            LinhaImportacao(linha=numero, status=CRIADO, id=id) for (numero, _), id in zip(validas, ids, strict=False)
+        )
+        return relatorio
+
+    @staticmethod
+    def _delete_dependentes(database: Session, id: int) -> None:
+        '''Remove as avaliações do carro (cascade do relacionamento) e o resumo delas'''
+        database.execute(delete(Avaliacao).where(Avaliacao.carroId == id))
+        database.execute(delete(AvaliacaoResumo).where(AvaliacaoResumo.carroId == id))
+
+    @classmethod
+    def update_by_id(cls, database: Session, id: int, valores: dict):
+        '''Como BaseRepository.update_by_id; trocar a categoria move as reservas do carro nos agregados no mesmo commit'''
+        if "categoria" in valores:
+            antiga = database.scalar(select(Carros.categoria).where(Carros.id == id).with_for_update())
+            if antiga is not None and antiga != valores["categoria"]:
+                RollupsService.recategorizar(database, id, antiga, valores["categoria"])
+        return super().update_by_id(database, id, valores)
 
     @staticmethod
     def count_all(database: Session) -> int:
@@ -59,11 +131,68 @@ class CarrosRepository:
         return database.query(Carros).filter(Carros.marca.ilike(f"%{marca}%")).all()
 
     @staticmethod
-    def find_disponivel(database: Session) -> list[Carros]:
+    def find_disponivel(database: Session, localizacao_id: int | None = None, categoria: str | None = None) -> list[Carros]:
         '''Função para fazer uma query de todos os carros disponíveis da DB'''
-        return database.query(Carros).filter(Carros.disponivel.is_(True)).all()
+        query = database.query(Carros).filter(Carros.disponivel.is_(True))
+        if localizacao_id is not None:
+            query = query.filter(Carros.localizacaoId == localizacao_id)
+        if categoria is not None:
+            query = query.filter(Carros.categoria == categoria)
+        return query.all()
+
+    @staticmethod
+    def find_disponivel_periodo(
+        database: Session,
+        inicio: datetime,
+        fim: datetime,
+        localizacao_id: int | None = None,
+        categoria: str | None = None,
+    ) -> list[Carros]:
+        '''Função para fazer uma query dos carros sem reserva ativa no período [inicio, fim)
+
+        Um único anti-join (NOT EXISTS) servido pelo índice ix_reservas_carro_status_periodo.
+        Carros em manutenção ficam de fora; o flag disponivel reflete apenas o momento atual.
+        '''
+        stmt = select(Carros).where(
+            Carros.status != StatusCarro.MANUTENCAO,
+            ~ReservasRepository.ocupacao(Carros.id, inicio, fim),
+        )
+        if localizacao_id is not None:
+            stmt = stmt.where(Carros.localizacaoId == localizacao_id)
+        if categoria is not None:
+            stmt = stmt.where(Carros.categoria == categoria)
+        return list(database.scalars(stmt.order_by(Carros.id)))
+
+    @staticmethod
+    def calendario(database: Session, carro_id: int, de: datetime, ate: datetime) -> list[tuple[datetime, datetime]]:
+        '''Intervalos ocupados do carro em [de, ate), já unidos e recortados ao período
+
+        Varre só o trecho do índice ix_reservas_carro_status_periodo do carro e dos
+        status ativos com dataRetirada < ate; reservas encostadas ou sobrepostas viram
+        um único intervalo.
+        '''
+        reservas = database.execute(
+            select(Reserva.dataRetirada, Reserva.dataDevolucao)
+            .where(
+                Reserva.carroId == carro_id,
+                Reserva.status.in_(STATUS_ATIVOS),
+                Reserva.dataRetirada < ate,
+                Reserva.dataDevolucao > de,
+            )
+            .order_by(Reserva.dataRetirada)
+        ).all()
+        ocupados: list[list[datetime]] = []
+        for inicio, fim in reservas:
+            if ocupados and inicio <= ocupados[-1][1]:
+                ocupados[-1][1] = max(ocupados[-1][1], fim)
+            else:
+                ocupados.append([inicio, fim])
+        return [(max(inicio, de), min(fim, ate)) for inicio, fim in ocupados]
 
     @staticmethod
     def find_destaque(database: Session) -> list[Carros]:
         '''Função para fazer uma query de todos os carros em destaque da DB'''
         return database.query(Carros).filter(Carros.destaque.is_(True)).all()
+
+
+AsyncCarrosRepository = AsyncRepository(CarrosRepository)
@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from ..condicional import condicional_item, condicional_lista
+from ..database import get_async_db as get_async_database
 from ..database import get_db as get_database
+from ..datas import DataLocal
+from ..importacao import ImportacaoResponse, importar
 from ..model.model import Carros
-from .repository import CarrosRepository
-from .schema import CarrosRequest, CarrosResponse, CarrosUpdateRequest
+from ..pagination import PageParams, page_params
+from ..serializacao import resposta_lista
+from .repository import AsyncCarrosRepository, CarrosRepository
+from .schema import CalendarioResponse, CarrosRequest, CarrosResponse, CarrosUpdateRequest
+
+# Janela padrão do widget de reserva e limite de cada consulta
+CALENDARIO_DIAS_PADRAO = 90
+CALENDARIO_DIAS_MAXIMO = 366
 
 router = APIRouter(
     prefix = '/carros',
@@ -22,94 +35,144 @@ def create(request: CarrosRequest, database: Session = Depends(get_database)):
     carros = CarrosRepository.save(database, Carros(**request.dict()))
     return carros
 
+# BULK CREATE
+@router.post("/bulk", response_model = ImportacaoResponse)
+async def bulk_create(request: Request, database: AsyncSession = Depends(get_async_database)):
+    '''Importa carros em lote de um array JSON ou de um CSV (text/csv), com o resultado de cada linha'''
+    return await importar(
+        request, CarrosRequest, lambda lote: AsyncCarrosRepository.bulk_insert(database, lote)
+    )
+
 # READ ALL
-@router.get("/", response_model = list[CarrosResponse])
-def find_all(database: Session = Depends(get_database)):
-    '''Faz uma query de todos os objetos carro na DB (sem paginação)'''
-    carros = CarrosRepository.find_all(database)
-    return [CarrosResponse.from_orm(carro) for carro in carros]
+@router.get("/", response_model = list[CarrosResponse], dependencies = [condicional_lista(Carros, assincrona=True)])
+async def find_all(
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: AsyncSession = Depends(get_async_database),
+):
+    '''Faz uma query paginada por cursor dos objetos carro na DB (próximo cursor em X-Next-Cursor)'''
+    pagina = await AsyncCarrosRepository.find_all(database, params)
+    pagina.aplicar_headers(response)
+    return resposta_lista(CarrosResponse, pagina.itens, response)
+
+# GET DISPONIVEL
+@router.get("/disponivel", response_model = list[CarrosResponse])
+@router.get("/disponivel/", response_model = list[CarrosResponse])
+async def find_disponivel(
+    inicio: DataLocal | None = None,
+    fim: DataLocal | None = None,
+    localizacaoId: int | None = None,
+    categoria: str | None = None,
+    database: AsyncSession = Depends(get_async_database),
+):
+    '''Faz uma query dos carros disponíveis na DB; com inicio/fim, dos carros sem reserva ativa no período'''
+    if inicio is None and fim is None:
+        carros = await AsyncCarrosRepository.find_disponivel(database, localizacaoId, categoria)
+        return resposta_lista(CarrosResponse, carros)
+
+    if inicio is None or fim is None:
+        raise HTTPException(
+            status_code = status.HTTP_400_BAD_REQUEST, detail = "Informe inicio e fim do período"
+        )
+    if fim <= inicio:
+        raise HTTPException(
+            status_code = status.HTTP_400_BAD_REQUEST, detail = "Data de fim deve ser posterior à data de início"
+        )
+    carros = await AsyncCarrosRepository.find_disponivel_periodo(database, inicio, fim, localizacaoId, categoria)
+    return resposta_lista(CarrosResponse, carros)
 
 # READ BY ID
-@router.get("/{id}", response_model = CarrosResponse)
-def find_by_id(id: int, database: Session = Depends(get_database)):
+@router.get("/{id}", response_model = CarrosResponse, dependencies = [condicional_item(Carros, assincrona=True)])
+async def find_by_id(id: int, database: AsyncSession = Depends(get_async_database)):
     '''Dado o ID como parâmetro, encontra o carro com esse ID'''
-    carro = CarrosRepository.find_by_id(database, id)
-    if not carro:
+    carro = await AsyncCarrosRepository.get_or_404(database, id)
+    return CarrosResponse.from_orm(carro)
+
+# CALENDÁRIO DE OCUPAÇÃO
+@router.get("/{id}/calendario", response_model = CalendarioResponse)
+async def calendario(
+    id: int,
+    de: DataLocal | None = Query(None, description = "Início do período (padrão: agora)"),
+    ate: DataLocal | None = Query(None, description = f"Fim do período (padrão: de + {CALENDARIO_DIAS_PADRAO} dias)"),
+    database: AsyncSession = Depends(get_async_database),
+):
+    '''Intervalos em que o carro está reservado (pendente ou confirmada) no período, unidos e ordenados'''
+    de = de or datetime.now().replace(microsecond = 0)
+    ate = ate or de + timedelta(days = CALENDARIO_DIAS_PADRAO)
+    if ate <= de:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail = "Carro não encontrado"
+            status_code = status.HTTP_400_BAD_REQUEST, detail = "Data de fim deve ser posterior à data de início"
         )
-    return CarrosResponse.from_orm(carro)
+    if ate - de > timedelta(days = CALENDARIO_DIAS_MAXIMO):
+        raise HTTPException(
+            status_code = status.HTTP_400_BAD_REQUEST,
+            detail = f"Período máximo do calendário: {CALENDARIO_DIAS_MAXIMO} dias"
+        )
+    if not await AsyncCarrosRepository.exists_by_id(database, id):
+        raise HTTPException(
+            status_code = status.HTTP_404_NOT_FOUND, detail = "Carro não encontrado"
+        )
+    ocupados = await AsyncCarrosRepository.calendario(database, id, de, ate)
+    return {
+        "carroId": id,
+        "de": de,
+        "ate": ate,
+        "ocupados": [{"inicio": inicio, "fim": fim} for inicio, fim in ocupados],
+    }
 
 # UPDATE BY ID
 @router.put("/{id}", response_model = CarrosResponse)
 def update(id: int, request: CarrosUpdateRequest, database: Session = Depends(get_database)):
     '''Dado o ID do carro, atualiza os dados na DB por meio do método PUT'''
-    if not CarrosRepository.exists_by_id(database, id):
+    # Um único UPDATE ... RETURNING com os campos fornecidos
+    carro_atualizado = CarrosRepository.update_by_id(database, id, request.dict(exclude_unset=True))
+    if carro_atualizado is None:
         raise HTTPException(
             status_code = status.HTTP_404_NOT_FOUND, detail = "Carro não encontrado"
         )
-    
-    # Buscar o carro existente
-    carro_existente = CarrosRepository.find_by_id(database, id)
-    
-    # Atualizar os campos fornecidos
-    update_data = request.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(carro_existente, field, value)
-    
-    # Salvar as alterações
-    carro_atualizado = CarrosRepository.save(database, carro_existente)
     return CarrosResponse.from_orm(carro_atualizado)
 
 # DELETE BY ID
 @router.delete("/{id}", status_code = status.HTTP_204_NO_CONTENT)
 def delete_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID do carro, deleta o objeto da DB por meio do método DELETE'''
-    if not CarrosRepository.exists_by_id(database, id):
+    if not CarrosRepository.delete_by_id(database, id):
         raise HTTPException(
             status_code = status.HTTP_404_NOT_FOUND, detail="Carro não encontrado"
         )
-    CarrosRepository.delete_by_id(database, id)
     return Response(status_code = status.HTTP_204_NO_CONTENT)
 
 # GET COUNT ALL
 @router.get("/count/")
-def count_all(database: Session = Depends(get_database)):
+async def count_all(database: AsyncSession = Depends(get_async_database)):
     '''Faz uma query de contagem de carros na DB (sem paginação)'''
-    count = CarrosRepository.count_all(database)
+    count = await AsyncCarrosRepository.count_all(database)
     return {"count":count}
 
 # GET COUNT DISPONIVEL
 @router.get("/count/disponivel")
-def count_disponivel(database: Session = Depends(get_database)):
+async def count_disponivel(database: AsyncSession = Depends(get_async_database)):
     '''Faz uma query de contagem de carros disponíveis na DB (sem paginação)'''
-    count_disponivel = CarrosRepository.count_disponivel(database)
+    count_disponivel = await AsyncCarrosRepository.count_disponivel(database)
     return {"count":count_disponivel}
 
 # GET COUNT DESTAQUE
 @router.get("/count/destaque")
-def count_destaque(database: Session = Depends(get_database)):
+async def count_destaque(database: AsyncSession = Depends(get_async_database)):
     '''Faz uma query de contagem de carros em destaque na DB (sem paginação)'''
-    count_destaque = CarrosRepository.count_destaque(database)
+    count_destaque = await AsyncCarrosRepository.count_destaque(database)
     return {"count":count_destaque}
 
 # GET BY MARCA
 @router.get("/marca/{marca}", response_model = list[CarrosResponse])
-def find_by_marca(marca: str, database: Session = Depends(get_database)):
+async def find_by_marca(marca: str, database: AsyncSession = Depends(get_async_database)):
     '''Dado a marca como parâmetro, encontra os carros com essa marca'''
-    carros = CarrosRepository.find_by_marca(database, marca)
-    return [CarrosResponse.from_orm(carro) for carro in carros]
-
-# GET DISPONIVEL
-@router.get("/disponivel/", response_model = list[CarrosResponse])
-def find_disponivel(database: Session = Depends(get_database)):
-    '''Faz uma query de todos os carros disponíveis na DB'''
-    carros = CarrosRepository.find_disponivel(database)
-    return [CarrosResponse.from_orm(carro) for carro in carros]
+    carros = await AsyncCarrosRepository.find_by_marca(database, marca)
+    return resposta_lista(CarrosResponse, carros)
 
 # GET DESTAQUE
 @router.get("/destaque/", response_model = list[CarrosResponse])
-def find_destaque(database: Session = Depends(get_database)):
+async def find_destaque(database: AsyncSession = Depends(get_async_database)):
     '''Faz uma query de todos os carros em destaque na DB'''
-    carros = CarrosRepository.find_destaque(database)
-    return [CarrosResponse.from_orm(carro) for carro in carros]
+    carros = await AsyncCarrosRepository.find_destaque(database)
+    return resposta_lista(CarrosResponse, carros)
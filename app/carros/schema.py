@@ -52,3 +52,15 @@ class CarrosCountResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class IntervaloOcupadoResponse(BaseModel):
+    '''Período [inicio, fim) em que o carro tem reserva pendente ou confirmada'''
+    inicio: datetime
+    fim: datetime
+
+class CalendarioResponse(BaseModel):
+    '''Classe para resposta do calendário de ocupação de um carro'''
+    carroId: int
+    de: datetime
+    ate: datetime
+    ocupados: list[IntervaloOcupadoResponse]
@@ -1,15 +1,21 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
-from ..database import Base, get_db
+from ..cache_respostas import MemoriaBackend, criar_backend
+from ..database import Base, get_async_db, get_db
 from ..main import app
 
 # Configuração do banco de dados de teste
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test_carros.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# NullPool: o TestClient usa um event loop por requisição
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_carros.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 
 Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
@@ -21,7 +27,12 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 client = TestClient(app)
 
@@ -163,3 +174,165 @@ def test_count_carros():
     data = response.json()
     assert "count" in data
     assert isinstance(data["count"], int)
+
+def test_read_carros_paginado():
+    for i in range(3):
+        client.post(
+            "/carros/",
+            json={
+                "placa": f"PAG{i}X00",
+                "marca": "Fiat",
+                "modelo": "Uno",
+                "ano": 2020,
+                "cor": "Branco",
+                "precoDia": 90.0,
+                "categoria": "Paginacao",
+            },
+        )
+
+    response = client.get("/carros/", params={"categoria": "Paginacao", "limit": 2})
+    assert response.status_code == 200
+    primeira = response.json()
+    assert len(primeira) == 2
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(
+        "/carros/", params={"categoria": "Paginacao", "limit": 2, "cursor": cursor}
+    )
+    assert response.status_code == 200
+    segunda = response.json()
+    assert len(segunda) == 1
+    assert "X-Next-Cursor" not in response.headers
+    assert segunda[0]["id"] > primeira[-1]["id"]
+
+def test_read_carros_filtro_invalido():
+    response = client.get("/carros/", params={"inexistente": "x"})
+    assert response.status_code == 400
+
+def test_update_delete_carro_inexistente():
+    response = client.put("/carros/999999", json={"cor": "Preto"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Carro não encontrado"
+
+    response = client.delete("/carros/999999")
+    assert response.status_code == 404
+
+def test_busca_carros_e_localizacoes():
+    resp = client.post("/localizacoes/", json={"nome": "Agência Aeroporto", "endereco": "Terminal 2"})
+    localizacao_id = resp.json()["id"]
+    client.post(
+        "/carros/",
+        json={
+            "placa": "BUS1C00",
+            "marca": "Volkswagen",
+            "modelo": "Nivus",
+            "ano": 2024,
+            "cor": "Cinza",
+            "precoDia": 210.0,
+            "categoria": "SUV",
+            "descricao": "Teto solar e câmbio automático",
+            "localizacaoId": localizacao_id,
+        },
+    )
+
+    # Prefixo, sem acento e em qualquer coluna indexada
+    resp = client.get("/busca/", params={"q": "volks niv"})
+    assert resp.status_code == 200
+    carros = resp.json()["carros"]
+    assert [carro["placa"] for carro in carros] == ["BUS1C00"]
+    assert carros[0]["relevancia"] > 0
+
+    resp = client.get("/busca/", params={"q": "cambio automatico"})
+    assert "BUS1C00" in [carro["placa"] for carro in resp.json()["carros"]]
+
+    resp = client.get("/busca/", params={"q": "agencia aeroporto"})
+    assert [item["id"] for item in resp.json()["localizacoes"]] == [localizacao_id]
+
+    # Atualizações são refletidas pelos triggers do índice
+    carro_id = carros[0]["id"]
+    client.put(f"/carros/{carro_id}", json={"modelo": "Taos"})
+    assert client.get("/busca/", params={"q": "nivus"}).json()["carros"] == []
+
+    assert client.get("/busca/", params={"q": "x"}).status_code == 422
+
+def test_cache_catalogo_invalidado_nas_escritas():
+    resp = client.get("/carros/count/destaque")
+    assert resp.headers["X-Cache"] == "MISS"
+    total = resp.json()["count"]
+
+    # Acerto servido sem resolver a sessão do banco
+    def sem_banco():
+        raise AssertionError("acerto de cache não deveria abrir sessão")
+
+    anterior = app.dependency_overrides[get_async_db]
+    app.dependency_overrides[get_async_db] = sem_banco
+    try:
+        resp = client.get("/carros/count/destaque")
+    finally:
+        app.dependency_overrides[get_async_db] = anterior
+    assert resp.headers["X-Cache"] == "HIT"
+    assert resp.json()["count"] == total
+
+    resp = client.post(
+        "/carros/",
+        json={
+            "placa": "CAC1E00",
+            "marca": "Jeep",
+            "modelo": "Compass",
+            "ano": 2024,
+            "cor": "Preto",
+            "precoDia": 250.0,
+            "categoria": "SUV",
+            "destaque": True,
+        },
+    )
+    carro_id = resp.json()["id"]
+    resp = client.get("/carros/count/destaque")
+    assert resp.headers["X-Cache"] == "MISS"
+    assert resp.json()["count"] == total + 1
+
+    client.put(f"/carros/{carro_id}", json={"destaque": False})
+    assert client.get("/carros/count/destaque").json()["count"] == total
+
+def test_cache_em_memoria_recusa_varios_workers():
+    # Versões por processo: uma escrita não invalidaria os outros workers
+    with pytest.raises(RuntimeError):
+        criar_backend("memoria", 30, workers=4)
+    assert isinstance(criar_backend(None, 0, workers=4), MemoriaBackend)
+
+def test_importacao_em_lote():
+    csv_localizacoes = 'nome,endereco\nAgência Norte,"Av. Norte, 100"\nAgência Sul,"Rua Sul, 5\nsala 2"\n,Sem nome\n'
+    resp = client.post(
+        "/localizacoes/bulk", content=csv_localizacoes.encode(), headers={"Content-Type": "text/csv"}
+    )
+    assert resp.status_code == 200
+    relatorio = resp.json()
+    assert (relatorio["total"], relatorio["criados"], relatorio["erros"]) == (3, 2, 1)
+    localizacao_id = relatorio["linhas"][0]["id"]
+    assert relatorio["linhas"][2]["status"] == "erro"
+    assert client.get(f"/localizacoes/{localizacao_id}").json()["endereco"] == "Av. Norte, 100"
+
+    base = {"marca": "Renault", "modelo": "Kwid", "ano": 2024, "cor": "Branco", "precoDia": 95.0, "categoria": "Hatch"}
+    carros = [
+        {**base, "placa": "BLK0A01", "localizacaoId": localizacao_id},
+        {**base, "placa": "BLK0A02"},
+        {**base, "placa": "BLK0A01"},
+        {**base, "placa": "AAA1A11"},
+        {**base, "placa": "BLK0A03", "localizacaoId": 999999},
+        {"placa": "BLK0A04"},
+    ]
+    resp = client.post("/carros/bulk", json=carros)
+    assert resp.status_code == 200
+    relatorio = resp.json()
+    assert relatorio["criados"] == 2
+    status_linhas = {linha["linha"]: (linha["status"], linha["erro"]) for linha in relatorio["linhas"]}
+    assert status_linhas[1][0] == status_linhas[2][0] == "criado"
+    assert "Placa duplicada" in status_linhas[3][1]
+    assert "Placa duplicada" in status_linhas[4][1]
+    assert "Localização não encontrada" in status_linhas[5][1]
+    assert "marca" in status_linhas[6][1]
+
+    carro = client.get(f"/carros/{relatorio['linhas'][0]['id']}").json()
+    assert (carro["placa"], carro["localizacaoId"]) == ("BLK0A01", localizacao_id)
+
+    assert client.post("/carros/bulk", json={"placa": "x"}).status_code == 400
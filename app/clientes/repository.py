@@ -1,14 +1,37 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from ..avaliacoes.repository import AvaliacoesRepository
 from ..model.model import Cliente
-from ..security import verify_password
+from ..pagination import Page, PageParams, paginate
+from ..repository import AsyncRepository, BaseRepository
+from ..reservas.rollups import RollupsService
+from ..security import verify_and_update_password
 
 
-class ClientesRepository:
+class ClientesRepository(BaseRepository):
+    model = Cliente
+    nao_encontrado = "Cliente não encontrado"
+
+    FILTROS = {"email": Cliente.email, "cpf": Cliente.cpf, "cnh": Cliente.cnh}
+    ORDENACOES = {"id": Cliente.id, "criadoEm": Cliente.criadoEm}
+    # Sem senha: o hash nunca sai da camada de banco nas listagens
+    COLUNAS_LISTAGEM = (
+        Cliente.id, Cliente.nome, Cliente.email, Cliente.telefone, Cliente.cnh, Cliente.cpf,
+        Cliente.dataCadastro, Cliente.criadoEm, Cliente.atualizadoEm,
+    )
+
     @staticmethod
-    def find_all(database: Session) -> list[Cliente]:
-        '''Função para fazer uma query de todos os clientes da DB'''
-        return database.query(Cliente).all()
+    def find_all(database: Session, params: PageParams) -> Page:
+        '''Função para fazer uma query paginada por cursor de todos os clientes da DB'''
+        return paginate(
+            database,
+            ClientesRepository.projecao(),
+            params,
+            id_coluna=Cliente.id,
+            ordenacoes=ClientesRepository.ORDENACOES,
+            filtros=ClientesRepository.FILTROS,
+        )
 
     @staticmethod
     def save(database: Session, cliente: Cliente) -> Cliente:
@@ -22,22 +45,10 @@ class ClientesRepository:
         return cliente
 
     @staticmethod
-    def find_by_id(database: Session, id: int) -> Cliente:
-        '''Função para fazer uma query por ID de um objeto cliente na DB'''
-        return database.query(Cliente).filter(Cliente.id == id).first()
-
-    @staticmethod
-    def exists_by_id(database: Session, id: int) -> bool:
-        '''Função que verifica se o ID dado existe na DB'''
-        return database.query(Cliente).filter(Cliente.id == id).first() is not None
-
-    @staticmethod
-    def delete_by_id(database: Session, id: int) -> None:
-        '''Função para excluir um objeto cliente da DB dado o ID'''
-        cliente = database.query(Cliente).filter(Cliente.id == id).first()
-        if cliente is not None:
-            database.delete(cliente)
-            database.commit()
+    def _delete_dependentes(database: Session, id: int) -> None:
+        '''Desconta dos agregados as avaliações e reservas que o cascade vai excluir'''
+        AvaliacoesRepository.descontar_cliente(database, id)
+        RollupsService.descontar_cliente(database, id)
 
     @staticmethod
     def find_by_email(database: Session, email: str) -> Cliente:
@@ -55,14 +66,23 @@ class ClientesRepository:
         return database.query(Cliente).filter(Cliente.cnh == cnh).first()
 
     @staticmethod
-    def authenticate(database: Session, email: str, senha: str) -> Cliente:
-        '''Função para autenticar um cliente'''
-        cliente = ClientesRepository.find_by_email(database, email)
-        if cliente and verify_password(senha, cliente.senha):
-            return cliente
-        return None
+    async def authenticate(database: AsyncSession, email: str, senha: str) -> Cliente | None:
+        '''Função para autenticar um cliente; o bcrypt roda no pool dedicado e hashes antigos são refeitos'''
+        cliente = await database.run_sync(ClientesRepository.find_by_email, email)
+        if not cliente:
+            return None
+        valida, novo_hash = await verify_and_update_password(senha, cliente.senha)
+        if not valida:
+            return None
+        if novo_hash:
+            cliente.senha = novo_hash
+            await database.commit()
+        return cliente
 
     @staticmethod
     def count_all(database: Session) -> int:
         '''Função para fazer uma query de contagem de todos os clientes da DB'''
         return database.query(Cliente).count()
+
+
+AsyncClientesRepository = AsyncRepository(ClientesRepository)
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from ..condicional import condicional_item, condicional_lista
+from ..database import get_async_db as get_async_database
 from ..database import get_db as get_database
 from ..model.model import Cliente
-from ..security import get_password_hash
-from .repository import ClientesRepository
+from ..pagination import PageParams, page_params
+from ..security import hash_password
+from ..serializacao import resposta_lista
+from .repository import AsyncClientesRepository, ClientesRepository
 from .schema import (
     ClienteLoginRequest,
     ClienteLoginResponse,
@@ -24,24 +29,24 @@ router = APIRouter(
     response_model=ClienteResponse,
     status_code=status.HTTP_201_CREATED
 )
-def create(request: ClienteRequest, database: Session = Depends(get_database)):
+async def create(request: ClienteRequest, database: AsyncSession = Depends(get_async_database)):
     '''Cria e salva um objeto cliente por meio do método POST'''
     # Verificar se email já existe
-    if ClientesRepository.find_by_email(database, request.email):
+    if await AsyncClientesRepository.find_by_email(database, request.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email já cadastrado"
         )
     
     # Verificar se CPF já existe
-    if ClientesRepository.find_by_cpf(database, request.cpf):
+    if await AsyncClientesRepository.find_by_cpf(database, request.cpf):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="CPF já cadastrado"
         )
     
     # Verificar se CNH já existe
-    if ClientesRepository.find_by_cnh(database, request.cnh):
+    if await AsyncClientesRepository.find_by_cnh(database, request.cnh):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="CNH já cadastrada"
@@ -49,10 +54,10 @@ def create(request: ClienteRequest, database: Session = Depends(get_database)):
     
     # Criar cliente com senha hasheada
     cliente_data = request.dict()
-    cliente_data['senha'] = get_password_hash(cliente_data['senha'])
+    cliente_data['senha'] = await hash_password(cliente_data['senha'])
     cliente_data['tipo'] = 'cliente'
     
-    cliente = ClientesRepository.save(database, Cliente(**cliente_data))
+    cliente = await AsyncClientesRepository.save(database, Cliente(**cliente_data))
     return cliente
 
 # LOGIN
@@ -60,9 +65,9 @@ def create(request: ClienteRequest, database: Session = Depends(get_database)):
     response_model=ClienteLoginResponse,
     status_code=status.HTTP_200_OK
 )
-def login(request: ClienteLoginRequest, database: Session = Depends(get_database)):
+async def login(request: ClienteLoginRequest, database: AsyncSession = Depends(get_async_database)):
     '''Autentica um cliente por meio do método POST'''
-    cliente = ClientesRepository.authenticate(database, request.email, request.senha)
+    cliente = await AsyncClientesRepository.authenticate(database, request.email, request.senha)
     if not cliente:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -77,56 +82,51 @@ def login(request: ClienteLoginRequest, database: Session = Depends(get_database
     )
 
 # READ ALL
-@router.get("/", response_model=list[ClienteResponse])
-def find_all(database: Session = Depends(get_database)):
-    '''Faz uma query de todos os objetos cliente na DB (sem paginação)'''
-    clientes = ClientesRepository.find_all(database)
-    return [ClienteResponse.from_orm(cliente) for cliente in clientes]
+@router.get("/", response_model=list[ClienteResponse], dependencies=[condicional_lista(Cliente)])
+def find_all(
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: Session = Depends(get_database),
+):
+    '''Faz uma query paginada por cursor dos objetos cliente na DB (próximo cursor em X-Next-Cursor)'''
+    pagina = ClientesRepository.find_all(database, params)
+    pagina.aplicar_headers(response)
+    return resposta_lista(ClienteResponse, pagina.itens, response)
 
 # READ BY ID
-@router.get("/{id}", response_model=ClienteResponse)
+@router.get("/{id}", response_model=ClienteResponse, dependencies=[condicional_item(Cliente)])
 def find_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID como parâmetro, encontra o cliente com esse ID'''
-    cliente = ClientesRepository.find_by_id(database, id)
-    if not cliente:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Cliente não encontrado"
-        )
+    cliente = ClientesRepository.get_or_404(database, id)
     return ClienteResponse.from_orm(cliente)
 
 # UPDATE BY ID
 @router.put("/{id}", response_model=ClienteResponse)
-def update(id: int, request: ClienteUpdateRequest, database: Session = Depends(get_database)):
+async def update(id: int, request: ClienteUpdateRequest, database: AsyncSession = Depends(get_async_database)):
     '''Dado o ID do cliente, atualiza os dados na DB por meio do método PUT'''
-    if not ClientesRepository.exists_by_id(database, id):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Cliente não encontrado"
-        )
-    
-    # Buscar o cliente existente
-    cliente_existente = ClientesRepository.find_by_id(database, id)
+    # Uma única busca: 404 se não existir
+    cliente_existente = await AsyncClientesRepository.get_or_404(database, id)
     
     # Atualizar os campos fornecidos
     update_data = request.dict(exclude_unset=True)
     if 'senha' in update_data and update_data['senha']:
-        update_data['senha'] = get_password_hash(update_data['senha'])
+        update_data['senha'] = await hash_password(update_data['senha'])
     
     for field, value in update_data.items():
         setattr(cliente_existente, field, value)
     
     # Salvar as alterações
-    cliente_atualizado = ClientesRepository.save(database, cliente_existente)
+    cliente_atualizado = await AsyncClientesRepository.save(database, cliente_existente)
     return ClienteResponse.from_orm(cliente_atualizado)
 
 # DELETE BY ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID do cliente, deleta o objeto da DB por meio do método DELETE'''
-    if not ClientesRepository.exists_by_id(database, id):
+    if not ClientesRepository.delete_by_id(database, id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Cliente não encontrado"
         )
-    ClientesRepository.delete_by_id(database, id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # GET COUNT
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from passlib.hash import bcrypt
+
+from ..conftest import TestingSessionLocal, client, criar_cliente
+from ..model.model import Cliente
+from ..security import PasswordHasher
+
+
+def test_login_refaz_hash_com_custo_antigo():
+    cliente_id = criar_cliente()
+    db = TestingSessionLocal()
+    cliente = db.get(Cliente, cliente_id)
+    cliente.senha = bcrypt.using(rounds=4).hash("senha123")
+    db.commit()
+    email = cliente.email
+    db.close()
+
+    resp = client.post("/clientes/login", json={"email": email, "senha": "senha123"})
+    assert resp.status_code == 200
+
+    db = TestingSessionLocal()
+    assert not db.get(Cliente, cliente_id).senha.startswith("$2b$04$")
+    db.close()
+
+    resp = client.post("/clientes/login", json={"email": email, "senha": "errada"})
+    assert resp.status_code == 401
+
+def test_pool_de_hash_conta_job_cancelado_ate_terminar():
+    hasher = PasswordHasher(workers=1, max_pendentes=1)
+    liberar = threading.Event()
+
+    async def cancelar_espera():
+        tarefa = asyncio.create_task(hasher.run(liberar.wait, 5))
+        await asyncio.sleep(0.05)
+        tarefa.cancel()
+        await asyncio.gather(tarefa, return_exceptions=True)
+
+    # A requisição desistiu, mas o bcrypt segue ocupando o pool: a pendência continua
+    asyncio.run(cancelar_espera())
+    assert hasher.pendentes == 1
+    liberar.set()
+    hasher._executor.shutdown(wait=True)
+    assert hasher.pendentes == 0
@@ -0,0 +1,177 @@
+'''Requisições condicionais (ETag / Last-Modified / 304) a partir de atualizadoEm
+
+As dependências calculam o validador com uma query mínima antes da rota, na mesma
+sessão que a rota usa em seguida: para um
+item, o atualizadoEm do ID; para uma listagem, a marca d'água count(*) +
+max(atualizadoEm) das linhas que ela pode conter. Se o cliente já tem essa
+versão, a rota não é executada e a resposta é um 304 sem corpo.
+'''
+
+import hashlib
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import ColumnElement, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .database import get_async_db as get_async_database
+from .database import get_db as get_database
+
+CACHE_CONTROL = "no-cache"
+
+
+def gerar_etag(*partes) -> str:
+    '''ETag fraca: deriva da versão dos dados, não dos bytes serializados'''
+    return 'W/"' + hashlib.sha1(repr(partes).encode()).hexdigest()[:32] + '"'
+
+
+def _data_http(data: datetime) -> str:
+    return format_datetime(data.replace(microsecond=0, tzinfo=UTC), usegmt=True)
+
+
+def etag_confere(if_none_match: str, etag: str) -> bool:
+    '''Comparação fraca do If-None-Match (lista separada por vírgulas ou *)'''
+    valores = [valor.strip() for valor in if_none_match.split(",")]
+    return "*" in valores or etag.removeprefix("W/") in [valor.removeprefix("W/") for valor in valores]
+
+
+def nao_modificado(request: Request, etag: str, ultima_modificacao: datetime | None) -> bool:
+    '''If-None-Match tem precedência; If-Modified-Since só é usado na ausência dele'''
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_confere(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or ultima_modificacao is None:
+        return False
+    try:
+        data = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=UTC)
+    return ultima_modificacao.replace(microsecond=0, tzinfo=UTC) <= data
+
+
+def responder_condicional(
+    request: Request, response: Response, etag: str, ultima_modificacao: datetime | None = None
+) -> None:
+    '''Lança 304 se o cliente já tem a versão; senão adiciona os validadores à resposta'''
+    cabecalhos = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if ultima_modificacao is not None:
+        cabecalhos["Last-Modified"] = _data_http(ultima_modificacao)
+    if nao_modificado(request, etag, ultima_modificacao):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos)
+    response.headers.update(cabecalhos)
+
+
+def versao_item(database: Session, model, id: int) -> datetime | None:
+    '''atualizadoEm do registro (None se não existe)'''
+    return database.scalar(select(model.atualizadoEm).select_from(model).where(model.id == id))
+
+
+def marca_dagua(database: Session, model, *criterios) -> tuple[int, datetime | None]:
+    '''count(*) e max(atualizadoEm): mudam em toda inserção, atualização e exclusão'''
+    total, ultima = database.execute(
+        select(func.count(model.id), func.max(model.atualizadoEm)).select_from(model).where(*criterios)
+    ).one()
+    return total, ultima
+
+
+@dataclass(frozen=True)
+class FiltroCaminho:
+    '''Parâmetro do caminho e o mesmo critério que a rota usa na consulta (ex.: ilike)'''
+    parametro: str
+    criterio: Callable[[str], ColumnElement]
+
+
+def _etag_item(model, id: int, atualizado_em: datetime | None, request: Request, response: Response) -> None:
+    if atualizado_em is None:
+        # A rota responde o 404
+        return
+    responder_condicional(
+        request, response, gerar_etag(model.__tablename__, id, atualizado_em.isoformat()), atualizado_em
+    )
+
+
+def condicional_item(model, assincrona: bool = False):
+    '''Dependência para GET /{id}: ETag de (tabela, id, atualizadoEm)
+
+    Usa a mesma sessão da rota (o FastAPI reaproveita get_db/get_async_db na
+    requisição): assincrona=True para rotas async def com AsyncSession.
+    '''
+    if assincrona:
+        async def dependencia_assincrona(
+            id: int,
+            request: Request,
+            response: Response,
+            database: AsyncSession = Depends(get_async_database),
+        ) -> None:
+            _etag_item(model, id, await database.run_sync(versao_item, model, id), request, response)
+
+        return Depends(dependencia_assincrona)
+
+    def dependencia(id: int, request: Request, response: Response, database: Session = Depends(get_database)) -> None:
+        _etag_item(model, id, versao_item(database, model, id), request, response)
+
+    return Depends(dependencia)
+
+
+def _criterios(model, filtros_caminho: dict, request: Request) -> list | None:
+    '''Critérios da marca d'água a partir dos parâmetros do caminho (None se algum é inválido)'''
+    criterios = []
+    for coluna, filtro in filtros_caminho.items():
+        if isinstance(filtro, FiltroCaminho):
+            if filtro.parametro not in request.path_params:
+                return None
+            criterios.append(filtro.criterio(request.path_params[filtro.parametro]))
+            continue
+        atributo = getattr(model, coluna)
+        try:
+            valor = atributo.type.python_type(request.path_params[filtro])
+        except (KeyError, ValueError, NotImplementedError):
+            return None
+        criterios.append(atributo == valor)
+    return criterios
+
+
+def _etag_lista(model, total: int, ultima: datetime | None, request: Request, response: Response) -> None:
+    consulta = "&".join(sorted(request.url.query.split("&")))
+    etag = gerar_etag(model.__tablename__, request.url.path, consulta, total, ultima and ultima.isoformat())
+    responder_condicional(request, response, etag)
+
+
+def condicional_lista(model, assincrona: bool = False, **filtros_caminho: str | FiltroCaminho):
+    '''Dependência para listagens: ETag da marca d'água da tabela + rota e query params
+
+    filtros_caminho mapeia colunas do model para parâmetros do caminho, restringindo
+    a marca d'água às linhas da listagem (ex.: clienteId="cliente_id"). Rotas que não
+    filtram por igualdade passam um FiltroCaminho com o mesmo critério da consulta.
+    Sem filtros, vale a tabela inteira. Só a ETag é usada: exclusões não mudam
+    max(atualizadoEm), então If-Modified-Since não é confiável para listas.
+    '''
+    if assincrona:
+        async def dependencia_assincrona(
+            request: Request,
+            response: Response,
+            database: AsyncSession = Depends(get_async_database),
+        ) -> None:
+            criterios = _criterios(model, filtros_caminho, request)
+            if criterios is None:
+                # Parâmetro inválido: a rota decide a resposta
+                return
+            total, ultima = await database.run_sync(marca_dagua, model, *criterios)
+            _etag_lista(model, total, ultima, request, response)
+
+        return Depends(dependencia_assincrona)
+
+    def dependencia(request: Request, response: Response, database: Session = Depends(get_database)) -> None:
+        criterios = _criterios(model, filtros_caminho, request)
+        if criterios is None:
+            return
+        _etag_lista(model, *marca_dagua(database, model, *criterios), request, response)
+
+    return Depends(dependencia)
@@ -4,6 +4,15 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     # Database configuration
     db_connect_url: str = "sqlite:///./ceva.db"
+    # Engine assíncrono (asyncpg/aiosqlite); se vazio, é derivado de db_connect_url
+    async_db_connect_url: str | None = None
+    
+    # Pool de conexões (Postgres)
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800
+    db_pool_timeout: float = 30.0
     
     # Variáveis originais do projeto (para compatibilidade)
     postgres_db: str = "ceva_db"
@@ -16,6 +25,42 @@ class Settings(BaseSettings):
     
     # Environment
     environment: str = "development"
+
+    # Hash de senhas (bcrypt)
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+
+    # Paginação das listagens
+    pagination_default_limit: int = 50
+    pagination_max_limit: int = 500
+
+    # KPIs dos dashboards: validade do cache e intervalo dos snapshots em metricas (0 desativa)
+    kpi_cache_ttl: int = 60
+    kpi_snapshot_interval: int = 0
+
+    # Ciclo de vida das reservas: intervalo das varreduras (0 desativa a tarefa na API),
+    # validade das pendentes em segundos e tamanho do lote de cada UPDATE
+    reserva_ciclo_interval: int = 60
+    reserva_pendente_ttl: int = 1800
+    reserva_ciclo_lote: int = 500
+
+    # Motor de preços: validade do calendário de tarifas compilado e horizonte em dias
+    precos_calendario_ttl: int = 300
+    precos_calendario_dias: int = 730
+
+    # Idempotency-Key dos POST de criação: validade das respostas guardadas em segundos
+    # (0 desativa) e quanto uma duplicata espera a primeira execução terminar
+    idempotency_ttl: int = 86400
+    idempotency_espera: int = 30
+
+    # Cache das respostas do catálogo: validade em segundos (0 desativa) e backend
+    # ("memoria", redis://host:6379/0 ou fakeredis:// para testes locais)
+    response_cache_ttl: int = 30
+    response_cache_url: str | None = None
+    # Workers do uvicorn (WEB_CONCURRENCY é o padrão de --workers); acima de 1 o cache
+    # de respostas exige o backend redis
+    web_concurrency: int = 1
     
     class Config:
         env_file = ".env"
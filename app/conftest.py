@@ -0,0 +1,98 @@
+'''Banco e helpers compartilhados pelos testes de integração
+
+Os dependency_overrides do app são globais: a fixture autouse os aponta para o
+banco de integração em todo teste, independente da ordem de importação dos módulos.
+'''
+
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from .database import Base, get_async_db, get_db
+from .idempotencia import idempotencia
+from .main import app
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test_integracao.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# NullPool: o TestClient usa um event loop por requisição
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_integracao.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+Base.metadata.drop_all(bind=engine)
+Base.metadata.create_all(bind=engine)
+
+def override_get_db():
+    try:
+        db = TestingSessionLocal()
+        yield db
+    finally:
+        db.close()
+
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+# Chaves de idempotência no banco de teste
+idempotencia.fabrica = TestingAsyncSessionLocal
+client = TestClient(app)
+
+def sufixo_unico() -> int:
+    # Microssegundos evitam colisões de CPF/CNH/placa entre chamadas no mesmo segundo
+    return int(datetime.now().timestamp() * 1_000_000) % 10**11
+
+def criar_localizacao():
+    resp = client.post(
+        "/localizacoes/",
+        json={"nome": "Agencia Centro", "endereco": "Rua A, 123"},
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+def criar_cliente():
+    sufixo = sufixo_unico()
+    resp = client.post(
+        "/clientes/",
+        json={
+            "nome": "Cliente Teste",
+            "email": f"cliente{sufixo}@teste.com",
+            "senha": "senha123",
+            "telefone": "61999999999",
+            "cnh": f"CNH{sufixo}",
+            "cpf": f"{sufixo:011d}",
+        },
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+def criar_carro(localizacao_id: int, categoria: str = "Sedan"):
+    resp = client.post(
+        "/carros/",
+        json={
+            "placa": f"{sufixo_unico() % 10**7:07d}",
+            "marca": "Toyota",
+            "modelo": "Corolla",
+            "ano": 2023,
+            "cor": "Branco",
+            "precoDia": 150.0,
+            "categoria": categoria,
+            "descricao": "Carro econômico",
+            "disponivel": True,
+            "destaque": False,
+            "localizacaoId": localizacao_id,
+        },
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+@pytest.fixture(autouse=True)
+def banco_de_integracao():
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
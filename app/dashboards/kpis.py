@@ -0,0 +1,158 @@
+'''KPIs dos dashboards calculados no servidor com agregações SQL e cache com TTL'''
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, func, literal, select, text
+from sqlalchemy.orm import Session
+
+from ..cache import TTLCache
+from ..config import settings
+from ..database import SessionLocal
+from ..model.model import (
+    METRICA_KPI,
+    AvaliacaoResumo,
+    Carros,
+    Dashboard,
+    Metrica,
+    Reserva,
+    StatusReserva,
+)
+from ..repository import upsert_incremental
+from ..reservas.rollups import STATUS_FATURADOS
+from ..tarefas import TarefaPeriodica
+
+TIPO_KPI = "kpi"
+
+kpis_cache = TTLCache(settings.kpi_cache_ttl, max_itens=256)
+
+
+def periodo_padrao(dias: int = 30) -> tuple[datetime, datetime]:
+    '''Últimos dias completos até o fim de hoje, alinhados à meia-noite (chave de cache estável)'''
+    fim = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    return fim - timedelta(days=dias), fim
+
+
+class KpisService:
+    @staticmethod
+    def _dias_entre(database: Session, inicio, fim):
+        '''Expressão SQL com a diferença em dias (fracionários) entre dois timestamps'''
+        if database.get_bind().dialect.name == "postgresql":
+            return func.extract("epoch", fim - inicio) / 86400
+        return func.julianday(fim) - func.julianday(inicio)
+
+    @staticmethod
+    def _maior(database: Session, a, b):
+        if database.get_bind().dialect.name == "postgresql":
+            return func.greatest(a, b)
+        return func.max(a, b)
+
+    @staticmethod
+    def _menor(database: Session, a, b):
+        if database.get_bind().dialect.name == "postgresql":
+            return func.least(a, b)
+        return func.min(a, b)
+
+    @staticmethod
+    def calcular(database: Session, inicio: datetime, fim: datetime) -> dict:
+        '''Calcula os KPIs do período com duas queries de agregação'''
+        # 1) Reservas e receita por status (retiradas no período)
+        por_status = {status.value: 0 for status in StatusReserva}
+        receita = 0.0
+        linhas = database.execute(
+            select(Reserva.status, func.count(Reserva.id), func.coalesce(func.sum(Reserva.valorTotal), 0))
+            .where(Reserva.dataRetirada >= inicio, Reserva.dataRetirada < fim)
+            .group_by(Reserva.status)
+        ).all()
+        for status, quantidade, valor in linhas:
+            por_status[status.value] = quantidade
+            if status in STATUS_FATURADOS:
+                receita += float(valor)
+
+        # 2) Frota, carro-dias ocupados no período e avaliação média, em um único SELECT
+        inicio_periodo = literal(inicio, DateTime)
+        fim_periodo = literal(fim, DateTime)
+        dias_ocupados = KpisService._dias_entre(
+            database,
+            KpisService._maior(database, Reserva.dataRetirada, inicio_periodo),
+            KpisService._menor(database, Reserva.dataDevolucao, fim_periodo),
+        )
+        agregados = database.execute(select(
+            select(func.count(Carros.id)).scalar_subquery().label("frota"),
+            select(func.coalesce(func.sum(dias_ocupados), 0))
+            .where(
+                Reserva.status.in_(STATUS_FATURADOS),
+                Reserva.dataRetirada < fim,
+                Reserva.dataDevolucao > inicio,
+            )
+            .scalar_subquery().label("diasOcupados"),
+            select(func.coalesce(func.sum(AvaliacaoResumo.soma), 0)).scalar_subquery().label("somaNotas"),
+            select(func.coalesce(func.sum(AvaliacaoResumo.total), 0)).scalar_subquery().label("totalAvaliacoes"),
+        )).one()
+
+        dias_periodo = (fim - inicio).total_seconds() / 86400
+        capacidade = agregados.frota * dias_periodo
+        return {
+            "inicio": inicio,
+            "fim": fim,
+            "frota": agregados.frota,
+            "diasOcupados": round(float(agregados.diasOcupados), 3),
+            "utilizacao": round(min(float(agregados.diasOcupados) / capacidade, 1.0), 4) if capacidade else 0.0,
+            "receita": round(receita, 2),
+            "totalReservas": sum(por_status.values()),
+            "reservasPorStatus": por_status,
+            "avaliacaoMedia": round(agregados.somaNotas / agregados.totalAvaliacoes, 2) if agregados.totalAvaliacoes else 0.0,
+            "totalAvaliacoes": agregados.totalAvaliacoes,
+            "calculadoEm": datetime.now(),
+        }
+
+    @staticmethod
+    def obter(database: Session, inicio: datetime, fim: datetime) -> dict:
+        '''KPIs do período servidos do cache; recalculados após kpi_cache_ttl segundos'''
+        return kpis_cache.get_or_set((inicio, fim), lambda: KpisService.calcular(database, inicio, fim))
+
+    @staticmethod
+    def _valores_metricas(kpis: dict) -> dict[str, str]:
+        valores = {
+            "utilizacao_frota": f"{kpis['utilizacao']:.4f}",
+            "receita": f"{kpis['receita']:.2f}",
+            "total_reservas": str(kpis["totalReservas"]),
+            "avaliacao_media": f"{kpis['avaliacaoMedia']:.2f}",
+        }
+        for status, quantidade in kpis["reservasPorStatus"].items():
+            valores[f"reservas_{status.lower()}"] = str(quantidade)
+        return valores
+
+    @staticmethod
+    def persistir_snapshot(database: Session) -> int:
+        '''Grava os KPIs do período padrão como métricas tipo "kpi" de todos os dashboards
+
+        Um único INSERT ... ON CONFLICT sobre o índice único parcial (dashboardId, nome):
+        snapshots concorrentes de vários processos atualizam as mesmas linhas em vez de
+        duplicá-las. Retorna o número de métricas gravadas.
+        '''
+        inicio, fim = periodo_padrao()
+        kpis = KpisService.calcular(database, inicio, fim)
+        kpis_cache.set((inicio, fim), kpis)
+        valores = KpisService._valores_metricas(kpis)
+
+        agora = datetime.now()
+        linhas = [
+            {"dashboardId": dashboard_id, "nome": nome, "tipo": TIPO_KPI, "valor": valor, "atualizadoEm": agora}
+            for dashboard_id in database.scalars(select(Dashboard.id))
+            for nome, valor in valores.items()
+        ]
+        upsert_incremental(
+            database, Metrica.__table__, ["dashboardId", "nome"], linhas,
+            substituir=("tipo", "valor", "atualizadoEm"), onde=text(METRICA_KPI),
+        )
+        database.commit()
+        return len(linhas)
+
+
+def executar_snapshot() -> int:
+    '''Ponto de entrada da tarefa agendada: abre a própria sessão'''
+    with SessionLocal() as database:
+        return KpisService.persistir_snapshot(database)
+
+
+tarefa_snapshot = TarefaPeriodica("kpis_snapshot", settings.kpi_snapshot_interval, executar_snapshot)
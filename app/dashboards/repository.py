@@ -1,13 +1,29 @@
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
-from ..model.model import Dashboard
+from ..model.model import Dashboard, Metrica
+from ..pagination import Page, PageParams, paginate
+from ..repository import BaseRepository
 
 
-class DashboardsRepository:
+class DashboardsRepository(BaseRepository):
+    model = Dashboard
+    nao_encontrado = "Dashboard não encontrado"
+
+    FILTROS = {"adminId": Dashboard.adminId}
+    ORDENACOES = {"id": Dashboard.id, "criadoEm": Dashboard.criadoEm}
+
     @staticmethod
-    def find_all(database: Session) -> list[Dashboard]:
-        '''Função para fazer uma query de todos os dashboards da DB'''
-        return database.query(Dashboard).all()
+    def find_all(database: Session, params: PageParams) -> Page:
+        '''Função para fazer uma query paginada por cursor de todos os dashboards da DB'''
+        return paginate(
+            database,
+            select(Dashboard),
+            params,
+            id_coluna=Dashboard.id,
+            ordenacoes=DashboardsRepository.ORDENACOES,
+            filtros=DashboardsRepository.FILTROS,
+        )
 
     @staticmethod
     def save(database: Session, dashboard: Dashboard) -> Dashboard:
@@ -21,22 +37,9 @@ class DashboardsRepository:
         return dashboard
 
     @staticmethod
-    def find_by_id(database: Session, id: int) -> Dashboard:
-        '''Função para fazer uma query por ID de um objeto dashboard na DB'''
-        return database.query(Dashboard).filter(Dashboard.id == id).first()
-
-    @staticmethod
-    def exists_by_id(database: Session, id: int) -> bool:
-        '''Função que verifica se o ID dado existe na DB'''
-        return database.query(Dashboard).filter(Dashboard.id == id).first() is not None
-
-    @staticmethod
-    def delete_by_id(database: Session, id: int) -> None:
-        '''Função para excluir um objeto dashboard da DB dado o ID'''
-        dashboard = database.query(Dashboard).filter(Dashboard.id == id).first()
-        if dashboard is not None:
-            database.delete(dashboard)
-            database.commit()
+    def _delete_dependentes(database: Session, id: int) -> None:
+        '''Remove as métricas do dashboard (cascade do relacionamento)'''
+        database.execute(delete(Metrica).where(Metrica.dashboardId == id))
 
     @staticmethod
     def count_all(database: Session) -> int:
@@ -51,4 +54,4 @@ class DashboardsRepository:
     @staticmethod
     def exists_by_admin(database: Session, admin_id: int) -> bool:
         '''Função que verifica se já existe um dashboard para o admin dado'''
-        return database.query(Dashboard).filter(Dashboard.adminId == admin_id).first() is not None
+        return DashboardsRepository.exists(database, Dashboard.adminId == admin_id)
@@ -1,11 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
 from ..admins.repository import AdminsRepository
+from ..condicional import condicional_item, condicional_lista
 from ..database import get_db as get_database
+from ..datas import DataLocal
 from ..model.model import Dashboard
+from ..pagination import PageParams, page_params
+from ..reservas.rollups import GRANULARIDADES, RollupsService
+from ..serializacao import resposta_lista
+from .kpis import KpisService, periodo_padrao
 from .repository import DashboardsRepository
-from .schema import DashboardRequest, DashboardResponse, DashboardUpdateRequest
+from .schema import (
+    DashboardRequest,
+    DashboardResponse,
+    DashboardUpdateRequest,
+    KpisResponse,
+    KpisSnapshotResponse,
+    RelatorioPeriodoResponse,
+)
 
 router = APIRouter(
     prefix='/dashboards',
@@ -38,54 +53,95 @@ def create(request: DashboardRequest, database: Session = Depends(get_database))
     return dashboard
 
 # READ ALL
-@router.get("/", response_model=list[DashboardResponse])
-def find_all(database: Session = Depends(get_database)):
-    '''Faz uma query de todos os objetos dashboard na DB (sem paginação)'''
-    dashboards = DashboardsRepository.find_all(database)
-    return [DashboardResponse.from_orm(dashboard) for dashboard in dashboards]
+@router.get("/", response_model=list[DashboardResponse], dependencies=[condicional_lista(Dashboard)])
+def find_all(
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: Session = Depends(get_database),
+):
+    '''Faz uma query paginada por cursor dos objetos dashboard na DB (próximo cursor em X-Next-Cursor)'''
+    pagina = DashboardsRepository.find_all(database, params)
+    pagina.aplicar_headers(response)
+    return resposta_lista(DashboardResponse, pagina.itens, response)
+
+# GET KPIS
+@router.get("/kpis", response_model=KpisResponse)
+def find_kpis(
+    inicio: DataLocal | None = Query(None, description="Início do período (padrão: últimos 30 dias)"),
+    fim: DataLocal | None = Query(None, description="Fim do período (exclusivo)"),
+    database: Session = Depends(get_database),
+):
+    '''Utilização da frota, receita, reservas por status e avaliação média do período (cache com TTL)'''
+    if (inicio is None) != (fim is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe inicio e fim juntos"
+        )
+    if inicio is None:
+        inicio, fim = periodo_padrao()
+    elif fim <= inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="fim deve ser posterior a inicio"
+        )
+    return KpisService.obter(database, inicio, fim)
+
+# SNAPSHOT KPIS
+@router.post("/kpis/snapshot", response_model=KpisSnapshotResponse)
+def snapshot_kpis(database: Session = Depends(get_database)):
+    '''Recalcula os KPIs e grava em metricas (tipo "kpi") de todos os dashboards'''
+    return {"metricas": KpisService.persistir_snapshot(database)}
+
+# GET RELATORIO DE RECEITA E OCUPACAO
+@router.get("/relatorios", response_model=list[RelatorioPeriodoResponse])
+def find_relatorio(
+    inicio: date = Query(..., description="Primeiro dia do relatório"),
+    fim: date = Query(..., description="Último dia do relatório (inclusivo)"),
+    granularidade: str = Query("dia", description="dia, semana ou mes"),
+    localizacaoId: int | None = Query(None, description="Localização de retirada"),
+    categoria: str | None = Query(None, description="Categoria do carro"),
+    database: Session = Depends(get_database),
+):
+    '''Receita e ocupação por dia/semana/mês lidas apenas das tabelas de agregados'''
+    if granularidade not in GRANULARIDADES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Granularidade deve ser uma de: {', '.join(GRANULARIDADES)}"
+        )
+    if fim < inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="fim deve ser igual ou posterior a inicio"
+        )
+    return RollupsService.serie(database, granularidade, inicio, fim, localizacaoId, categoria)
 
 # READ BY ID
-@router.get("/{id}", response_model=DashboardResponse)
+@router.get("/{id}", response_model=DashboardResponse, dependencies=[condicional_item(Dashboard)])
 def find_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID como parâmetro, encontra o dashboard com esse ID'''
-    dashboard = DashboardsRepository.find_by_id(database, id)
-    if not dashboard:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Dashboard não encontrado"
-        )
+    dashboard = DashboardsRepository.get_or_404(database, id)
     return DashboardResponse.from_orm(dashboard)
 
 # UPDATE BY ID
 @router.put("/{id}", response_model=DashboardResponse)
 def update(id: int, request: DashboardUpdateRequest, database: Session = Depends(get_database)):
     '''Dado o ID do dashboard, atualiza os dados na DB por meio do método PUT'''
-    if not DashboardsRepository.exists_by_id(database, id):
+    # Um único UPDATE ... RETURNING com os campos fornecidos
+    dashboard_atualizado = DashboardsRepository.update_by_id(database, id, request.dict(exclude_unset=True))
+    if dashboard_atualizado is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Dashboard não encontrado"
         )
-    
-    # Buscar o dashboard existente
-    dashboard_existente = DashboardsRepository.find_by_id(database, id)
-    
-    # Atualizar os campos fornecidos
-    update_data = request.dict(exclude_unset=True)
-    
-    for field, value in update_data.items():
-        setattr(dashboard_existente, field, value)
-    
-    # Salvar as alterações
-    dashboard_atualizado = DashboardsRepository.save(database, dashboard_existente)
     return DashboardResponse.from_orm(dashboard_atualizado)
 
 # DELETE BY ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID do dashboard, deleta o objeto da DB por meio do método DELETE'''
-    if not DashboardsRepository.exists_by_id(database, id):
+    if not DashboardsRepository.delete_by_id(database, id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Dashboard não encontrado"
         )
-    DashboardsRepository.delete_by_id(database, id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # GET COUNT
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from pydantic import BaseModel
 
@@ -31,3 +31,30 @@ class DashboardCountResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class KpisResponse(BaseModel):
+    '''Classe para resposta dos KPIs calculados no servidor'''
+    inicio: datetime
+    fim: datetime
+    frota: int
+    diasOcupados: float
+    utilizacao: float
+    receita: float
+    totalReservas: int
+    reservasPorStatus: dict[str, int]
+    avaliacaoMedia: float
+    totalAvaliacoes: int
+    calculadoEm: datetime
+
+class KpisSnapshotResponse(BaseModel):
+    '''Classe para resposta da gravação de KPIs em métricas'''
+    metricas: int
+
+class RelatorioPeriodoResponse(BaseModel):
+    '''Classe para um período (dia, semana ou mês) do relatório de receita e ocupação'''
+    periodo: date
+    receita: float
+    reservas: int
+    carroDias: float
+    capacidade: int
+    utilizacao: float
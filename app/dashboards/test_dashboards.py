@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ..conftest import (
+    TestingSessionLocal,
+    client,
+    criar_carro,
+    criar_cliente,
+    criar_localizacao,
+    sufixo_unico,
+)
+from .kpis import KpisService
+
+
+def test_kpis_dashboard():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    carro_id = criar_carro(loc)
+    inicio = datetime(2040, 1, 1)
+    fim = datetime(2040, 1, 11)
+
+    # Reserva confirmada de 2 dias e uma pendente (não fatura nem ocupa)
+    for dia, confirmar in [(1, True), (5, False)]:
+        resp = client.post(
+            "/reservas/",
+            json={
+                "dataRetirada": datetime(2040, 1, dia).isoformat(),
+                "dataDevolucao": datetime(2040, 1, dia + 2).isoformat(),
+                "clienteId": cliente_id,
+                "carroId": carro_id,
+                "localizacaoRetiradaId": loc,
+                "localizacaoDevolucaoId": loc,
+            },
+        )
+        assert resp.status_code == 201
+        if confirmar:
+            assert client.patch(f"/reservas/{resp.json()['id']}/confirmar").status_code == 200
+
+    resp = client.get("/dashboards/kpis", params={"inicio": inicio.isoformat(), "fim": fim.isoformat()})
+    assert resp.status_code == 200
+    kpis = resp.json()
+    assert kpis["receita"] == 300.0
+    assert kpis["totalReservas"] == 2
+    assert kpis["reservasPorStatus"]["Confirmada"] == 1
+    assert kpis["reservasPorStatus"]["Pendente"] == 1
+    assert kpis["diasOcupados"] == 2.0
+    assert kpis["utilizacao"] == round(2.0 / (kpis["frota"] * 10), 4)
+
+    resp = client.get("/dashboards/kpis", params={"inicio": inicio.isoformat()})
+    assert resp.status_code == 400
+
+    sufixo = sufixo_unico()
+    resp = client.post(
+        "/admins/",
+        json={"nome": "Admin", "email": f"admin{sufixo}@teste.com", "senha": "senha123", "cargo": "Gerente"},
+    )
+    assert resp.status_code == 201
+    resp = client.post("/dashboards/", json={"nome": "Painel", "adminId": resp.json()["id"]})
+    assert resp.status_code == 201
+    dashboard_id = resp.json()["id"]
+
+    # Snapshots repetidos atualizam as mesmas métricas em vez de duplicar
+    assert client.post("/dashboards/kpis/snapshot").status_code == 200
+    assert client.post("/dashboards/kpis/snapshot").status_code == 200
+    resp = client.get(f"/metricas/dashboard/{dashboard_id}")
+    nomes = [metrica["nome"] for metrica in resp.json() if metrica["tipo"] == "kpi"]
+    assert "receita" in nomes
+    assert len(nomes) == len(set(nomes))
+
+    # Snapshots concorrentes (um por processo da API) também não duplicam
+    def snapshot(_):
+        with TestingSessionLocal() as db:
+            return KpisService.persistir_snapshot(db)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(snapshot, range(8)))
+    resp = client.get(f"/metricas/dashboard/{dashboard_id}")
+    assert [metrica["nome"] for metrica in resp.json() if metrica["tipo"] == "kpi"] == nomes
@@ -1,9 +1,64 @@
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+
 from sqlalchemy import create_engine
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 from .config import settings
 
+
+class PoolMetrics:
+    '''Acumula tempos de espera no checkout de conexões do pool'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+
+    def registrar(self, espera: float, timeout: bool = False) -> None:
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.espera_total += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "esperaMediaMs": round(self.espera_total / total * 1000, 3) if total else 0.0,
+                "esperaMaximaMs": round(self.espera_maxima * 1000, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    '''QueuePool que mede quanto tempo cada requisição espera por uma conexão'''
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except sa_exc.TimeoutError:
+            pool_metrics.registrar(time.perf_counter() - inicio, timeout=True)
+            raise
+        pool_metrics.registrar(time.perf_counter() - inicio)
+        return conexao
+
+
 SQLALCHEMY_DATABASE_URL = settings.db_connect_url
 print(SQLALCHEMY_DATABASE_URL)
 if "sqlite" in SQLALCHEMY_DATABASE_URL:
@@ -14,15 +69,62 @@ if "sqlite" in SQLALCHEMY_DATABASE_URL:
 else:
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL,
-        pool_size=200,
-        max_overflow=0
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+        pool_timeout=settings.db_pool_timeout,
     )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db(expire_on_commit: bool = True):
-    db = SessionLocal(expire_on_commit=expire_on_commit)
+def async_database_url(url: str) -> str:
+    '''Troca o driver síncrono da URL pelo equivalente assíncrono'''
+    if url.startswith("sqlite"):
+        return "sqlite+aiosqlite" + url[url.index(":"):]
+    if url.startswith(("postgresql", "postgres")):
+        return "postgresql+asyncpg" + url[url.index(":"):]
+    return url
+
+ASYNC_SQLALCHEMY_DATABASE_URL = settings.async_db_connect_url or async_database_url(SQLALCHEMY_DATABASE_URL)
+if "sqlite" in ASYNC_SQLALCHEMY_DATABASE_URL:
+    async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+else:
+    async_engine = create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+        pool_timeout=settings.db_pool_timeout,
+    )
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def get_db() -> Iterator[Session]:
+    '''Dependência que abre uma sessão por requisição e a fecha ao fim da resposta'''
+    db = SessionLocal()
     try:
-        return db
+        yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    '''Dependência assíncrona: uma AsyncSession por requisição, para handlers async def'''
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_status() -> dict:
+    '''Ocupação atual do pool de conexões e métricas acumuladas de espera'''
+    pool = engine.pool
+    status = {"pool": type(pool).__name__, **pool_metrics.snapshot()}
+    if isinstance(pool, QueuePool):
+        capacidade = pool.size() + max(pool._max_overflow, 0)
+        status.update({
+            "tamanho": pool.size(),
+            "emUso": pool.checkedout(),
+            "ociosas": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "saturacao": round(pool.checkedout() / capacidade, 3) if capacidade else None,
+        })
+    return status
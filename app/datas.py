@@ -0,0 +1,22 @@
+'''Datas recebidas pela API: as colunas guardam hora local sem fuso
+
+Valores com fuso (ex.: sufixo Z) são convertidos para a hora local do servidor antes
+de chegar ao SQL: no asyncpg um datetime com fuso em coluna timestamp gera erro e no
+SQLite o offset seria descartado, deslocando o período.
+'''
+
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import AfterValidator
+
+
+def hora_local(data: datetime | None) -> datetime | None:
+    '''Converte datas com fuso para a hora local sem fuso usada nas colunas'''
+    if data is None or data.tzinfo is None:
+        return data
+    return data.astimezone().replace(tzinfo=None)
+
+
+# Para campos de schemas e query params que recebem datas
+DataLocal = Annotated[datetime, AfterValidator(hora_local)]
@@ -0,0 +1,107 @@
+'''Leitura em streaming das entidades exportadas, em lotes de yield_per linhas'''
+
+import csv
+import enum
+import io
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from pydantic_core import to_json
+from sqlalchemy.orm import Session
+
+from ..avaliacoes.repository import AvaliacoesRepository
+from ..clientes.repository import ClientesRepository
+from ..model.model import Avaliacao, Cliente, Reserva
+from ..reservas.repository import ReservasRepository
+
+FORMATOS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@dataclass(frozen=True)
+class Exportavel:
+    '''Repository cuja projeção de listagem é exportada e as colunas aceitas no filtro de datas'''
+    repository: type
+    datas: dict
+
+
+ENTIDADES = {
+    "reservas": Exportavel(
+        ReservasRepository, {"dataRetirada": Reserva.dataRetirada, "criadoEm": Reserva.criadoEm}
+    ),
+    "clientes": Exportavel(ClientesRepository, {"criadoEm": Cliente.criadoEm}),
+    "avaliacoes": Exportavel(AvaliacoesRepository, {"criadoEm": Avaliacao.criadoEm, "data": Avaliacao.data}),
+}
+
+
+def _valor_csv(valor):
+    if isinstance(valor, datetime | date):
+        return valor.isoformat()
+    if isinstance(valor, enum.Enum):
+        return valor.value
+    return valor
+
+
+class ExportacaoRepository:
+    @staticmethod
+    def lotes(
+        database: Session,
+        entidade: str,
+        campo_data: str,
+        inicio: datetime | None = None,
+        fim: datetime | None = None,
+        lote: int = 1000,
+    ) -> Iterator[list]:
+        '''Lotes de Rows (só as colunas de resposta) lidos com cursor do servidor
+
+        stream_results usa um cursor nomeado no Postgres; a memória fica limitada ao
+        tamanho do lote, qualquer que seja o volume exportado.
+        '''
+        exportavel = ENTIDADES[entidade]
+        repository = exportavel.repository
+        coluna = exportavel.datas[campo_data]
+        stmt = repository.projecao().order_by(repository.model.id)
+        if inicio is not None:
+            stmt = stmt.where(coluna >= inicio)
+        if fim is not None:
+            stmt = stmt.where(coluna < fim)
+        resultado = database.execute(stmt.execution_options(yield_per=lote, stream_results=True))
+        try:
+            yield from resultado.partitions()
+        finally:
+            resultado.close()
+
+    @staticmethod
+    def colunas(entidade: str) -> list[str]:
+        return [coluna.key for coluna in ENTIDADES[entidade].repository.COLUNAS_LISTAGEM]
+
+    @staticmethod
+    def ndjson(lotes: Iterator[list]) -> Iterator[bytes]:
+        '''Uma linha JSON por registro; um bloco de bytes por lote'''
+        for linhas in lotes:
+            yield b"".join(to_json(linha._asdict()) + b"\n" for linha in linhas)
+
+    @staticmethod
+    def csv(lotes: Iterator[list], colunas: list[str]) -> Iterator[bytes]:
+        '''Cabeçalho seguido das linhas; um bloco de bytes por lote'''
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(colunas)
+        for linhas in lotes:
+            escritor.writerows([_valor_csv(valor) for valor in linha] for linha in linhas)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    @staticmethod
+    def gzip(blocos: Iterator[bytes]) -> Iterator[bytes]:
+        '''Compressão gzip incremental dos blocos'''
+        compressor = zlib.compressobj(wbits=31)
+        for bloco in blocos:
+            comprimido = compressor.compress(bloco)
+            if comprimido:
+                yield comprimido
+        yield compressor.flush()
@@ -0,0 +1,59 @@
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..database import get_db as get_database
+from ..datas import DataLocal
+from .repository import ENTIDADES, FORMATOS, ExportacaoRepository
+
+router = APIRouter(
+    prefix='/export',
+    tags=['exportacao'],
+    responses={404: {"description": "Not found"}},
+)
+
+# EXPORTAR ENTIDADE
+@router.get("/{entidade}")
+def exportar(
+    entidade: str,
+    formato: str = Query("ndjson", description="ndjson ou csv"),
+    gzip: bool = Query(False, description="Comprime a resposta (Content-Encoding: gzip)"),
+    inicio: DataLocal | None = Query(None, description="Inclui registros com campoData >= inicio"),
+    fim: DataLocal | None = Query(None, description="Inclui registros com campoData < fim"),
+    campoData: str | None = Query(None, description="Coluna do filtro de período (padrão: a primeira da entidade)"),
+    database: Session = Depends(get_database),
+):
+    '''Exporta reservas, clientes ou avaliações em streaming (NDJSON ou CSV), lote a lote'''
+    if entidade not in ENTIDADES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Entidade não exportável: {entidade}"
+        )
+    if formato not in FORMATOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Formato deve ser ndjson ou csv"
+        )
+    datas = ENTIDADES[entidade].datas
+    campo_data = campoData or next(iter(datas))
+    if campo_data not in datas:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"campoData deve ser um de: {', '.join(datas)}",
+        )
+    if inicio is not None and fim is not None and fim <= inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Data de fim deve ser posterior à data de início"
+        )
+
+    # A sessão da dependência só é fechada depois do envio da resposta (FastAPI 0.104),
+    # então o gerador pode continuar lendo o cursor enquanto transmite
+    lotes = ExportacaoRepository.lotes(database, entidade, campo_data, inicio, fim)
+    if formato == "csv":
+        blocos = ExportacaoRepository.csv(lotes, ExportacaoRepository.colunas(entidade))
+    else:
+        blocos = ExportacaoRepository.ndjson(lotes)
+    headers = {"Content-Disposition": f'attachment; filename="{entidade}.{formato}"'}
+    if gzip:
+        blocos = ExportacaoRepository.gzip(blocos)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(blocos, media_type=FORMATOS[formato], headers=headers)
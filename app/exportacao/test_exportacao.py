@@ -0,0 +1,46 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from ..conftest import client, criar_carro, criar_cliente, criar_localizacao
+
+
+def test_exportacao_streaming():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    carro_id = criar_carro(loc)
+    retirada = datetime(2031, 3, 10, 9)
+    for dias in (0, 5):
+        client.post(
+            "/reservas/",
+            json={
+                "dataRetirada": (retirada + timedelta(days=dias)).isoformat(),
+                "dataDevolucao": (retirada + timedelta(days=dias + 1)).isoformat(),
+                "clienteId": cliente_id,
+                "carroId": carro_id,
+                "localizacaoRetiradaId": loc,
+                "localizacaoDevolucaoId": loc,
+            },
+        )
+
+    periodo = {"inicio": retirada.isoformat(), "fim": (retirada + timedelta(days=3)).isoformat()}
+    resp = client.get("/export/reservas", params=periodo)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    linhas = [json.loads(linha) for linha in resp.text.splitlines()]
+    assert [linha["carroId"] for linha in linhas] == [carro_id]
+
+    # CSV comprimido: o cliente HTTP descomprime pelo Content-Encoding
+    resp = client.get("/export/reservas", params={**periodo, "formato": "csv", "gzip": True})
+    assert resp.headers["content-encoding"] == "gzip"
+    cabecalho, *registros = list(csv.reader(io.StringIO(resp.text)))
+    assert "senha" not in cabecalho and "dataRetirada" in cabecalho
+    assert len(registros) == 1
+
+    resp = client.get("/export/clientes", params={"formato": "csv"})
+    cabecalho = next(csv.reader(io.StringIO(resp.text)))
+    assert "senha" not in cabecalho
+
+    assert client.get("/export/usuarios").status_code == 404
+    assert client.get("/export/reservas", params={"formato": "xml"}).status_code == 400
@@ -0,0 +1,279 @@
+'''Chaves de idempotência (header Idempotency-Key) para os POST de criação
+
+Um POST repetido com a mesma chave recebe a resposta guardada da primeira execução
+(com Idempotent-Replayed: true), sem executar o handler de novo: nada de uma segunda
+reserva, avaliação ou cliente (nem outro hash bcrypt). As respostas ficam na tabela
+idempotencia_chaves, por caminho + chave, junto com o hash do corpo: a mesma chave
+com outro corpo é recusada com 422. Valem por idempotency_ttl segundos.
+
+A execução é reservada com o INSERT da chave (chave primária), então duplicatas
+concorrentes são seguras mesmo em workers diferentes: quem não conseguiu inserir
+espera a primeira terminar e recebe a resposta dela (até idempotency_espera
+segundos; depois, 409). No mesmo processo, uma trava por chave evita consultas
+repetidas ao banco. Respostas 5xx não são guardadas: a reserva é desfeita e uma
+nova tentativa executa o handler.
+'''
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.responses import JSONResponse
+
+from .config import settings
+from .database import AsyncSessionLocal
+from .model.model import ChaveIdempotencia
+
+# Caminhos exatos dos POST que aceitam Idempotency-Key
+ROTAS_IDEMPOTENTES = frozenset({"/reservas/", "/avaliacoes/", "/clientes/"})
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+TAMANHO_MAXIMO_CHAVE = 255
+# Intervalo entre consultas de quem espera a primeira execução terminar
+INTERVALO_ESPERA = 0.05
+# Frequência da limpeza das chaves vencidas de todas as rotas
+INTERVALO_LIMPEZA = 60.0
+
+
+@dataclass(frozen=True)
+class RespostaGuardada:
+    '''Resposta da primeira execução e o hash do corpo da requisição que a gerou
+
+    status None: a primeira execução ainda não terminou.
+    '''
+    digest: str
+    status: int | None
+    headers: list[tuple[bytes, bytes]]
+    corpo: bytes
+
+
+class Idempotencia:
+    '''Respostas guardadas no banco por chave e as travas locais das chaves em execução'''
+
+    def __init__(self, ttl: int, espera: float, fabrica=AsyncSessionLocal):
+        self.ativo = ttl > 0
+        self.ttl = ttl
+        self.espera = espera
+        self.fabrica = fabrica
+        self._travas: dict[str, asyncio.Lock] = {}
+        self._usuarios: Counter[str] = Counter()
+        self._ultima_limpeza = 0.0
+        self.execucoes = 0
+        self.replays = 0
+        self.conflitos = 0
+        self.esperas_esgotadas = 0
+
+    @staticmethod
+    def chave(caminho: str, chave_cliente: str) -> str:
+        '''Chave primária: sha256 de caminho + Idempotency-Key'''
+        return hashlib.sha256(f"{caminho}\0{chave_cliente}".encode()).hexdigest()
+
+    @asynccontextmanager
+    async def trava(self, chave: str):
+        '''Exclusão mútua por chave no processo; a trava é descartada quando ninguém mais a usa'''
+        trava = self._travas.setdefault(chave, asyncio.Lock())
+        self._usuarios[chave] += 1
+        try:
+            async with trava:
+                yield
+        finally:
+            self._usuarios[chave] -= 1
+            if not self._usuarios[chave]:
+                del self._usuarios[chave]
+                del self._travas[chave]
+
+    async def reservar(self, chave: str, digest: str) -> bool:
+        '''Insere a chave em execução; False se outra requisição (de qualquer worker) já a tem
+
+        Antes, descarta a chave se venceu ou se ficou em execução além de espera
+        segundos (worker que caiu no meio da requisição).
+        '''
+        agora = datetime.now()
+        tabela = ChaveIdempotencia.__table__
+        async with self.fabrica() as database:
+            await database.execute(delete(tabela).where(
+                tabela.c.chave == chave,
+                or_(
+                    tabela.c.criadoEm < agora - timedelta(seconds=self.ttl),
+                    (tabela.c.status.is_(None)) & (tabela.c.criadoEm < agora - timedelta(seconds=self.espera)),
+                ),
+            ))
+            if time.monotonic() - self._ultima_limpeza > INTERVALO_LIMPEZA:
+                self._ultima_limpeza = time.monotonic()
+                await database.execute(delete(tabela).where(tabela.c.criadoEm < agora - timedelta(seconds=self.ttl)))
+            try:
+                await database.execute(insert(tabela).values(chave=chave, digest=digest, criadoEm=agora))
+                await database.commit()
+            except IntegrityError:
+                await database.rollback()
+                return False
+        return True
+
+    async def buscar(self, chave: str) -> RespostaGuardada | None:
+        tabela = ChaveIdempotencia.__table__
+        async with self.fabrica() as database:
+            linha = (await database.execute(
+                select(tabela.c.digest, tabela.c.status, tabela.c.cabecalhos, tabela.c.corpo)
+                .where(tabela.c.chave == chave)
+            )).first()
+        if linha is None:
+            return None
+        headers = [
+            (nome.encode("latin-1"), valor.encode("latin-1")) for nome, valor in json.loads(linha.cabecalhos or "[]")
+        ]
+        return RespostaGuardada(linha.digest, linha.status, headers, linha.corpo or b"")
+
+    async def guardar(self, chave: str, status: int, headers: list[tuple[bytes, bytes]], corpo: bytes) -> None:
+        cabecalhos = json.dumps([(nome.decode("latin-1"), valor.decode("latin-1")) for nome, valor in headers])
+        tabela = ChaveIdempotencia.__table__
+        async with self.fabrica() as database:
+            await database.execute(
+                update(tabela).where(tabela.c.chave == chave).values(status=status, cabecalhos=cabecalhos, corpo=corpo)
+            )
+            await database.commit()
+
+    async def liberar(self, chave: str) -> None:
+        '''Desfaz a reserva (resposta 5xx ou erro): a próxima tentativa executa o handler'''
+        tabela = ChaveIdempotencia.__table__
+        async with self.fabrica() as database:
+            await database.execute(delete(tabela).where(tabela.c.chave == chave))
+            await database.commit()
+
+    def metrics(self) -> dict:
+        return {
+            "ativo": self.ativo,
+            "ttl": self.ttl,
+            "execucoes": self.execucoes,
+            "replays": self.replays,
+            "conflitos": self.conflitos,
+            "esperasEsgotadas": self.esperas_esgotadas,
+            "emExecucao": len(self._travas),
+        }
+
+
+async def _ler_corpo(receive) -> bytes:
+    partes = []
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] != "http.request":
+            break
+        partes.append(mensagem.get("body", b""))
+        if not mensagem.get("more_body", False):
+            break
+    return b"".join(partes)
+
+
+class IdempotenciaMiddleware:
+    '''Middleware ASGI que aplica Idempotency-Key aos POST de ROTAS_IDEMPOTENTES'''
+
+    def __init__(self, app, idempotencia: Idempotencia):
+        self.app = app
+        self.idempotencia = idempotencia
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in ROTAS_IDEMPOTENTES
+            or not self.idempotencia.ativo
+        ):
+            await self.app(scope, receive, send)
+            return
+        chave_cliente = dict(scope["headers"]).get(IDEMPOTENCY_HEADER.lower().encode())
+        if chave_cliente is None:
+            await self.app(scope, receive, send)
+            return
+        if not chave_cliente.strip() or len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+            resposta = JSONResponse(
+                {"detail": f"{IDEMPOTENCY_HEADER} deve ter de 1 a {TAMANHO_MAXIMO_CHAVE} caracteres"},
+                status_code=400,
+            )
+            await resposta(scope, receive, send)
+            return
+
+        corpo = await _ler_corpo(receive)
+        digest = hashlib.sha256(corpo).hexdigest()
+        chave = Idempotencia.chave(scope["path"], chave_cliente.decode("latin-1"))
+        async with self.idempotencia.trava(chave):
+            limite = time.monotonic() + self.idempotencia.espera
+            while True:
+                if await self.idempotencia.reservar(chave, digest):
+                    await self._executar(chave, corpo, scope, receive, send)
+                    return
+                guardada = await self.idempotencia.buscar(chave)
+                if guardada is not None and (guardada.status is not None or guardada.digest != digest):
+                    await self._repetir(guardada, digest, scope, receive, send)
+                    return
+                if time.monotonic() > limite:
+                    self.idempotencia.esperas_esgotadas += 1
+                    resposta = JSONResponse(
+                        {"detail": f"Requisição com esta {IDEMPOTENCY_HEADER} ainda em execução"},
+                        status_code=409,
+                        headers={"Retry-After": "1"},
+                    )
+                    await resposta(scope, receive, send)
+                    return
+                # Em execução em outro worker (ou desfeita: a próxima volta reserva de novo)
+                await asyncio.sleep(INTERVALO_ESPERA)
+
+    async def _repetir(self, guardada: RespostaGuardada, digest: str, scope, receive, send) -> None:
+        if guardada.digest != digest:
+            self.idempotencia.conflitos += 1
+            resposta = JSONResponse(
+                {"detail": f"{IDEMPOTENCY_HEADER} já usada com outro corpo de requisição"},
+                status_code=422,
+            )
+            await resposta(scope, receive, send)
+            return
+        self.idempotencia.replays += 1
+        await send({
+            "type": "http.response.start",
+            "status": guardada.status,
+            "headers": [*guardada.headers, (REPLAY_HEADER.lower().encode(), b"true")],
+        })
+        await send({"type": "http.response.body", "body": guardada.corpo})
+
+    async def _executar(self, chave: str, corpo: bytes, scope, receive, send) -> None:
+        entregue = False
+
+        async def receber():
+            # O corpo já foi lido para o hash: é entregue de novo ao handler
+            nonlocal entregue
+            if not entregue:
+                entregue = True
+                return {"type": "http.request", "body": corpo, "more_body": False}
+            return await receive()
+
+        inicio: dict = {}
+        partes: list[bytes] = []
+        guardada = False
+
+        async def enviar(mensagem):
+            nonlocal guardada
+            if mensagem["type"] == "http.response.start":
+                inicio.update(mensagem)
+            elif mensagem["type"] == "http.response.body":
+                partes.append(mensagem.get("body", b""))
+                if not mensagem.get("more_body", False) and inicio.get("status", 500) < 500:
+                    await self.idempotencia.guardar(
+                        chave, inicio["status"], list(inicio.get("headers", [])), b"".join(partes)
+                    )
+                    guardada = True
+            await send(mensagem)
+
+        self.idempotencia.execucoes += 1
+        try:
+            await self.app(scope, receber, enviar)
+        finally:
+            if not guardada:
+                await self.idempotencia.liberar(chave)
+
+
+idempotencia = Idempotencia(settings.idempotency_ttl, settings.idempotency_espera)
@@ -0,0 +1,130 @@
+'''Importação em lote (JSON ou CSV em streaming) com relatório por linha
+
+A rota lê as linhas do corpo, valida com o schema de criação e entrega lotes de
+TAMANHO_LOTE linhas válidas ao bulk_insert do repository. Cada lote é uma
+transação com um único INSERT ... RETURNING em várias linhas.
+'''
+
+import codecs
+import csv
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+
+TAMANHO_LOTE = 500
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+
+CRIADO = "criado"
+ERRO = "erro"
+
+
+class LinhaImportacao(BaseModel):
+    '''Resultado de uma linha da entrada (numeradas a partir de 1, sem o cabeçalho do CSV)'''
+    linha: int
+    status: str
+    id: int | None = None
+    erro: str | None = None
+
+
+class ImportacaoResponse(BaseModel):
+    '''Classe para resposta das importações em lote'''
+    total: int
+    criados: int
+    erros: int
+    linhas: list[LinhaImportacao]
+
+
+def erro_linha(linha: int, mensagem: str) -> LinhaImportacao:
+    return LinhaImportacao(linha=linha, status=ERRO, erro=mensagem)
+
+
+def _mensagem_validacao(erro: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(parte) for parte in detalhe['loc'])}: {detalhe['msg']}" for detalhe in erro.errors()
+    )
+
+
+def _registros_completos(texto: str) -> tuple[list[str], str]:
+    '''Separa as linhas completas do texto; quebras dentro de aspas não encerram o registro'''
+    completos, pendente = [], ""
+    for linha in texto.split("\n"):
+        pendente = f"{pendente}\n{linha}" if pendente else linha
+        if pendente.count('"') % 2 == 0:
+            completos.append(pendente)
+            pendente = ""
+    # A última linha pode estar incompleta: volta para o próximo pedaço
+    if not pendente and completos:
+        pendente = completos.pop()
+    return completos, pendente
+
+
+async def _linhas_csv(request: Request) -> AsyncIterator[dict]:
+    '''Lê o CSV conforme o corpo chega; células vazias ficam de fora (valem os padrões do schema)'''
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    cabecalho: list[str] | None = None
+    resto = ""
+
+    def registros(linhas: list[str]):
+        nonlocal cabecalho
+        for registro in csv.reader(linhas):
+            if not registro:
+                continue
+            if cabecalho is None:
+                cabecalho = [coluna.strip() for coluna in registro]
+                continue
+            yield {coluna: valor for coluna, valor in zip(cabecalho, registro, strict=False) if valor != ""}
+
+    async for pedaco in request.stream():
+        linhas, resto = _registros_completos(resto + decodificador.decode(pedaco))
+        for registro in registros(linhas):
+            yield registro
+    resto += decodificador.decode(b"", final=True)
+    for registro in registros([resto] if resto.strip() else []):
+        yield registro
+
+
+async def linhas_da_requisicao(request: Request) -> AsyncIterator[dict]:
+    '''Linhas do corpo: CSV (Content-Type text/csv) ou array JSON de objetos'''
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in CSV_MEDIA_TYPES:
+        async for linha in _linhas_csv(request):
+            yield linha
+        return
+    try:
+        dados = json.loads(await request.body())
+    except ValueError as erro:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="JSON inválido") from erro
+    if not isinstance(dados, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Envie um array JSON ou um CSV (text/csv)"
+        )
+    for linha in dados:
+        yield linha
+
+
+async def importar(
+    request: Request,
+    schema: type[BaseModel],
+    inserir_lote: Callable[[list[tuple[int, dict]]], Awaitable[list[LinhaImportacao]]],
+) -> ImportacaoResponse:
+    '''Valida as linhas com o schema e grava as válidas em lotes com inserir_lote'''
+    relatorio: list[LinhaImportacao] = []
+    lote: list[tuple[int, dict]] = []
+    numero = 0
+    async for dados in linhas_da_requisicao(request):
+        numero += 1
+        try:
+            lote.append((numero, schema.model_validate(dados).model_dump()))
+        except ValidationError as erro:
+            relatorio.append(erro_linha(numero, _mensagem_validacao(erro)))
+        if len(lote) >= TAMANHO_LOTE:
+            relatorio.extend(await inserir_lote(lote))
+            lote = []
+    if lote:
+        relatorio.extend(await inserir_lote(lote))
+
+    relatorio.sort(key=lambda resultado: resultado.linha)
+    criados = sum(resultado.status == CRIADO for resultado in relatorio)
+    return ImportacaoResponse(total=numero, criados=criados, erros=numero - criados, linhas=relatorio)
@@ -1,13 +1,33 @@
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
 
-from ..model.model import Localizacao
+from ..cache_respostas import cache_respostas
+from ..importacao import CRIADO, LinhaImportacao
+from ..model.model import Carros, Localizacao, RegraPreco, RollupReservaDiaria
+from ..pagination import Page, PageParams, paginate
+from ..precos.motor import motor_precos
+from ..repository import AsyncRepository, BaseRepository, inserir_varios
 
 
-class LocalizacoesRepository:
+class LocalizacoesRepository(BaseRepository):
+    model = Localizacao
+    nao_encontrado = "Localização não encontrada"
+    cache_namespaces = ("localizacoes",)
+
+    FILTROS = {"nome": Localizacao.nome}
+    ORDENACOES = {"id": Localizacao.id, "criadoEm": Localizacao.criadoEm}
+
     @staticmethod
-    def find_all(database: Session) -> list[Localizacao]:
-        '''Função para fazer uma query de todas as localizações da DB'''
-        return database.query(Localizacao).all()
+    def find_all(database: Session, params: PageParams) -> Page:
+        '''Função para fazer uma query paginada por cursor de todas as localizações da DB'''
+        return paginate(
+            database,
+            select(Localizacao),
+            params,
+            id_coluna=Localizacao.id,
+            ordenacoes=LocalizacoesRepository.ORDENACOES,
+            filtros=LocalizacoesRepository.FILTROS,
+        )
 
     @staticmethod
     def save(database: Session, localizacao: Localizacao) -> Localizacao:
@@ -17,26 +37,34 @@ class LocalizacoesRepository:
         else:
             database.add(localizacao)
         database.commit()
+        LocalizacoesRepository._invalidar_cache()
         database.refresh(localizacao)
         return localizacao
 
     @staticmethod
-    def find_by_id(database: Session, id: int) -> Localizacao:
-        '''Função para fazer uma query por ID de um objeto localização na DB'''
-        return database.query(Localizacao).filter(Localizacao.id == id).first()
+    def bulk_insert(database: Session, linhas: list[tuple[int, dict]]) -> list[LinhaImportacao]:
+        '''Insere um lote de localizações já validadas em uma transação'''
+        ids = inserir_varios(database, Localizacao.__table__, [dados for _, dados in linhas])
+        database.commit()
+        LocalizacoesRepository._invalidar_cache()
+        return [LinhaImportacao(linha=numero, status=CRIADO, id=id) for (numero, _), id in zip(linhas, ids, strict=False)]
 
     @staticmethod
-    def exists_by_id(database: Session, id: int) -> bool:
-        '''Função que verifica se o ID dado existe na DB'''
-        return database.query(Localizacao).filter(Localizacao.id == id).first() is not None
+    def _delete_dependentes(database: Session, id: int) -> None:
+        '''Desvincula os carros da localização, como o ORM faria no delete, e remove as regras de preço
+        e os agregados dela (linhas zeradas que ficam após excluir as reservas)'''
+        database.execute(update(Carros).where(Carros.localizacaoId == id).values(localizacaoId=None))
+        database.execute(delete(RegraPreco).where(RegraPreco.localizacaoId == id))
+        database.execute(delete(RollupReservaDiaria).where(RollupReservaDiaria.localizacaoId == id))
 
-    @staticmethod
-    def delete_by_id(database: Session, id: int) -> None:
-        '''Função para excluir um objeto localização da DB dado o ID'''
-        localizacao = database.query(Localizacao).filter(Localizacao.id == id).first()
-        if localizacao is not None:
-            database.delete(localizacao)
-            database.commit()
+    @classmethod
+    def delete_by_id(cls, database: Session, id: int) -> bool:
+        '''Exclui a localização; os carros desvinculados também saem do cache'''
+        removida = super().delete_by_id(database, id)
+        if removida:
+            cache_respostas.invalidar("carros")
+            motor_precos.invalidar()
+        return removida
 
     @staticmethod
     def count_all(database: Session) -> int:
@@ -47,3 +75,6 @@ class LocalizacoesRepository:
     def find_by_nome(database: Session, nome: str) -> list[Localizacao]:
         '''Função para fazer uma query por nome de localizações na DB'''
         return database.query(Localizacao).filter(Localizacao.nome.ilike(f"%{nome}%")).all()
+
+
+AsyncLocalizacoesRepository = AsyncRepository(LocalizacoesRepository)
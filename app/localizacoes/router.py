@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from ..condicional import condicional_item, condicional_lista
+from ..database import get_async_db as get_async_database
 from ..database import get_db as get_database
+from ..importacao import ImportacaoResponse, importar
 from ..model.model import Localizacao
-from .repository import LocalizacoesRepository
+from ..pagination import PageParams, page_params
+from ..serializacao import resposta_lista
+from .repository import AsyncLocalizacoesRepository, LocalizacoesRepository
 from .schema import LocalizacaoRequest, LocalizacaoResponse
 
 router = APIRouter(
@@ -22,53 +28,53 @@ def create(request: LocalizacaoRequest, database: Session = Depends(get_database
     localizacao = LocalizacoesRepository.save(database, Localizacao(**request.dict()))
     return localizacao
 
+# BULK CREATE
+@router.post("/bulk", response_model=ImportacaoResponse)
+async def bulk_create(request: Request, database: AsyncSession = Depends(get_async_database)):
+    '''Importa localizações em lote de um array JSON ou de um CSV (text/csv), com o resultado de cada linha'''
+    return await importar(
+        request, LocalizacaoRequest, lambda lote: AsyncLocalizacoesRepository.bulk_insert(database, lote)
+    )
+
 # READ ALL
-@router.get("/", response_model=list[LocalizacaoResponse])
-def find_all(database: Session = Depends(get_database)):
-    '''Faz uma query de todos os objetos localização na DB (sem paginação)'''
-    localizacoes = LocalizacoesRepository.find_all(database)
-    return [LocalizacaoResponse.from_orm(localizacao) for localizacao in localizacoes]
+@router.get("/", response_model=list[LocalizacaoResponse], dependencies=[condicional_lista(Localizacao)])
+def find_all(
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: Session = Depends(get_database),
+):
+    '''Faz uma query paginada por cursor dos objetos localização na DB (próximo cursor em X-Next-Cursor)'''
+    pagina = LocalizacoesRepository.find_all(database, params)
+    pagina.aplicar_headers(response)
+    return resposta_lista(LocalizacaoResponse, pagina.itens, response)
 
 # READ BY ID
-@router.get("/{id}", response_model=LocalizacaoResponse)
+@router.get("/{id}", response_model=LocalizacaoResponse, dependencies=[condicional_item(Localizacao)])
 def find_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID como parâmetro, encontra a localização com esse ID'''
-    localizacao = LocalizacoesRepository.find_by_id(database, id)
-    if not localizacao:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Localização não encontrada"
-        )
+    localizacao = LocalizacoesRepository.get_or_404(database, id)
     return LocalizacaoResponse.from_orm(localizacao)
 
 # UPDATE BY ID
 @router.put("/{id}", response_model=LocalizacaoResponse)
 def update(id: int, request: LocalizacaoRequest, database: Session = Depends(get_database)):
     '''Dado o ID da localização, atualiza os dados na DB por meio do método PUT'''
-    if not LocalizacoesRepository.exists_by_id(database, id):
+    # Um único UPDATE ... RETURNING com os campos fornecidos
+    localizacao_atualizada = LocalizacoesRepository.update_by_id(database, id, request.dict())
+    if localizacao_atualizada is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Localização não encontrada"
         )
-    
-    # Buscar a localização existente
-    localizacao_existente = LocalizacoesRepository.find_by_id(database, id)
-    
-    # Atualizar os campos
-    for field, value in request.dict().items():
-        setattr(localizacao_existente, field, value)
-    
-    # Salvar as alterações
-    localizacao_atualizada = LocalizacoesRepository.save(database, localizacao_existente)
     return LocalizacaoResponse.from_orm(localizacao_atualizada)
 
 # DELETE BY ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID da localização, deleta o objeto da DB por meio do método DELETE'''
-    if not LocalizacoesRepository.exists_by_id(database, id):
+    if not LocalizacoesRepository.delete_by_id(database, id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Localização não encontrada"
         )
-    LocalizacoesRepository.delete_by_id(database, id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # GET COUNT
@@ -83,4 +89,4 @@ def count_all(database: Session = Depends(get_database)):
 def find_by_nome(nome: str, database: Session = Depends(get_database)):
     '''Dado o nome como parâmetro, encontra as localizações com esse nome'''
     localizacoes = LocalizacoesRepository.find_by_nome(database, nome)
-    return [LocalizacaoResponse.from_orm(localizacao) for localizacao in localizacoes]
+    return resposta_lista(LocalizacaoResponse, localizacoes)
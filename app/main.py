@@ -3,13 +3,24 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .admins.router import router as admins_router
 from .avaliacoes.router import router as avaliacoes_router
+from .busca.router import router as busca_router
+from .cache_respostas import CACHE_HEADER, CacheRespostasMiddleware, cache_respostas
 from .carros.router import router as carros_router
 from .clientes.router import router as clientes_router
 from .config import settings
+from .dashboards.kpis import tarefa_snapshot
 from .dashboards.router import router as dashboards_router
+from .database import pool_status
+from .exportacao.router import router as exportacao_router
+from .idempotencia import REPLAY_HEADER, IdempotenciaMiddleware, idempotencia
 from .localizacoes.router import router as localizacoes_router
 from .metricas.router import router as metricas_router
+from .pagination import NEXT_CURSOR_HEADER
+from .precos.motor import motor_precos
+from .precos.router import router as precos_router
+from .reservas.ciclo import tarefa_ciclo
 from .reservas.router import router as reservas_router
+from .security import password_hasher
 
 app = FastAPI(
     title="Ceva Automotives API",
@@ -19,12 +30,17 @@ app = FastAPI(
 
 origins = ["*"]
 
+# Registrados antes do CORS para ficarem por dentro dele: acertos do cache e respostas
+# repetidas também recebem os cabeçalhos CORS
+app.add_middleware(CacheRespostasMiddleware, cache=cache_respostas)
+app.add_middleware(IdempotenciaMiddleware, idempotencia=idempotencia)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, CACHE_HEADER, REPLAY_HEADER, "ETag", "Last-Modified"],
 )
 
 app.include_router(carros_router)
@@ -35,6 +51,21 @@ app.include_router(reservas_router)
 app.include_router(avaliacoes_router)
 app.include_router(dashboards_router)
 app.include_router(metricas_router)
+app.include_router(busca_router)
+app.include_router(exportacao_router)
+app.include_router(precos_router)
+
+@app.on_event("startup")
+async def iniciar_tarefas():
+    if settings.kpi_snapshot_interval > 0:
+        tarefa_snapshot.iniciar()
+    if settings.reserva_ciclo_interval > 0:
+        tarefa_ciclo.iniciar()
+
+@app.on_event("shutdown")
+async def parar_tarefas():
+    await tarefa_snapshot.parar()
+    await tarefa_ciclo.parar()
 
 @app.get('/')
 async def hello_world():
@@ -52,6 +83,30 @@ async def health_check():
         "environment": settings.environment
     }
 
+@app.get('/health/db')
+def database_pool_health():
+    return pool_status()
+
+@app.get('/health/hashing')
+async def password_hashing_health():
+    return password_hasher.metrics()
+
+@app.get('/health/cache')
+async def response_cache_health():
+    return cache_respostas.metrics()
+
+@app.get('/health/idempotencia')
+async def idempotency_health():
+    return idempotencia.metrics()
+
+@app.get('/health/precos')
+async def pricing_engine_health():
+    return motor_precos.metrics()
+
+@app.get('/health/scheduler')
+async def scheduler_health():
+    return [tarefa.metrics() for tarefa in (tarefa_ciclo, tarefa_snapshot)]
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host=settings.api_host, port=settings.api_port)
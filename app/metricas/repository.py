@@ -1,13 +1,29 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from ..model.model import Metrica
+from ..pagination import Page, PageParams, paginate
+from ..repository import BaseRepository
 
 
-class MetricasRepository:
+class MetricasRepository(BaseRepository):
+    model = Metrica
+    nao_encontrado = "Métrica não encontrada"
+
+    FILTROS = {"dashboardId": Metrica.dashboardId, "tipo": Metrica.tipo, "nome": Metrica.nome}
+    ORDENACOES = {"id": Metrica.id, "criadoEm": Metrica.criadoEm}
+
     @staticmethod
-    def find_all(database: Session) -> list[Metrica]:
-        '''Função para fazer uma query de todas as métricas da DB'''
-        return database.query(Metrica).all()
+    def find_all(database: Session, params: PageParams) -> Page:
+        '''Função para fazer uma query paginada por cursor de todas as métricas da DB'''
+        return paginate(
+            database,
+            select(Metrica),
+            params,
+            id_coluna=Metrica.id,
+            ordenacoes=MetricasRepository.ORDENACOES,
+            filtros=MetricasRepository.FILTROS,
+        )
 
     @staticmethod
     def save(database: Session, metrica: Metrica) -> Metrica:
@@ -20,24 +36,6 @@ class MetricasRepository:
         database.refresh(metrica)
         return metrica
 
-    @staticmethod
-    def find_by_id(database: Session, id: int) -> Metrica:
-        '''Função para fazer uma query por ID de um objeto métrica na DB'''
-        return database.query(Metrica).filter(Metrica.id == id).first()
-
-    @staticmethod
-    def exists_by_id(database: Session, id: int) -> bool:
-        '''Função que verifica se o ID dado existe na DB'''
-        return database.query(Metrica).filter(Metrica.id == id).first() is not None
-
-    @staticmethod
-    def delete_by_id(database: Session, id: int) -> None:
-        '''Função para excluir um objeto métrica da DB dado o ID'''
-        metrica = database.query(Metrica).filter(Metrica.id == id).first()
-        if metrica is not None:
-            database.delete(metrica)
-            database.commit()
-
     @staticmethod
     def count_all(database: Session) -> int:
         '''Função para fazer uma query de contagem de todas as métricas da DB'''
@@ -48,10 +46,15 @@ class MetricasRepository:
         '''Função para fazer uma query por dashboard de métricas na DB'''
         return database.query(Metrica).filter(Metrica.dashboardId == dashboard_id).all()
 
+    @staticmethod
+    def filtro_tipo(tipo: str):
+        '''Critério da busca por tipo (trecho do texto, sem diferenciar maiúsculas)'''
+        return Metrica.tipo.ilike(f"%{tipo}%")
+
     @staticmethod
     def find_by_tipo(database: Session, tipo: str) -> list[Metrica]:
         '''Função para fazer uma query por tipo de métricas na DB'''
-        return database.query(Metrica).filter(Metrica.tipo.ilike(f"%{tipo}%")).all()
+        return database.query(Metrica).filter(MetricasRepository.filtro_tipo(tipo)).all()
 
     @staticmethod
     def count_by_dashboard(database: Session, dashboard_id: int) -> int:
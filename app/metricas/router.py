@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 
+from ..condicional import FiltroCaminho, condicional_item, condicional_lista
 from ..dashboards.repository import DashboardsRepository
 from ..database import get_db as get_database
 from ..model.model import Metrica
+from ..pagination import PageParams, page_params
+from ..serializacao import resposta_lista
 from .repository import MetricasRepository
 from .schema import MetricaRequest, MetricaResponse, MetricaUpdateRequest
 
@@ -31,54 +34,44 @@ def create(request: MetricaRequest, database: Session = Depends(get_database)):
     return metrica
 
 # READ ALL
-@router.get("/", response_model=list[MetricaResponse])
-def find_all(database: Session = Depends(get_database)):
-    '''Faz uma query de todos os objetos métrica na DB (sem paginação)'''
-    metricas = MetricasRepository.find_all(database)
-    return [MetricaResponse.from_orm(metrica) for metrica in metricas]
+@router.get("/", response_model=list[MetricaResponse], dependencies=[condicional_lista(Metrica)])
+def find_all(
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: Session = Depends(get_database),
+):
+    '''Faz uma query paginada por cursor dos objetos métrica na DB (próximo cursor em X-Next-Cursor)'''
+    pagina = MetricasRepository.find_all(database, params)
+    pagina.aplicar_headers(response)
+    return resposta_lista(MetricaResponse, pagina.itens, response)
 
 # READ BY ID
-@router.get("/{id}", response_model=MetricaResponse)
+@router.get("/{id}", response_model=MetricaResponse, dependencies=[condicional_item(Metrica)])
 def find_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID como parâmetro, encontra a métrica com esse ID'''
-    metrica = MetricasRepository.find_by_id(database, id)
-    if not metrica:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Métrica não encontrada"
-        )
+    metrica = MetricasRepository.get_or_404(database, id)
     return MetricaResponse.from_orm(metrica)
 
 # UPDATE BY ID
 @router.put("/{id}", response_model=MetricaResponse)
 def update(id: int, request: MetricaUpdateRequest, database: Session = Depends(get_database)):
     '''Dado o ID da métrica, atualiza os dados na DB por meio do método PUT'''
-    if not MetricasRepository.exists_by_id(database, id):
+    # Um único UPDATE ... RETURNING com os campos fornecidos
+    metrica_atualizada = MetricasRepository.update_by_id(database, id, request.dict(exclude_unset=True))
+    if metrica_atualizada is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Métrica não encontrada"
         )
-    
-    # Buscar a métrica existente
-    metrica_existente = MetricasRepository.find_by_id(database, id)
-    
-    # Atualizar os campos fornecidos
-    update_data = request.dict(exclude_unset=True)
-    
-    for field, value in update_data.items():
-        setattr(metrica_existente, field, value)
-    
-    # Salvar as alterações
-    metrica_atualizada = MetricasRepository.save(database, metrica_existente)
     return MetricaResponse.from_orm(metrica_atualizada)
 
 # DELETE BY ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID da métrica, deleta o objeto da DB por meio do método DELETE'''
-    if not MetricasRepository.exists_by_id(database, id):
+    if not MetricasRepository.delete_by_id(database, id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Métrica não encontrada"
         )
-    MetricasRepository.delete_by_id(database, id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # GET COUNT
@@ -89,18 +82,18 @@ def count_all(database: Session = Depends(get_database)):
     return {"count": count}
 
 # GET BY DASHBOARD
-@router.get("/dashboard/{dashboard_id}", response_model=list[MetricaResponse])
-def find_by_dashboard(dashboard_id: int, database: Session = Depends(get_database)):
+@router.get("/dashboard/{dashboard_id}", response_model=list[MetricaResponse], dependencies=[condicional_lista(Metrica, dashboardId="dashboard_id")])
+def find_by_dashboard(dashboard_id: int, response: Response, database: Session = Depends(get_database)):
     '''Dado o ID do dashboard, encontra as métricas desse dashboard'''
     metricas = MetricasRepository.find_by_dashboard(database, dashboard_id)
-    return [MetricaResponse.from_orm(metrica) for metrica in metricas]
+    return resposta_lista(MetricaResponse, metricas, response)
 
 # GET BY TIPO
-@router.get("/tipo/{tipo}", response_model=list[MetricaResponse])
-def find_by_tipo(tipo: str, database: Session = Depends(get_database)):
+@router.get("/tipo/{tipo}", response_model=list[MetricaResponse], dependencies=[condicional_lista(Metrica, tipo=FiltroCaminho("tipo", MetricasRepository.filtro_tipo))])
+def find_by_tipo(tipo: str, response: Response, database: Session = Depends(get_database)):
     '''Dado o tipo, encontra as métricas com esse tipo'''
     metricas = MetricasRepository.find_by_tipo(database, tipo)
-    return [MetricaResponse.from_orm(metrica) for metrica in metricas]
+    return resposta_lista(MetricaResponse, metricas, response)
 
 # GET COUNT BY DASHBOARD
 @router.get("/count/dashboard/{dashboard_id}")
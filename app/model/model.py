@@ -3,9 +3,24 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    event,
+    text,
+)
 from sqlalchemy import Enum as SQLEnum
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import DDL
 
 from ..database import Base
 
@@ -24,6 +39,18 @@ class StatusReserva(str, enum.Enum):
     CANCELADA = "Cancelada"
     CONCLUIDA = "Concluida"
 
+    @classmethod
+    def _missing_(cls, valor):
+        # As colunas gravam o nome (CONFIRMADA) e aceitam nome ou valor: StatusReserva(...) também
+        return cls.__members__.get(valor)
+
+class TipoRegraPreco(str, enum.Enum):
+    '''Enum para os tipos de regra de preço'''
+    SAZONAL = "Sazonal"                # multiplica a diária nos dias entre inicio e fim
+    FIM_DE_SEMANA = "FimDeSemana"      # multiplica a diária aos sábados e domingos
+    LONGA_DURACAO = "LongaDuracao"     # multiplica o total das diárias a partir de diasMinimos
+    TAXA_DEVOLUCAO = "TaxaDevolucao"   # valorFixo quando a devolução é em outra localização
+
 # Classe abstrata Usuario
 class Usuario(Base):
     '''Classe base abstrata para usuários do sistema'''
@@ -114,6 +141,19 @@ class Carros(Base):
     avaliacoes = relationship("Avaliacao", back_populates="carro", cascade="all, delete-orphan")
     reservas = relationship("Reserva", back_populates="carro")
 
+    __table_args__ = (
+        Index("ix_carros_localizacao", "localizacaoId"),
+        # Parciais: só os carros disponíveis/em destaque entram no índice
+        Index(
+            "ix_carros_disponivel_parcial", "localizacaoId", "categoria",
+            postgresql_where=disponivel.is_(True), sqlite_where=disponivel.is_(True),
+        ),
+        Index(
+            "ix_carros_destaque_parcial", "id",
+            postgresql_where=destaque.is_(True), sqlite_where=destaque.is_(True),
+        ),
+    )
+
 class Reserva(Base):
     '''Classe para estabelecer o modelo da tabela de reservas na DB'''
     __tablename__ = "reservas"
@@ -136,6 +176,17 @@ class Reserva(Base):
     localizacaoRetirada = relationship("Localizacao", foreign_keys=[localizacaoRetiradaId], back_populates="reservas_retirada")
     localizacaoDevolucao = relationship("Localizacao", foreign_keys=[localizacaoDevolucaoId], back_populates="reservas_devolucao")
 
+    __table_args__ = (
+        # Atende a checagem de sobreposição de períodos por carro (busca de disponibilidade)
+        Index("ix_reservas_carro_status_periodo", "carroId", "status", "dataRetirada", "dataDevolucao"),
+        Index("ix_reservas_cliente", "clienteId"),
+        # Listagens por status e agregações de KPIs por período de retirada
+        Index("ix_reservas_status_retirada", "status", "dataRetirada"),
+        # Varreduras do ciclo de vida: pendentes vencidas e confirmadas já devolvidas
+        Index("ix_reservas_status_criado", "status", "criadoEm"),
+        Index("ix_reservas_status_devolucao", "status", "dataDevolucao"),
+    )
+
 class Avaliacao(Base):
     '''Classe para estabelecer o modelo da tabela de avaliações na DB'''
     __tablename__ = "avaliacoes"
@@ -153,6 +204,62 @@ class Avaliacao(Base):
     cliente = relationship("Cliente", back_populates="avaliacoes")
     carro = relationship("Carros", back_populates="avaliacoes")
 
+    __table_args__ = (
+        Index("ix_avaliacoes_carro", "carroId"),
+        Index("ix_avaliacoes_cliente", "clienteId"),
+        Index("ix_avaliacoes_nota", "nota"),
+    )
+
+class RollupReservaDiaria(Base):
+    '''Receita e ocupação diárias por localização de retirada e categoria do carro
+
+    Mantida a cada mudança de status das reservas; considera apenas reservas
+    confirmadas e concluídas.
+    '''
+    __tablename__ = "rollup_reservas_diario"
+
+    dia: Date = Column(Date, primary_key=True)
+    localizacaoId: int = Column(Integer, ForeignKey('localizacoes.id'), primary_key=True)
+    categoria: str = Column(String(100), primary_key=True)
+    receita: float = Column(Float, nullable=False, default=0.0)  # atribuída ao dia da retirada
+    reservas: int = Column(Integer, nullable=False, default=0)
+    carroDias: float = Column(Float, nullable=False, default=0.0)  # fração de cada dia ocupada
+
+class AvaliacaoResumo(Base):
+    '''Resumo materializado das avaliações de cada carro (mantido a cada create/update/delete)'''
+    __tablename__ = "avaliacoes_resumo"
+
+    carroId: int = Column(Integer, ForeignKey('carros.id'), primary_key=True)
+    total: int = Column(Integer, nullable=False, default=0)
+    soma: int = Column(Integer, nullable=False, default=0)
+    nota1: int = Column(Integer, nullable=False, default=0)
+    nota2: int = Column(Integer, nullable=False, default=0)
+    nota3: int = Column(Integer, nullable=False, default=0)
+    nota4: int = Column(Integer, nullable=False, default=0)
+    nota5: int = Column(Integer, nullable=False, default=0)
+    atualizadoEm: DateTime = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+class RegraPreco(Base):
+    '''Regra de preço das reservas; categoria e localizacaoId nulos valem para todos
+
+    Compiladas em memória por app/precos/motor.py em um calendário de fatores diários.
+    '''
+    __tablename__ = "regras_preco"
+
+    id: int = Column(Integer, primary_key=True, index=True)
+    nome: str = Column(String(200), nullable=False)
+    tipo: str = Column(SQLEnum(TipoRegraPreco), nullable=False)
+    categoria: str = Column(String(100), nullable=True)
+    localizacaoId: int = Column(Integer, ForeignKey('localizacoes.id'), nullable=True)
+    inicio: Date = Column(Date, nullable=True)
+    fim: Date = Column(Date, nullable=True)  # inclusive
+    multiplicador: float = Column(Float, nullable=False, default=1.0)
+    valorFixo: float = Column(Float, nullable=False, default=0.0)
+    diasMinimos: int = Column(Integer, nullable=True)
+    ativa: bool = Column(Boolean, nullable=False, default=True)
+    criadoEm: DateTime = Column(DateTime, nullable=False, default=datetime.now)
+    atualizadoEm: DateTime = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
 class Dashboard(Base):
     '''Classe para estabelecer o modelo da tabela de dashboards na DB'''
     __tablename__ = "dashboards"
@@ -167,6 +274,9 @@ class Dashboard(Base):
     admin = relationship("Admin", back_populates="dashboard")
     metricas = relationship("Metrica", back_populates="dashboard", cascade="all, delete-orphan")
 
+# Predicado do índice único parcial das métricas de KPI (tipo "kpi")
+METRICA_KPI = "tipo = 'kpi'"
+
 class Metrica(Base):
     '''Classe para estabelecer o modelo da tabela de métricas na DB'''
     __tablename__ = "metricas"
@@ -181,3 +291,76 @@ class Metrica(Base):
     
     # Relacionamento
     dashboard = relationship("Dashboard", back_populates="metricas")
+
+    __table_args__ = (
+        Index("ix_metricas_dashboard_tipo", "dashboardId", "tipo"),
+        # Um KPI por (dashboard, nome): alvo do ON CONFLICT dos snapshots de KpisService
+        Index(
+            "uq_metricas_kpi", "dashboardId", "nome", unique=True,
+            postgresql_where=text(METRICA_KPI), sqlite_where=text(METRICA_KPI),
+        ),
+    )
+
+
+class ChaveIdempotencia(Base):
+    '''Resposta guardada de um POST com Idempotency-Key, compartilhada entre os workers
+
+    A chave primária é o hash de caminho + chave: o INSERT dela é a reserva da execução.
+    status nulo indica que a primeira requisição ainda está em andamento.
+    '''
+    __tablename__ = "idempotencia_chaves"
+
+    chave: str = Column(String(64), primary_key=True)
+    digest: str = Column(String(64), nullable=False)  # sha256 do corpo da requisição
+    status: int = Column(Integer, nullable=True)
+    cabecalhos: str = Column(Text, nullable=True)  # JSON [[nome, valor], ...]
+    corpo: bytes = Column(LargeBinary, nullable=True)
+    criadoEm: DateTime = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_idempotencia_chaves_criado", "criadoEm"),
+    )
+
+
+# Busca textual no SQLite: tabelas FTS5 de conteúdo externo sincronizadas por triggers.
+# No Postgres os índices tsvector/trigram são criados pela migração 0003.
+def ddl_fts5(tabela: str, colunas: tuple[str, ...]) -> list[str]:
+    fts = f"{tabela}_fts"
+    lista = ", ".join(colunas)
+    novos = ", ".join(f"new.{coluna}" for coluna in colunas)
+    antigos = ", ".join(f"old.{coluna}" for coluna in colunas)
+    remover = f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {antigos});"
+    inserir = f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {novos});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({lista}, content='{tabela}', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN {inserir} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN {remover} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {tabela} BEGIN {remover} {inserir} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+COLUNAS_BUSCA = {
+    Carros.__table__: ("marca", "modelo", "categoria", "descricao"),
+    Localizacao.__table__: ("nome", "endereco"),
+}
+
+for _tabela, _colunas in COLUNAS_BUSCA.items():
+    for _sql in ddl_fts5(_tabela.name, _colunas):
+        event.listen(_tabela, "after_create", DDL(_sql).execute_if(dialect="sqlite"))
+    event.listen(
+        _tabela, "before_drop", DDL(f"DROP TABLE IF EXISTS {_tabela.name}_fts").execute_if(dialect="sqlite")
+    )
+
+# Sobreposição de reservas ativas do mesmo carro barrada pelo próprio Postgres (migração 0006).
+# O intervalo [dataRetirada, dataDevolucao) é o mesmo de ReservasRepository.ocupacao.
+RESTRICAO_SOBREPOSICAO = (
+    'ALTER TABLE reservas ADD CONSTRAINT reservas_sem_sobreposicao EXCLUDE USING gist '
+    '("carroId" WITH =, tsrange("dataRetirada", "dataDevolucao") WITH &&) '
+    "WHERE (status IN ('PENDENTE', 'CONFIRMADA'))"
+)
+event.listen(
+    Reserva.__table__, "after_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql"),
+)
+event.listen(Reserva.__table__, "after_create", DDL(RESTRICAO_SOBREPOSICAO).execute_if(dialect="postgresql"))
@@ -0,0 +1,178 @@
+'''Paginação por cursor (keyset) compartilhada pelos endpoints de listagem'''
+
+import base64
+import binascii
+import enum
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any
+
+from fastapi import HTTPException, Query, Request, Response, status
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import InstrumentedAttribute, Session
+from sqlalchemy.sql import Select
+
+from .config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PARAMETROS_RESERVADOS = {"limit", "cursor", "sort"}
+
+
+@dataclass
+class PageParams:
+    '''Parâmetros de paginação, ordenação e filtros de uma listagem'''
+    limit: int
+    cursor: str | None = None
+    sort: str = "id"
+    filtros: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class Page:
+    '''Uma página de resultados e o cursor para a próxima página (se houver)'''
+    itens: list
+    proximo_cursor: str | None = None
+
+    def aplicar_headers(self, response: Response) -> None:
+        '''Expõe o cursor da próxima página no header da resposta'''
+        if self.proximo_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = self.proximo_cursor
+
+
+def page_params(
+    request: Request,
+    limit: int | None = Query(None, ge=1, description="Quantidade máxima de itens por página"),
+    cursor: str | None = Query(None, description="Cursor retornado em X-Next-Cursor"),
+    sort: str = Query("id", description="Campo de ordenação; prefixe com '-' para ordem decrescente"),
+) -> PageParams:
+    '''Dependência que lê limit/cursor/sort e trata os demais query params como filtros'''
+    limite = min(limit or settings.pagination_default_limit, settings.pagination_max_limit)
+    filtros = {
+        chave: valor
+        for chave, valor in request.query_params.items()
+        if chave not in PARAMETROS_RESERVADOS
+    }
+    return PageParams(limit=limite, cursor=cursor, sort=sort, filtros=filtros)
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _converter(coluna: InstrumentedAttribute, valor: Any) -> Any:
+    '''Converte um valor recebido como texto para o tipo python da coluna'''
+    if valor is None:
+        return None
+    tipo = coluna.type.python_type
+    if isinstance(valor, tipo):
+        return valor
+    if tipo is bool:
+        texto = str(valor).lower()
+        if texto in ("true", "1", "sim"):
+            return True
+        if texto in ("false", "0", "nao", "não"):
+            return False
+        raise ValueError(valor)
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        return date.fromisoformat(valor)
+    return tipo(valor)
+
+
+def _serializar(valor: Any) -> Any:
+    if isinstance(valor, datetime | date):
+        return valor.isoformat()
+    if isinstance(valor, enum.Enum):
+        return valor.value
+    return valor
+
+
+def encode_cursor(sort: str, valor: Any, id: int) -> str:
+    '''Codifica a posição do último item da página em um token opaco'''
+    payload = json.dumps({"s": sort, "v": _serializar(valor), "id": id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    '''Decodifica um token gerado por encode_cursor'''
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        if not isinstance(payload, dict) or not {"s", "v", "id"} <= payload.keys():
+            raise ValueError(cursor)
+        return payload
+    except (ValueError, binascii.Error) as erro:
+        raise _bad_request("Cursor inválido") from erro
+
+
+def paginate(
+    database: Session,
+    stmt: Select,
+    params: PageParams,
+    id_coluna: InstrumentedAttribute,
+    ordenacoes: dict[str, InstrumentedAttribute],
+    filtros: dict[str, InstrumentedAttribute] | None = None,
+) -> Page:
+    '''Aplica filtros declarados, ordenação estável (campo, id) e keyset sobre o statement
+
+    stmt pode selecionar um model (itens são objetos) ou colunas (itens são Rows);
+    as colunas de ordenação precisam estar na projeção.
+    '''
+    filtros = filtros or {}
+    for chave, valor in params.filtros.items():
+        if chave not in filtros:
+            raise _bad_request(f"Filtro não suportado: {chave}")
+        try:
+            stmt = stmt.where(filtros[chave] == _converter(filtros[chave], valor))
+        except (TypeError, ValueError) as erro:
+            raise _bad_request(f"Valor inválido para o filtro {chave}") from erro
+
+    sort = params.sort
+    descendente = sort.startswith("-")
+    campo = sort.lstrip("-")
+    if campo not in ordenacoes:
+        raise _bad_request(f"Ordenação não suportada: {campo}")
+    coluna = ordenacoes[campo]
+
+    if params.cursor:
+        cursor = decode_cursor(params.cursor)
+        if cursor["s"] != sort:
+            raise _bad_request("Cursor gerado para outra ordenação")
+        try:
+            ultimo_id = int(cursor["id"])
+            ultimo_valor = _converter(coluna, cursor["v"])
+        except (TypeError, ValueError) as erro:
+            raise _bad_request("Cursor inválido") from erro
+        if coluna is id_coluna:
+            stmt = stmt.where(id_coluna < ultimo_id if descendente else id_coluna > ultimo_id)
+        elif descendente:
+            stmt = stmt.where(or_(
+                coluna < ultimo_valor,
+                and_(coluna == ultimo_valor, id_coluna < ultimo_id),
+            ))
+        else:
+            stmt = stmt.where(or_(
+                coluna > ultimo_valor,
+                and_(coluna == ultimo_valor, id_coluna > ultimo_id),
+            ))
+
+    if coluna is id_coluna:
+        ordem = [id_coluna.desc() if descendente else id_coluna.asc()]
+    else:
+        ordem = [coluna.desc(), id_coluna.desc()] if descendente else [coluna.asc(), id_coluna.asc()]
+
+    # Busca um item a mais para saber se existe próxima página sem um COUNT
+    resultado = database.execute(stmt.order_by(*ordem).limit(params.limit + 1))
+    descricoes = stmt.column_descriptions
+    if len(descricoes) == 1 and descricoes[0]["expr"] is descricoes[0]["entity"]:
+        # select(Model): objetos ORM; projeções de colunas ficam como Rows
+        resultado = resultado.scalars()
+    itens = list(resultado)
+    proximo_cursor = None
+    if len(itens) > params.limit:
+        itens = itens[:params.limit]
+        ultimo = itens[-1]
+        proximo_cursor = encode_cursor(sort, getattr(ultimo, coluna.key), getattr(ultimo, id_coluna.key))
+    return Page(itens=itens, proximo_cursor=proximo_cursor)
@@ -0,0 +1,207 @@
+'''Motor de preços das reservas: regras compiladas em um calendário de tarifas
+
+Cada (categoria, localizacaoId) ganha um vetor de fatores diários (produto dos
+multiplicadores sazonais e de fim de semana que casam com o dia) a partir da data
+de compilação, guardado como somas de prefixo. O total das diárias de um aluguel
+de N dias é precoDia * (prefixo[fim] - prefixo[inicio]): duas leituras, sem avaliar
+regra por dia. Datas fora do horizonte caem na avaliação direta das regras.
+
+O calendário é recompilado quando as regras mudam (invalidar) e após
+precos_calendario_ttl segundos, para pegar alterações feitas por outros processos.
+'''
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..model.model import RegraPreco, TipoRegraPreco
+
+TIPOS_DIARIOS = (TipoRegraPreco.SAZONAL, TipoRegraPreco.FIM_DE_SEMANA)
+SABADO = 5
+
+
+@dataclass(frozen=True)
+class Regra:
+    '''Regra ativa desacoplada da sessão'''
+    tipo: TipoRegraPreco
+    categoria: str | None
+    localizacaoId: int | None
+    inicio: date | None
+    fim: date | None
+    multiplicador: float
+    valorFixo: float
+    diasMinimos: int | None
+
+    def casa(self, categoria: str | None, localizacao_id: int | None) -> bool:
+        return (
+            (self.categoria is None or self.categoria == categoria)
+            and (self.localizacaoId is None or self.localizacaoId == localizacao_id)
+        )
+
+    def vale_no_dia(self, dia: date) -> bool:
+        if self.inicio is not None and dia < self.inicio:
+            return False
+        if self.fim is not None and dia > self.fim:
+            return False
+        return self.tipo != TipoRegraPreco.FIM_DE_SEMANA or dia.weekday() >= SABADO
+
+
+@dataclass(frozen=True)
+class Cotacao:
+    '''Valor de uma reserva: diárias com os fatores do calendário, desconto de longa duração e taxa'''
+    dias: int
+    valorDiarias: float
+    desconto: float
+    taxaDevolucao: float
+    valorTotal: float
+
+
+def dias_cobrados(data_retirada: datetime, data_devolucao: datetime) -> int:
+    '''Diárias completas do período, no mínimo uma'''
+    return max((data_devolucao - data_retirada).days, 1)
+
+
+class CalendarioTarifas:
+    '''Somas de prefixo dos fatores diários por (categoria, localizacaoId), compiladas sob demanda'''
+
+    def __init__(self, regras: list[Regra], inicio: date, dias: int):
+        self.regras = regras
+        self.inicio = inicio
+        self.dias = dias
+        self.compilado_em = time.monotonic()
+        self._prefixos: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def _diarias(self, categoria: str | None, localizacao_id: int | None) -> list[Regra]:
+        return [
+            regra for regra in self.regras
+            if regra.tipo in TIPOS_DIARIOS and regra.casa(categoria, localizacao_id)
+        ]
+
+    @staticmethod
+    def _fator(regras: list[Regra], dia: date) -> float:
+        fator = 1.0
+        for regra in regras:
+            if regra.vale_no_dia(dia):
+                fator *= regra.multiplicador
+        return fator
+
+    def _prefixo(self, categoria: str | None, localizacao_id: int | None) -> list[float]:
+        chave = (categoria, localizacao_id)
+        prefixo = self._prefixos.get(chave)
+        if prefixo is None:
+            regras = self._diarias(categoria, localizacao_id)
+            fatores = (self._fator(regras, self.inicio + timedelta(days=i)) for i in range(self.dias))
+            prefixo = list(accumulate(fatores, initial=0.0))
+            with self._lock:
+                self._prefixos[chave] = prefixo
+        return prefixo
+
+    def soma_fatores(self, categoria: str | None, localizacao_id: int | None, primeiro_dia: date, dias: int) -> float:
+        '''Soma dos fatores diários de primeiro_dia até primeiro_dia + dias (exclusivo)'''
+        deslocamento = (primeiro_dia - self.inicio).days
+        if 0 <= deslocamento and deslocamento + dias <= self.dias:
+            prefixo = self._prefixo(categoria, localizacao_id)
+            return prefixo[deslocamento + dias] - prefixo[deslocamento]
+        regras = self._diarias(categoria, localizacao_id)
+        return sum(self._fator(regras, primeiro_dia + timedelta(days=i)) for i in range(dias))
+
+    def cotar(
+        self,
+        preco_dia: float,
+        categoria: str | None,
+        localizacao_retirada_id: int | None,
+        localizacao_devolucao_id: int | None,
+        data_retirada: datetime,
+        data_devolucao: datetime,
+    ) -> Cotacao:
+        '''Cotação de um carro; a localização de retirada seleciona as regras'''
+        dias = dias_cobrados(data_retirada, data_devolucao)
+        diarias = preco_dia * self.soma_fatores(categoria, localizacao_retirada_id, data_retirada.date(), dias)
+
+        aplicaveis = [regra for regra in self.regras if regra.casa(categoria, localizacao_retirada_id)]
+        # Faixas de longa duração: vale a de maior diasMinimos atingida
+        faixas = [
+            regra for regra in aplicaveis
+            if regra.tipo == TipoRegraPreco.LONGA_DURACAO and dias >= (regra.diasMinimos or 0)
+        ]
+        desconto = 0.0
+        if faixas:
+            faixa = max(faixas, key=lambda regra: regra.diasMinimos or 0)
+            desconto = diarias * (1 - faixa.multiplicador)
+
+        taxa = 0.0
+        if localizacao_devolucao_id is not None and localizacao_devolucao_id != localizacao_retirada_id:
+            taxa = max(
+                (regra.valorFixo for regra in aplicaveis if regra.tipo == TipoRegraPreco.TAXA_DEVOLUCAO),
+                default=0.0,
+            )
+
+        return Cotacao(
+            dias=dias,
+            valorDiarias=round(diarias, 2),
+            desconto=round(desconto, 2),
+            taxaDevolucao=round(taxa, 2),
+            valorTotal=round(diarias - desconto + taxa, 2),
+        )
+
+
+class MotorPrecos:
+    '''Mantém o calendário compilado das regras ativas, compartilhado entre as requisições'''
+
+    def __init__(self, ttl: float, horizonte_dias: int):
+        self.ttl = ttl
+        self.horizonte_dias = horizonte_dias
+        self._calendario: CalendarioTarifas | None = None
+        self._lock = threading.Lock()
+        self.compilacoes = 0
+
+    def calendario(self, database: Session) -> CalendarioTarifas:
+        '''Calendário atual; recompilado se invalidado, expirado ou de outro dia'''
+        calendario = self._calendario
+        hoje = date.today()
+        if (
+            calendario is None
+            or calendario.inicio != hoje
+            or time.monotonic() - calendario.compilado_em > self.ttl
+        ):
+            with self._lock:
+                if self._calendario is not calendario and self._calendario is not None:
+                    return self._calendario
+                regras = [
+                    Regra(
+                        tipo=TipoRegraPreco(linha.tipo), categoria=linha.categoria, localizacaoId=linha.localizacaoId,
+                        inicio=linha.inicio, fim=linha.fim, multiplicador=linha.multiplicador,
+                        valorFixo=linha.valorFixo, diasMinimos=linha.diasMinimos,
+                    )
+                    for linha in database.execute(
+                        select(RegraPreco.__table__).where(RegraPreco.ativa.is_(True))
+                    )
+                ]
+                calendario = CalendarioTarifas(regras, hoje, self.horizonte_dias)
+                self._calendario = calendario
+                self.compilacoes += 1
+        return calendario
+
+    def invalidar(self) -> None:
+        '''Descarta o calendário (chamar após alterar regras)'''
+        with self._lock:
+            self._calendario = None
+
+    def metrics(self) -> dict:
+        calendario = self._calendario
+        return {
+            "regras": len(calendario.regras) if calendario else 0,
+            "chavesCompiladas": len(calendario._prefixos) if calendario else 0,
+            "horizonteDias": self.horizonte_dias,
+            "compilacoes": self.compilacoes,
+        }
+
+
+motor_precos = MotorPrecos(settings.precos_calendario_ttl, settings.precos_calendario_dias)
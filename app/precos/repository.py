@@ -0,0 +1,72 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..model.model import Localizacao, RegraPreco, TipoRegraPreco
+from ..pagination import Page, PageParams, paginate
+from ..repository import BaseRepository
+from .motor import motor_precos
+from .schema import RegraPrecoRequest
+
+
+class RegrasPrecoRepository(BaseRepository):
+    model = RegraPreco
+    nao_encontrado = "Regra de preço não encontrada"
+
+    FILTROS = {
+        "tipo": RegraPreco.tipo,
+        "categoria": RegraPreco.categoria,
+        "localizacaoId": RegraPreco.localizacaoId,
+        "ativa": RegraPreco.ativa,
+    }
+    ORDENACOES = {"id": RegraPreco.id, "criadoEm": RegraPreco.criadoEm}
+
+    @classmethod
+    def _invalidar_cache(cls) -> None:
+        '''Regras alteradas: o calendário de tarifas é recompilado na próxima cotação'''
+        motor_precos.invalidar()
+
+    @staticmethod
+    def validar(database: Session, request: RegraPrecoRequest) -> None:
+        '''Período coerente, diasMinimos nas regras de longa duração e localização existente'''
+        if request.inicio is not None and request.fim is not None and request.fim < request.inicio:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Data de fim deve ser igual ou posterior à data de início"
+            )
+        if request.tipo == TipoRegraPreco.LONGA_DURACAO and request.diasMinimos is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Regras de longa duração exigem diasMinimos"
+            )
+        if request.localizacaoId is not None and not RegrasPrecoRepository.exists(
+            database, Localizacao.id == request.localizacaoId
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Localização não encontrada"
+            )
+
+    @staticmethod
+    def find_all(database: Session, params: PageParams) -> Page:
+        '''Função para fazer uma query paginada por cursor de todas as regras de preço da DB'''
+        return paginate(
+            database,
+            select(RegraPreco),
+            params,
+            id_coluna=RegraPreco.id,
+            ordenacoes=RegrasPrecoRepository.ORDENACOES,
+            filtros=RegrasPrecoRepository.FILTROS,
+        )
+
+    @staticmethod
+    def save(database: Session, regra: RegraPreco) -> RegraPreco:
+        '''Função para salvar um objeto regra de preço na DB'''
+        if regra.id:
+            database.merge(regra)
+        else:
+            database.add(regra)
+        database.commit()
+        RegrasPrecoRepository._invalidar_cache()
+        database.refresh(regra)
+        return regra
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session
+
+from ..database import get_db as get_database
+from ..model.model import RegraPreco
+from ..pagination import PageParams, page_params
+from ..serializacao import resposta_lista
+from .repository import RegrasPrecoRepository
+from .schema import RegraPrecoRequest, RegraPrecoResponse
+
+router = APIRouter(
+    prefix='/precos',
+    tags=['precos'],
+    responses={404: {"description": "Not found"}},
+)
+
+# CREATE
+@router.post("/regras",
+    response_model=RegraPrecoResponse,
+    status_code=status.HTTP_201_CREATED
+)
+def create(request: RegraPrecoRequest, database: Session = Depends(get_database)):
+    '''Cria uma regra de preço; o calendário de tarifas é recompilado na próxima cotação'''
+    RegrasPrecoRepository.validar(database, request)
+    regra = RegrasPrecoRepository.save(database, RegraPreco(**request.dict()))
+    return regra
+
+# READ ALL
+@router.get("/regras", response_model=list[RegraPrecoResponse])
+def find_all(
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: Session = Depends(get_database),
+):
+    '''Lista paginada por cursor das regras de preço, ativas e inativas (próximo cursor em X-Next-Cursor)'''
+    pagina = RegrasPrecoRepository.find_all(database, params)
+    pagina.aplicar_headers(response)
+    return resposta_lista(RegraPrecoResponse, pagina.itens, response)
+
+# READ BY ID
+@router.get("/regras/{id}", response_model=RegraPrecoResponse)
+def find_by_id(id: int, database: Session = Depends(get_database)):
+    '''Dado o ID como parâmetro, encontra a regra de preço com esse ID'''
+    regra = RegrasPrecoRepository.get_or_404(database, id)
+    return RegraPrecoResponse.from_orm(regra)
+
+# UPDATE BY ID
+@router.put("/regras/{id}", response_model=RegraPrecoResponse)
+def update(id: int, request: RegraPrecoRequest, database: Session = Depends(get_database)):
+    '''Dado o ID da regra, atualiza os dados na DB por meio do método PUT'''
+    RegrasPrecoRepository.validar(database, request)
+    regra_atualizada = RegrasPrecoRepository.update_by_id(database, id, request.dict())
+    if regra_atualizada is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=RegrasPrecoRepository.nao_encontrado
+        )
+    return RegraPrecoResponse.from_orm(regra_atualizada)
+
+# DELETE BY ID
+@router.delete("/regras/{id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_by_id(id: int, database: Session = Depends(get_database)):
+    '''Dado o ID da regra, deleta o objeto da DB por meio do método DELETE'''
+    if not RegrasPrecoRepository.delete_by_id(database, id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=RegrasPrecoRepository.nao_encontrado
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
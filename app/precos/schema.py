@@ -0,0 +1,32 @@
+from datetime import date, datetime
+
+from pydantic import BaseModel, Field
+
+from ..model.model import TipoRegraPreco
+
+
+class RegraPrecoBase(BaseModel):
+    '''Classe para definir os modelos recebidos na API'''
+    nome: str
+    tipo: TipoRegraPreco
+    categoria: str | None = None
+    localizacaoId: int | None = None
+    inicio: date | None = None
+    fim: date | None = None
+    multiplicador: float = Field(1.0, gt=0)
+    valorFixo: float = Field(0.0, ge=0)
+    diasMinimos: int | None = Field(None, ge=1)
+    ativa: bool = True
+
+class RegraPrecoRequest(RegraPrecoBase):
+    '''Classe para requisições de criação e atualização de regras de preço'''
+    pass
+
+class RegraPrecoResponse(RegraPrecoBase):
+    '''Classe para respostas da API'''
+    id: int
+    criadoEm: datetime
+    atualizadoEm: datetime
+
+    class Config:
+        from_attributes = True
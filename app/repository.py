@@ -0,0 +1,186 @@
+'''Utilitários compartilhados pelos repositories'''
+
+import inspect
+from typing import Any
+
+from fastapi import HTTPException, status
+from sqlalchemy import Table, delete, exists, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from .cache_respostas import cache_respostas
+
+
+def upsert_incremental(
+    database: Session,
+    tabela: Table,
+    chaves: list[str],
+    linhas: list[dict],
+    substituir: tuple[str, ...] = (),
+    onde=None,
+) -> None:
+    '''INSERT ... ON CONFLICT DO UPDATE que soma as colunas não-chave ao valor existente
+
+    Usado pelas tabelas de agregados mantidas incrementalmente. Colunas em substituir
+    recebem o novo valor em vez da soma. onde é o predicado quando as chaves são de um
+    índice único parcial. Todas as linhas vão em um único executemany.
+    '''
+    if not linhas:
+        return
+    dialeto = postgresql if database.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialeto.insert(tabela)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=chaves,
+        index_where=onde,
+        set_={
+            coluna: stmt.excluded[coluna] if coluna in substituir else tabela.c[coluna] + stmt.excluded[coluna]
+            for coluna in linhas[0]
+            if coluna not in chaves
+        },
+    )
+    database.execute(stmt, linhas)
+
+
+def inserir_varios(database: Session, tabela: Table, linhas: list[dict]) -> list[int]:
+    '''INSERT de várias linhas com RETURNING id, na ordem das linhas (sem commit)
+
+    O SQLAlchemy agrupa as linhas em poucos INSERT ... VALUES (...), (...) (insertmanyvalues).
+    '''
+    if not linhas:
+        return []
+    return list(database.scalars(
+        insert(tabela).returning(tabela.c.id, sort_by_parameter_order=True), linhas
+    ))
+
+
+class BaseRepository:
+    '''Operações por ID comuns a todos os repositories
+
+    exists_by_id é um SELECT EXISTS, get_or_404 busca uma única vez e update/delete
+    são um único UPDATE/DELETE ... RETURNING. Subclasses definem model e a mensagem
+    de nao_encontrado e, se as listagens do model são cacheadas, os cache_namespaces
+    invalidados após cada escrita.
+    '''
+    model: Any = None
+    nao_encontrado = "Registro não encontrado"
+    cache_namespaces: tuple[str, ...] = ()
+    # Colunas devolvidas pelas listagens (as do schema de resposta)
+    COLUNAS_LISTAGEM: tuple = ()
+
+    @classmethod
+    def projecao(cls) -> Select:
+        '''SELECT só das COLUNAS_LISTAGEM: linhas leves (Row), sem identity map nem colunas sensíveis
+
+        select_from(model) mantém o JOIN da herança (usuarios + clientes/admins).
+        '''
+        return select(*cls.COLUNAS_LISTAGEM).select_from(cls.model)
+
+    @classmethod
+    def _invalidar_cache(cls) -> None:
+        '''Invalida as respostas cacheadas que dependem do model (chamar após o commit)'''
+        if cls.cache_namespaces:
+            cache_respostas.invalidar(*cls.cache_namespaces)
+
+    @classmethod
+    def _heranca_joined(cls) -> bool:
+        # Cliente/Admin: colunas divididas entre usuarios e a tabela filha
+        return cls.model.__mapper__.inherits is not None
+
+    @classmethod
+    def find_by_id(cls, database: Session, id: int):
+        '''Função para fazer uma query por ID na DB'''
+        return database.get(cls.model, id)
+
+    @classmethod
+    def exists(cls, database: Session, *criterios) -> bool:
+        '''Função que executa SELECT EXISTS(...) com os critérios dados'''
+        return database.scalar(select(exists().where(*criterios)))
+
+    @classmethod
+    def exists_by_id(cls, database: Session, id: int) -> bool:
+        '''Função que verifica se o ID dado existe na DB'''
+        return cls.exists(database, cls.model.id == id)
+
+    @classmethod
+    def get_or_404(cls, database: Session, id: int):
+        '''Função que busca por ID ou responde 404'''
+        objeto = cls.find_by_id(database, id)
+        if objeto is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=cls.nao_encontrado)
+        return objeto
+
+    @classmethod
+    def update_by_id(cls, database: Session, id: int, valores: dict):
+        '''Função que atualiza por ID com UPDATE ... RETURNING; retorna None se o ID não existe'''
+        if cls._heranca_joined() or not valores:
+            objeto = cls.find_by_id(database, id)
+            if objeto is None:
+                return None
+            for campo, valor in valores.items():
+                setattr(objeto, campo, valor)
+            database.commit()
+            cls._invalidar_cache()
+            return objeto
+
+        tabela = cls.model.__table__
+        linha = database.execute(
+            update(tabela).where(tabela.c.id == id).values(**valores).returning(*tabela.c)
+        ).first()
+        database.commit()
+        if linha is not None:
+            cls._invalidar_cache()
+        return linha
+
+    @classmethod
+    def _delete_dependentes(cls, database: Session, id: int) -> None:
+        '''Remove/desvincula as linhas que o ORM trataria por cascade antes do DELETE'''
+
+    @classmethod
+    def delete_by_id(cls, database: Session, id: int) -> bool:
+        '''Função que exclui por ID com DELETE ... RETURNING; retorna False se o ID não existe'''
+        if cls._heranca_joined():
+            objeto = cls.find_by_id(database, id)
+            if objeto is None:
+                return False
+            cls._delete_dependentes(database, id)
+            database.delete(objeto)
+            database.commit()
+            cls._invalidar_cache()
+            return True
+
+        cls._delete_dependentes(database, id)
+        tabela = cls.model.__table__
+        removido = database.execute(
+            delete(tabela).where(tabela.c.id == id).returning(tabela.c.id)
+        ).first()
+        database.commit()
+        if removido is not None:
+            cls._invalidar_cache()
+        return removido is not None
+
+
+class AsyncRepository:
+    '''Versão assíncrona de um repository síncrono
+
+    Cada método é executado com AsyncSession.run_sync: a mesma query do repository
+    original roda sobre o driver assíncrono, sem ocupar o threadpool do Starlette.
+    Uso: ``await AsyncCarrosRepository.find_by_id(async_session, id)``.
+    '''
+
+    def __init__(self, repository: type):
+        self._repository = repository
+
+    def __getattr__(self, nome: str):
+        metodo = getattr(self._repository, nome)
+        # Atributos e métodos que já são async (recebem AsyncSession) passam direto
+        if not callable(metodo) or inspect.iscoroutinefunction(metodo):
+            return metodo
+
+        async def executar(database: AsyncSession, *args, **kwargs):
+            return await database.run_sync(metodo, *args, **kwargs)
+
+        executar.__name__ = nome
+        executar.__doc__ = metodo.__doc__
+        return executar
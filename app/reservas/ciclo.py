@@ -0,0 +1,163 @@
+'''Ciclo de vida automático das reservas
+
+Varreduras periódicas, em lotes, que:
+- cancelam reservas pendentes criadas há mais de reserva_pendente_ttl segundos;
+- concluem reservas confirmadas cuja dataDevolucao já passou;
+- sincronizam Carros.status/disponivel com as locações em andamento.
+
+As transições usam ReservasService.transicionar_em_lote (mesma máquina de estados e
+mesmos agregados dos PATCH). As buscas percorrem os índices (status, criadoEm) e
+(status, dataDevolucao) e cada lote é uma transação curta.
+
+Roda dentro da API (tarefa_ciclo, iniciada no startup) ou como worker separado:
+    python -m app.reservas.ciclo
+'''
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.orm import Session
+
+from ..carros.repository import CarrosRepository
+from ..config import settings
+from ..database import SessionLocal
+from ..model.model import Carros, Reserva, StatusCarro, StatusReserva
+from ..tarefas import TarefaPeriodica
+from .service import ReservasService
+
+logger = logging.getLogger(__name__)
+
+
+def _locacao_em_andamento(agora: datetime):
+    '''Reservas confirmadas cujo período contém agora (carro fora do pátio)'''
+    return and_(
+        Reserva.status == StatusReserva.CONFIRMADA,
+        Reserva.dataRetirada <= agora,
+        Reserva.dataDevolucao > agora,
+    )
+
+
+class CicloReservasService:
+    @staticmethod
+    def _varrer(database: Session, acao: str, origem: StatusReserva, coluna, limite: datetime, lote: int) -> int:
+        '''Aplica a ação às reservas em origem com coluna < limite, lote a lote pela ordem do índice'''
+        total = 0
+        while True:
+            ids = list(database.scalars(
+                select(Reserva.id)
+                .where(Reserva.status == origem, coluna < limite)
+                .order_by(coluna, Reserva.id)
+                .limit(lote)
+            ))
+            if not ids:
+                return total
+            atualizadas, _ = ReservasService.transicionar_em_lote(database, acao, ids, origens=(origem,))
+            total += len(atualizadas)
+            # Tudo recusado: outra instância mudou as linhas entre o SELECT e o UPDATE;
+            # a próxima execução retoma
+            if not atualizadas or len(ids) < lote:
+                return total
+
+    @staticmethod
+    def expirar_pendentes(database: Session, agora: datetime, ttl: int, lote: int) -> int:
+        '''Cancela as pendentes criadas antes de agora - ttl'''
+        return CicloReservasService._varrer(
+            database, "cancelar", StatusReserva.PENDENTE, Reserva.criadoEm, agora - timedelta(seconds=ttl), lote
+        )
+
+    @staticmethod
+    def concluir_vencidas(database: Session, agora: datetime, lote: int) -> int:
+        '''Conclui as confirmadas com dataDevolucao anterior a agora'''
+        return CicloReservasService._varrer(
+            database, "concluir", StatusReserva.CONFIRMADA, Reserva.dataDevolucao, agora, lote
+        )
+
+    @staticmethod
+    def sincronizar_carros(database: Session, agora: datetime) -> dict:
+        '''Marca como alugados os carros com locação em andamento e libera os demais
+
+        Dois UPDATEs em conjunto. Carros em manutenção não são alterados. Retorna
+        quantos carros foram alugados e liberados.
+        '''
+        em_andamento = select(Reserva.carroId).where(_locacao_em_andamento(agora))
+        alugados = database.execute(
+            update(Carros)
+            .where(Carros.status == StatusCarro.DISPONIVEL, Carros.id.in_(em_andamento))
+            .values(status=StatusCarro.ALUGADO, disponivel=False)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        liberados = database.execute(
+            update(Carros)
+            .where(Carros.status == StatusCarro.ALUGADO, Carros.id.not_in(em_andamento))
+            .values(status=StatusCarro.DISPONIVEL, disponivel=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        database.commit()
+        if alugados or liberados:
+            CarrosRepository._invalidar_cache()
+        return {"alugados": alugados, "liberados": liberados}
+
+    @staticmethod
+    def atrasos(database: Session, agora: datetime, ttl: int) -> dict:
+        '''Segundos desde o vencimento do item mais antigo ainda não processado (0 se nenhum)'''
+        pendente = database.scalar(
+            select(func.min(Reserva.criadoEm)).where(Reserva.status == StatusReserva.PENDENTE)
+        )
+        devolucao = database.scalar(
+            select(func.min(Reserva.dataDevolucao)).where(Reserva.status == StatusReserva.CONFIRMADA)
+        )
+        vencimentos = {
+            "pendentes": pendente + timedelta(seconds=ttl) if pendente is not None else None,
+            "devolucoes": devolucao,
+        }
+        return {
+            nome: round(max((agora - vencimento).total_seconds(), 0.0), 3) if vencimento is not None else 0.0
+            for nome, vencimento in vencimentos.items()
+        }
+
+    @staticmethod
+    def executar(
+        database: Session,
+        agora: datetime | None = None,
+        ttl: int | None = None,
+        lote: int | None = None,
+    ) -> dict:
+        '''Uma passada completa do ciclo; retorna contagens, atrasos e a duração'''
+        inicio = time.perf_counter()
+        agora = agora or datetime.now()
+        ttl = settings.reserva_pendente_ttl if ttl is None else ttl
+        lote = lote or settings.reserva_ciclo_lote
+        atrasos = CicloReservasService.atrasos(database, agora, ttl)
+        resultado = {
+            "expiradas": CicloReservasService.expirar_pendentes(database, agora, ttl, lote),
+            "concluidas": CicloReservasService.concluir_vencidas(database, agora, lote),
+            **CicloReservasService.sincronizar_carros(database, agora),
+            "atrasoSeg": atrasos,
+            "duracaoMs": round((time.perf_counter() - inicio) * 1000, 3),
+        }
+        logger.info("Ciclo de reservas: %s", resultado)
+        return resultado
+
+
+def executar_ciclo() -> dict:
+    '''Ponto de entrada da tarefa agendada: abre a própria sessão'''
+    with SessionLocal() as database:
+        return CicloReservasService.executar(database)
+
+
+tarefa_ciclo = TarefaPeriodica("ciclo_reservas", settings.reserva_ciclo_interval, executar_ciclo)
+
+
+if __name__ == "__main__":
+    # Worker separado (ex.: um único processo para várias réplicas da API com
+    # RESERVA_CICLO_INTERVAL=0)
+    logging.basicConfig(level=logging.INFO)
+    intervalo = settings.reserva_ciclo_interval or 60
+    while True:
+        try:
+            executar_ciclo()
+        except Exception:
+            logger.exception("Falha no ciclo de reservas")
+        time.sleep(intervalo)
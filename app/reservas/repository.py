@@ -1,15 +1,45 @@
 from datetime import datetime
 
+from sqlalchemy import Row, delete, exists, select
 from sqlalchemy.orm import Session
 
-from ..model.model import Carros, Reserva
+from ..model.model import Reserva, StatusReserva
+from ..pagination import Page, PageParams, paginate
+from ..repository import AsyncRepository, BaseRepository
+from .rollups import EstadoReserva, RollupsService
 
+# Reservas que bloqueiam o carro no período
+STATUS_ATIVOS = (StatusReserva.PENDENTE, StatusReserva.CONFIRMADA)
+
+class ReservasRepository(BaseRepository):
+    model = Reserva
+    nao_encontrado = "Reserva não encontrada"
+
+    FILTROS = {
+        "clienteId": Reserva.clienteId,
+        "carroId": Reserva.carroId,
+        "status": Reserva.status,
+        "localizacaoRetiradaId": Reserva.localizacaoRetiradaId,
+        "localizacaoDevolucaoId": Reserva.localizacaoDevolucaoId,
+    }
+    ORDENACOES = {"id": Reserva.id, "criadoEm": Reserva.criadoEm, "dataRetirada": Reserva.dataRetirada}
+    COLUNAS_LISTAGEM = (
+        Reserva.id, Reserva.dataRetirada, Reserva.dataDevolucao, Reserva.valorTotal, Reserva.status,
+        Reserva.clienteId, Reserva.carroId, Reserva.localizacaoRetiradaId, Reserva.localizacaoDevolucaoId,
+        Reserva.criadoEm, Reserva.atualizadoEm,
+    )
 
-class ReservasRepository:
     @staticmethod
-    def find_all(database: Session) -> list[Reserva]:
-        '''Função para fazer uma query de todas as reservas da DB'''
-        return database.query(Reserva).all()
+    def find_all(database: Session, params: PageParams) -> Page:
+        '''Função para fazer uma query paginada por cursor de todas as reservas da DB'''
+        return paginate(
+            database,
+            ReservasRepository.projecao(),
+            params,
+            id_coluna=Reserva.id,
+            ordenacoes=ReservasRepository.ORDENACOES,
+            filtros=ReservasRepository.FILTROS,
+        )
 
     @staticmethod
     def save(database: Session, reserva: Reserva) -> Reserva:
@@ -22,23 +52,17 @@ class ReservasRepository:
         database.refresh(reserva)
         return reserva
 
-    @staticmethod
-    def find_by_id(database: Session, id: int) -> Reserva:
-        '''Função para fazer uma query por ID de um objeto reserva na DB'''
-        return database.query(Reserva).filter(Reserva.id == id).first()
-
-    @staticmethod
-    def exists_by_id(database: Session, id: int) -> bool:
-        '''Função que verifica se o ID dado existe na DB'''
-        return database.query(Reserva).filter(Reserva.id == id).first() is not None
-
-    @staticmethod
-    def delete_by_id(database: Session, id: int) -> None:
-        '''Função para excluir um objeto reserva da DB dado o ID'''
-        reserva = database.query(Reserva).filter(Reserva.id == id).first()
-        if reserva is not None:
-            database.delete(reserva)
-            database.commit()
+    @classmethod
+    def delete_by_id(cls, database: Session, id: int) -> bool:
+        '''Função que exclui por ID com DELETE ... RETURNING e desconta a reserva dos agregados'''
+        tabela = Reserva.__table__
+        removida = database.execute(
+            delete(tabela).where(tabela.c.id == id).returning(*tabela.c)
+        ).first()
+        if removida is not None:
+            RollupsService.aplicar(database, EstadoReserva.de(removida), None)
+        database.commit()
+        return removida is not None
 
     @staticmethod
     def count_all(database: Session) -> int:
@@ -46,19 +70,19 @@ class ReservasRepository:
         return database.query(Reserva).count()
 
     @staticmethod
-    def find_by_cliente(database: Session, cliente_id: int) -> list[Reserva]:
-        '''Função para fazer uma query por cliente de reservas na DB'''
-        return database.query(Reserva).filter(Reserva.clienteId == cliente_id).all()
+    def find_by_cliente(database: Session, cliente_id: int) -> list[Row]:
+        '''Função para fazer uma query por cliente de reservas na DB (só as colunas de resposta)'''
+        return list(database.execute(ReservasRepository.projecao().where(Reserva.clienteId == cliente_id)))
 
     @staticmethod
-    def find_by_carro(database: Session, carro_id: int) -> list[Reserva]:
-        '''Função para fazer uma query por carro de reservas na DB'''
-        return database.query(Reserva).filter(Reserva.carroId == carro_id).all()
+    def find_by_carro(database: Session, carro_id: int) -> list[Row]:
+        '''Função para fazer uma query por carro de reservas na DB (só as colunas de resposta)'''
+        return list(database.execute(ReservasRepository.projecao().where(Reserva.carroId == carro_id)))
 
     @staticmethod
-    def find_by_status(database: Session, status: str) -> list[Reserva]:
-        '''Função para fazer uma query por status de reservas na DB'''
-        return database.query(Reserva).filter(Reserva.status == status).all()
+    def find_by_status(database: Session, status: str) -> list[Row]:
+        '''Função para fazer uma query por status de reservas na DB (só as colunas de resposta)'''
+        return list(database.execute(ReservasRepository.projecao().where(Reserva.status == status)))
 
     @staticmethod
     def count_by_status(database: Session, status: str) -> int:
@@ -66,14 +90,25 @@ class ReservasRepository:
         return database.query(Reserva).filter(Reserva.status == status).count()
 
     @staticmethod
-    def calcular_valor_total(database: Session, carro_id: int, data_retirada: datetime, data_devolucao: datetime) -> float:
-        '''Função para calcular o valor total de uma reserva'''
-        carro = database.query(Carros).filter(Carros.id == carro_id).first()
-        if not carro:
-            return 0.0
-        
-        dias = (data_devolucao - data_retirada).days
-        if dias <= 0:
-            dias = 1
-        
-        return carro.precoDia * dias
+    def ocupacao(carro_id, inicio: datetime, fim: datetime, ignorar_id: int | None = None):
+        '''Cláusula EXISTS de reservas ativas do carro que se sobrepõem ao período [inicio, fim)
+
+        carro_id pode ser um valor ou uma coluna (ex.: Carros.id, para um anti-join correlacionado).
+        '''
+        clausula = exists().where(
+            Reserva.carroId == carro_id,
+            Reserva.status.in_(STATUS_ATIVOS),
+            Reserva.dataRetirada < fim,
+            Reserva.dataDevolucao > inicio,
+        )
+        if ignorar_id is not None:
+            clausula = clausula.where(Reserva.id != ignorar_id)
+        return clausula
+
+    @staticmethod
+    def existe_conflito(database: Session, carro_id: int, inicio: datetime, fim: datetime, ignorar_id: int | None = None) -> bool:
+        '''Função que verifica se o carro já possui reserva ativa no período'''
+        return database.scalar(select(ReservasRepository.ocupacao(carro_id, inicio, fim, ignorar_id)))
+
+
+AsyncReservasRepository = AsyncRepository(ReservasRepository)
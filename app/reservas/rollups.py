@@ -0,0 +1,238 @@
+'''Agregados diários de receita e ocupação mantidos a partir das mudanças de status das reservas'''
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..model.model import Carros, Reserva, RollupReservaDiaria, StatusReserva
+from ..repository import upsert_incremental
+
+# Reservas que geram receita e ocupam o carro
+STATUS_FATURADOS = (StatusReserva.CONFIRMADA, StatusReserva.CONCLUIDA)
+GRANULARIDADES = ("dia", "semana", "mes")
+
+
+@dataclass(frozen=True)
+class EstadoReserva:
+    '''Campos de uma reserva que determinam sua contribuição nos agregados'''
+    status: StatusReserva
+    dataRetirada: datetime
+    dataDevolucao: datetime
+    valorTotal: float
+    localizacaoRetiradaId: int
+    carroId: int
+
+    @classmethod
+    def de(cls, reserva) -> "EstadoReserva":
+        '''Aceita um objeto Reserva ou uma Row com as mesmas colunas'''
+        return cls(
+            status=StatusReserva(reserva.status),
+            dataRetirada=reserva.dataRetirada,
+            dataDevolucao=reserva.dataDevolucao,
+            valorTotal=reserva.valorTotal,
+            localizacaoRetiradaId=reserva.localizacaoRetiradaId,
+            carroId=reserva.carroId,
+        )
+
+
+def _inicio_do_balde(dia: date, granularidade: str) -> date:
+    if granularidade == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == "mes":
+        return dia.replace(day=1)
+    return dia
+
+
+class RollupsService:
+    @staticmethod
+    def contribuicao(estado: EstadoReserva, categoria: str, sinal: int = 1) -> dict[tuple, dict]:
+        '''Linhas (dia, localização, categoria) que a reserva soma aos agregados
+
+        A receita entra no dia da retirada; a ocupação é distribuída pela fração de
+        cada dia entre retirada e devolução.
+        '''
+        linhas: dict[tuple, dict] = defaultdict(lambda: {"receita": 0.0, "reservas": 0, "carroDias": 0.0})
+        if estado.status not in STATUS_FATURADOS:
+            return linhas
+        chave = (estado.localizacaoRetiradaId, categoria)
+        retirada = linhas[(estado.dataRetirada.date(), *chave)]
+        retirada["receita"] += sinal * estado.valorTotal
+        retirada["reservas"] += sinal
+
+        cursor = estado.dataRetirada
+        while cursor < estado.dataDevolucao:
+            proxima_meia_noite = datetime.combine(cursor.date() + timedelta(days=1), datetime.min.time())
+            fim = min(proxima_meia_noite, estado.dataDevolucao)
+            linhas[(cursor.date(), *chave)]["carroDias"] += sinal * (fim - cursor).total_seconds() / 86400
+            cursor = fim
+        return linhas
+
+    @staticmethod
+    def aplicar(database: Session, antes: EstadoReserva | None, depois: EstadoReserva | None) -> None:
+        '''Aplica nos agregados a diferença entre dois estados da reserva (sem commit)
+
+        Deve ser chamada na mesma transação que grava a reserva. antes=None para
+        reservas novas e depois=None para exclusões.
+        '''
+        RollupsService.aplicar_varios(database, [(antes, depois)])
+
+    @staticmethod
+    def aplicar_varios(
+        database: Session, transicoes: list[tuple[EstadoReserva | None, EstadoReserva | None]]
+    ) -> None:
+        '''Como aplicar, para várias reservas: uma query de categorias e um único upsert'''
+        transicoes = [
+            (antes, depois) for antes, depois in transicoes
+            if any(estado is not None and estado.status in STATUS_FATURADOS for estado in (antes, depois))
+        ]
+        if not transicoes:
+            return
+        carro_ids = {estado.carroId for par in transicoes for estado in par if estado is not None}
+        categorias = dict(database.execute(
+            select(Carros.id, Carros.categoria).where(Carros.id.in_(carro_ids))
+        ).all())
+
+        deltas: dict[tuple, dict] = defaultdict(lambda: {"receita": 0.0, "reservas": 0, "carroDias": 0.0})
+        for antes, depois in transicoes:
+            for estado, sinal in ((antes, -1), (depois, 1)):
+                if estado is None:
+                    continue
+                for chave, valores in RollupsService.contribuicao(estado, categorias.get(estado.carroId, ""), sinal).items():
+                    for coluna, valor in valores.items():
+                        deltas[chave][coluna] += valor
+
+        RollupsService._gravar(database, deltas)
+
+    @staticmethod
+    def _gravar(database: Session, deltas: dict[tuple, dict]) -> None:
+        linhas = [
+            {"dia": dia, "localizacaoId": localizacao_id, "categoria": categoria, **valores}
+            for (dia, localizacao_id, categoria), valores in deltas.items()
+            if any(abs(valor) > 1e-9 for valor in valores.values())
+        ]
+        upsert_incremental(
+            database, RollupReservaDiaria.__table__, ["dia", "localizacaoId", "categoria"], linhas
+        )
+
+    @staticmethod
+    def descontar_cliente(database: Session, cliente_id: int) -> None:
+        '''Remove dos agregados as reservas de um cliente que será excluído'''
+        reservas = database.execute(
+            select(Reserva).where(Reserva.clienteId == cliente_id, Reserva.status.in_(STATUS_FATURADOS))
+        ).scalars()
+        RollupsService.aplicar_varios(database, [(EstadoReserva.de(reserva), None) for reserva in reservas])
+
+    @staticmethod
+    def recategorizar(database: Session, carro_id: int, antiga: str, nova: str) -> None:
+        '''Move as reservas faturadas do carro da categoria antiga para a nova (sem commit)
+
+        Deve ser chamada na transação que troca Carros.categoria: os agregados seguem a
+        categoria atual do carro, como em reconstruir.
+        '''
+        reservas = database.execute(
+            select(
+                Reserva.status, Reserva.dataRetirada, Reserva.dataDevolucao, Reserva.valorTotal,
+                Reserva.localizacaoRetiradaId, Reserva.carroId,
+            )
+            .where(Reserva.carroId == carro_id, Reserva.status.in_(STATUS_FATURADOS))
+        )
+        deltas: dict[tuple, dict] = defaultdict(lambda: {"receita": 0.0, "reservas": 0, "carroDias": 0.0})
+        for linha in reservas:
+            estado = EstadoReserva.de(linha)
+            for categoria, sinal in ((antiga, -1), (nova, 1)):
+                for chave, valores in RollupsService.contribuicao(estado, categoria, sinal).items():
+                    for coluna, valor in valores.items():
+                        deltas[chave][coluna] += valor
+        RollupsService._gravar(database, deltas)
+
+    @staticmethod
+    def reconstruir(database: Session, lote: int = 1000) -> int:
+        '''Recalcula todos os agregados a partir do histórico de reservas; retorna quantas foram lidas'''
+        database.execute(delete(RollupReservaDiaria))
+        totais: dict[tuple, dict] = defaultdict(lambda: {"receita": 0.0, "reservas": 0, "carroDias": 0.0})
+        resultado = database.execute(
+            select(
+                Reserva.status, Reserva.dataRetirada, Reserva.dataDevolucao, Reserva.valorTotal,
+                Reserva.localizacaoRetiradaId, Reserva.carroId, Carros.categoria,
+            )
+            .join(Carros, Carros.id == Reserva.carroId)
+            .where(Reserva.status.in_(STATUS_FATURADOS))
+            .execution_options(yield_per=lote)
+        )
+        lidas = 0
+        for linha in resultado:
+            lidas += 1
+            for chave, valores in RollupsService.contribuicao(EstadoReserva.de(linha), linha.categoria).items():
+                for coluna, valor in valores.items():
+                    totais[chave][coluna] += valor
+
+        linhas = [
+            {"dia": dia, "localizacaoId": localizacao_id, "categoria": categoria, **valores}
+            for (dia, localizacao_id, categoria), valores in totais.items()
+        ]
+        for inicio in range(0, len(linhas), lote):
+            database.execute(insert(RollupReservaDiaria), linhas[inicio:inicio + lote])
+        database.commit()
+        return lidas
+
+    @staticmethod
+    def serie(
+        database: Session,
+        granularidade: str,
+        inicio: date,
+        fim: date,
+        localizacao_id: int | None = None,
+        categoria: str | None = None,
+    ) -> list[dict]:
+        '''Receita, reservas e ocupação por dia/semana/mês lidas apenas dos agregados
+
+        fim é inclusivo. A utilização usa a frota atual do filtro como capacidade.
+        '''
+        filtros = [RollupReservaDiaria.dia >= inicio, RollupReservaDiaria.dia <= fim]
+        filtros_frota = []
+        if localizacao_id is not None:
+            filtros.append(RollupReservaDiaria.localizacaoId == localizacao_id)
+            filtros_frota.append(Carros.localizacaoId == localizacao_id)
+        if categoria is not None:
+            filtros.append(RollupReservaDiaria.categoria == categoria)
+            filtros_frota.append(Carros.categoria == categoria)
+
+        diarias = database.execute(
+            select(
+                RollupReservaDiaria.dia,
+                func.sum(RollupReservaDiaria.receita),
+                func.sum(RollupReservaDiaria.reservas),
+                func.sum(RollupReservaDiaria.carroDias),
+            )
+            .where(*filtros)
+            .group_by(RollupReservaDiaria.dia)
+        ).all()
+        frota = database.scalar(select(func.count(Carros.id)).where(*filtros_frota))
+
+        baldes: dict[date, dict] = {}
+        dia = _inicio_do_balde(inicio, granularidade)
+        while dia <= fim:
+            if granularidade == "dia":
+                proximo = dia + timedelta(days=1)
+            elif granularidade == "semana":
+                proximo = dia + timedelta(days=7)
+            else:
+                proximo = (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+            dias = (min(proximo - timedelta(days=1), fim) - max(dia, inicio)).days + 1
+            baldes[dia] = {"periodo": dia, "receita": 0.0, "reservas": 0, "carroDias": 0.0, "capacidade": frota * dias}
+            dia = proximo
+
+        for dia, receita, reservas, carro_dias in diarias:
+            balde = baldes[_inicio_do_balde(dia, granularidade)]
+            balde["receita"] += receita or 0.0
+            balde["reservas"] += reservas or 0
+            balde["carroDias"] += carro_dias or 0.0
+
+        for balde in baldes.values():
+            balde["receita"] = round(balde["receita"], 2)
+            balde["carroDias"] = round(balde["carroDias"], 3)
+            balde["utilizacao"] = round(balde["carroDias"] / balde["capacidade"], 4) if balde["capacidade"] else 0.0
+        return list(baldes.values())
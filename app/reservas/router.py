@@ -1,13 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..carros.repository import CarrosRepository
-from ..clientes.repository import ClientesRepository
+from ..condicional import condicional_item, condicional_lista
+from ..database import get_async_db as get_async_database
 from ..database import get_db as get_database
-from ..localizacoes.repository import LocalizacoesRepository
 from ..model.model import Reserva, StatusReserva
-from .repository import ReservasRepository
-from .schema import ReservaRequest, ReservaResponse, ReservaUpdateRequest
+from ..pagination import PageParams, page_params
+from ..serializacao import resposta_lista
+from .repository import STATUS_ATIVOS, AsyncReservasRepository, ReservasRepository
+from .rollups import EstadoReserva, RollupsService
+from .schema import (
+    CotacaoRequest,
+    CotacaoResponse,
+    CotacoesRequest,
+    CotacoesResponse,
+    ReservaRecusadaResponse,
+    ReservaRequest,
+    ReservaResponse,
+    ReservaUpdateRequest,
+    TransicaoLoteRequest,
+    TransicaoLoteResponse,
+)
+from .service import CONFLITO, EXCLUSAO_VIOLADA, TRANSICOES, ReservasService
 
 router = APIRouter(
     prefix='/reservas',
@@ -22,85 +38,57 @@ router = APIRouter(
 )
 def create(request: ReservaRequest, database: Session = Depends(get_database)):
     '''Cria e salva um objeto reserva por meio do método POST'''
-    # Validar se cliente existe
-    if not ClientesRepository.exists_by_id(database, request.clienteId):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Cliente não encontrado"
-        )
-    
-    # Validar se carro existe
-    if not CarrosRepository.exists_by_id(database, request.carroId):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Carro não encontrado"
-        )
-    
-    # Validar se localizações existem
-    if not LocalizacoesRepository.exists_by_id(database, request.localizacaoRetiradaId):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Localização de retirada não encontrada"
-        )
-    
-    if not LocalizacoesRepository.exists_by_id(database, request.localizacaoDevolucaoId):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Localização de devolução não encontrada"
-        )
-    
-    # Validar datas
-    if request.dataDevolucao <= request.dataRetirada:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Data de devolução deve ser posterior à data de retirada"
-        )
-    
-    # Calcular valor total
-    valor_total = ReservasRepository.calcular_valor_total(
-        database,
-        request.carroId,
-        request.dataRetirada,
-        request.dataDevolucao
-    )
-    
-    # Criar reserva
-    reserva_data = request.dict()
-    reserva_data['valorTotal'] = valor_total
-    reserva_data['status'] = StatusReserva.PENDENTE
-    
-    reserva = ReservasRepository.save(database, Reserva(**reserva_data))
-    return reserva
+    # Validação de cliente, carro, localizações e período em uma query, INSERT ... RETURNING na outra
+    return ReservasService.criar(database, request)
+
+# COTAÇÃO DE VÁRIOS CARROS
+@router.post("/cotacao", response_model=CotacaoResponse)
+def cotacao(request: CotacaoRequest, database: Session = Depends(get_database)):
+    '''Cota até 500 carros no mesmo período com as regras de preço (resultados de busca)'''
+    return ReservasService.cotar(database, request)
+
+# TOTAIS DA PÁGINA DE BUSCA
+@router.post("/cotacoes", response_model=CotacoesResponse)
+def cotacoes(
+    request: CotacoesRequest,
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: Session = Depends(get_database),
+):
+    '''Totais de vários carros (carroIds e/ou localizacaoId/categoria) em uma requisição e um SELECT
+
+    Por filtro, o resultado é paginado por cursor (limit/cursor, próximo cursor em X-Next-Cursor).
+    '''
+    corpo, pagina = ReservasService.cotar_totais(database, request, params)
+    pagina.aplicar_headers(response)
+    return corpo
 
 # READ ALL
-@router.get("/", response_model=list[ReservaResponse])
-def find_all(database: Session = Depends(get_database)):
-    '''Faz uma query de todos os objetos reserva na DB (sem paginação)'''
-    reservas = ReservasRepository.find_all(database)
-    return [ReservaResponse.from_orm(reserva) for reserva in reservas]
+@router.get("/", response_model=list[ReservaResponse], dependencies=[condicional_lista(Reserva, assincrona=True)])
+async def find_all(
+    response: Response,
+    params: PageParams = Depends(page_params),
+    database: AsyncSession = Depends(get_async_database),
+):
+    '''Faz uma query paginada por cursor dos objetos reserva na DB (próximo cursor em X-Next-Cursor)'''
+    pagina = await AsyncReservasRepository.find_all(database, params)
+    pagina.aplicar_headers(response)
+    return resposta_lista(ReservaResponse, pagina.itens, response)
 
 # READ BY ID
-@router.get("/{id}", response_model=ReservaResponse)
-def find_by_id(id: int, database: Session = Depends(get_database)):
+@router.get("/{id}", response_model=ReservaResponse, dependencies=[condicional_item(Reserva, assincrona=True)])
+async def find_by_id(id: int, database: AsyncSession = Depends(get_async_database)):
     '''Dado o ID como parâmetro, encontra a reserva com esse ID'''
-    reserva = ReservasRepository.find_by_id(database, id)
-    if not reserva:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Reserva não encontrada"
-        )
+    reserva = await AsyncReservasRepository.get_or_404(database, id)
     return ReservaResponse.from_orm(reserva)
 
 # UPDATE BY ID
 @router.put("/{id}", response_model=ReservaResponse)
 def update(id: int, request: ReservaUpdateRequest, database: Session = Depends(get_database)):
     '''Dado o ID da reserva, atualiza os dados na DB por meio do método PUT'''
-    if not ReservasRepository.exists_by_id(database, id):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Reserva não encontrada"
-        )
-    
-    # Buscar a reserva existente
-    reserva_existente = ReservasRepository.find_by_id(database, id)
+    # Uma única busca: 404 se não existir
+    reserva_existente = ReservasRepository.get_or_404(database, id)
+    antes = EstadoReserva.de(reserva_existente)
     
     # Atualizar os campos fornecidos
     update_data = request.dict(exclude_unset=True)
@@ -108,112 +96,123 @@ def update(id: int, request: ReservaUpdateRequest, database: Session = Depends(g
     for field, value in update_data.items():
         setattr(reserva_existente, field, value)
     
-    # Salvar as alterações
-    reserva_atualizada = ReservasRepository.save(database, reserva_existente)
+    # Revalidar o período quando as datas mudam
+    if 'dataRetirada' in update_data or 'dataDevolucao' in update_data:
+        if reserva_existente.dataDevolucao <= reserva_existente.dataRetirada:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Data de devolução deve ser posterior à data de retirada"
+            )
+    # Sobreposição quando as datas ou o status mudam (ex.: Cancelada de volta a Pendente)
+    if (
+        update_data.keys() & {'dataRetirada', 'dataDevolucao', 'status'}
+        and StatusReserva(reserva_existente.status) in STATUS_ATIVOS
+        and ReservasRepository.existe_conflito(
+            database,
+            reserva_existente.carroId,
+            reserva_existente.dataRetirada,
+            reserva_existente.dataDevolucao,
+            ignorar_id=id,
+        )
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=CONFLITO
+        )
+    
+    # Salvar as alterações (agregados de receita/ocupação no mesmo commit)
+    try:
+        RollupsService.aplicar(database, antes, EstadoReserva.de(reserva_existente))
+        reserva_atualizada = ReservasRepository.save(database, reserva_existente)
+    except IntegrityError as erro:
+        # Constraint de exclusão do Postgres: outra reserva gravou o período entre a checagem e o commit
+        database.rollback()
+        if getattr(erro.orig, "pgcode", None) != EXCLUSAO_VIOLADA:
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=CONFLITO
+        ) from None
     return ReservaResponse.from_orm(reserva_atualizada)
 
 # DELETE BY ID
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_by_id(id: int, database: Session = Depends(get_database)):
     '''Dado o ID da reserva, deleta o objeto da DB por meio do método DELETE'''
-    if not ReservasRepository.exists_by_id(database, id):
+    if not ReservasRepository.delete_by_id(database, id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Reserva não encontrada"
         )
-    ReservasRepository.delete_by_id(database, id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # GET COUNT
 @router.get("/count/")
-def count_all(database: Session = Depends(get_database)):
+async def count_all(database: AsyncSession = Depends(get_async_database)):
     '''Faz uma query de contagem de reservas na DB'''
-    count = ReservasRepository.count_all(database)
+    count = await AsyncReservasRepository.count_all(database)
     return {"count": count}
 
 # GET BY CLIENTE
-@router.get("/cliente/{cliente_id}", response_model=list[ReservaResponse])
-def find_by_cliente(cliente_id: int, database: Session = Depends(get_database)):
+@router.get("/cliente/{cliente_id}", response_model=list[ReservaResponse], dependencies=[condicional_lista(Reserva, assincrona=True, clienteId="cliente_id")])
+async def find_by_cliente(cliente_id: int, response: Response, database: AsyncSession = Depends(get_async_database)):
     '''Dado o ID do cliente, encontra as reservas desse cliente'''
-    reservas = ReservasRepository.find_by_cliente(database, cliente_id)
-    return [ReservaResponse.from_orm(reserva) for reserva in reservas]
+    reservas = await AsyncReservasRepository.find_by_cliente(database, cliente_id)
+    return resposta_lista(ReservaResponse, reservas, response)
 
 # GET BY CARRO
-@router.get("/carro/{carro_id}", response_model=list[ReservaResponse])
-def find_by_carro(carro_id: int, database: Session = Depends(get_database)):
+@router.get("/carro/{carro_id}", response_model=list[ReservaResponse], dependencies=[condicional_lista(Reserva, assincrona=True, carroId="carro_id")])
+async def find_by_carro(carro_id: int, response: Response, database: AsyncSession = Depends(get_async_database)):
     '''Dado o ID do carro, encontra as reservas desse carro'''
-    reservas = ReservasRepository.find_by_carro(database, carro_id)
-    return [ReservaResponse.from_orm(reserva) for reserva in reservas]
+    reservas = await AsyncReservasRepository.find_by_carro(database, carro_id)
+    return resposta_lista(ReservaResponse, reservas, response)
 
 # GET BY STATUS
-@router.get("/status/{status}", response_model=list[ReservaResponse])
-def find_by_status(status: str, database: Session = Depends(get_database)):
+@router.get("/status/{status}", response_model=list[ReservaResponse], dependencies=[condicional_lista(Reserva, assincrona=True, status="status")])
+async def find_by_status(status: str, response: Response, database: AsyncSession = Depends(get_async_database)):
     '''Dado o status, encontra as reservas com esse status'''
-    reservas = ReservasRepository.find_by_status(database, status)
-    return [ReservaResponse.from_orm(reserva) for reserva in reservas]
+    reservas = await AsyncReservasRepository.find_by_status(database, status)
+    return resposta_lista(ReservaResponse, reservas, response)
 
 # GET COUNT BY STATUS
 @router.get("/count/status/{status}")
-def count_by_status(status: str, database: Session = Depends(get_database)):
+async def count_by_status(status: str, database: AsyncSession = Depends(get_async_database)):
     '''Faz uma query de contagem de reservas por status na DB'''
-    count = ReservasRepository.count_by_status(database, status)
+    count = await AsyncReservasRepository.count_by_status(database, status)
     return {"count": count}
 
+# TRANSIÇÃO EM LOTE (antes de /{id}/... para "bulk" não ser lido como ID)
+@router.patch("/bulk/{acao}", response_model=TransicaoLoteResponse)
+def transicionar_em_lote(acao: str, request: TransicaoLoteRequest, database: Session = Depends(get_database)):
+    '''Confirma, cancela ou conclui várias reservas de uma vez, informando as recusadas e o motivo'''
+    if acao not in TRANSICOES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ação inválida: use {', '.join(TRANSICOES)}"
+        )
+    atualizadas, recusadas = ReservasService.transicionar_em_lote(database, acao, request.ids)
+    return TransicaoLoteResponse(
+        acao=acao,
+        atualizadas=atualizadas,
+        recusadas=[ReservaRecusadaResponse(id=id, motivo=motivo) for id, motivo in recusadas.items()],
+    )
+
 # CONFIRMAR RESERVA
 @router.patch("/{id}/confirmar", response_model=ReservaResponse)
 def confirmar_reserva(id: int, database: Session = Depends(get_database)):
     '''Confirma uma reserva pendente'''
-    reserva = ReservasRepository.find_by_id(database, id)
-    if not reserva:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Reserva não encontrada"
-        )
-    
-    if reserva.status != StatusReserva.PENDENTE:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Apenas reservas pendentes podem ser confirmadas"
-        )
-    
-    reserva.status = StatusReserva.CONFIRMADA
-    reserva_atualizada = ReservasRepository.save(database, reserva)
+    reserva_atualizada = ReservasService.transicionar(database, id, "confirmar")
     return ReservaResponse.from_orm(reserva_atualizada)
 
 # CANCELAR RESERVA
 @router.patch("/{id}/cancelar", response_model=ReservaResponse)
 def cancelar_reserva(id: int, database: Session = Depends(get_database)):
     '''Cancela uma reserva'''
-    reserva = ReservasRepository.find_by_id(database, id)
-    if not reserva:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Reserva não encontrada"
-        )
-    
-    if reserva.status == StatusReserva.CONCLUIDA:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Reservas concluídas não podem ser canceladas"
-        )
-    
-    reserva.status = StatusReserva.CANCELADA
-    reserva_atualizada = ReservasRepository.save(database, reserva)
+    reserva_atualizada = ReservasService.transicionar(database, id, "cancelar")
     return ReservaResponse.from_orm(reserva_atualizada)
 
 # CONCLUIR RESERVA
 @router.patch("/{id}/concluir", response_model=ReservaResponse)
 def concluir_reserva(id: int, database: Session = Depends(get_database)):
     '''Conclui uma reserva confirmada'''
-    reserva = ReservasRepository.find_by_id(database, id)
-    if not reserva:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Reserva não encontrada"
-        )
-    
-    if reserva.status != StatusReserva.CONFIRMADA:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Apenas reservas confirmadas podem ser concluídas"
-        )
-    
-    reserva.status = StatusReserva.CONCLUIDA
-    reserva_atualizada = ReservasRepository.save(database, reserva)
+    reserva_atualizada = ReservasService.transicionar(database, id, "concluir")
     return ReservaResponse.from_orm(reserva_atualizada)
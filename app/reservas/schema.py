@@ -1,6 +1,9 @@
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from ..datas import DataLocal
+from ..model.model import StatusReserva
 
 
 class ReservaBase(BaseModel):
@@ -16,8 +19,8 @@ class ReservaBase(BaseModel):
 
 class ReservaRequest(BaseModel):
     '''Classe para requisições de criação de reservas'''
-    dataRetirada: datetime
-    dataDevolucao: datetime
+    dataRetirada: DataLocal
+    dataDevolucao: DataLocal
     clienteId: int
     carroId: int
     localizacaoRetiradaId: int
@@ -34,9 +37,10 @@ class ReservaResponse(ReservaBase):
 
 class ReservaUpdateRequest(BaseModel):
     '''Classe para atualização de reservas'''
-    dataRetirada: datetime | None = None
-    dataDevolucao: datetime | None = None
-    status: str | None = None
+    dataRetirada: DataLocal | None = None
+    dataDevolucao: DataLocal | None = None
+    # Nome (CONFIRMADA) ou valor (Confirmada)
+    status: StatusReserva | None = None
     localizacaoRetiradaId: int | None = None
     localizacaoDevolucaoId: int | None = None
 
@@ -46,3 +50,65 @@ class ReservaCountResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class TransicaoLoteRequest(BaseModel):
+    '''Classe para requisições de transição de status em lote'''
+    ids: list[int] = Field(..., min_length=1, max_length=10000)
+
+class ReservaRecusadaResponse(BaseModel):
+    '''Reserva que não pôde ser transicionada e o motivo'''
+    id: int
+    motivo: str
+
+class TransicaoLoteResponse(BaseModel):
+    '''Classe para resposta das transições de status em lote'''
+    acao: str
+    atualizadas: list[int]
+    recusadas: list[ReservaRecusadaResponse]
+
+class CotacaoRequest(BaseModel):
+    '''Classe para requisições de cotação de vários carros no mesmo período'''
+    dataRetirada: DataLocal
+    dataDevolucao: DataLocal
+    carroIds: list[int] = Field(..., min_length=1, max_length=500)
+    # Sem localização de retirada, vale a localização atual de cada carro
+    localizacaoRetiradaId: int | None = None
+    localizacaoDevolucaoId: int | None = None
+
+class CotacaoCarroResponse(BaseModel):
+    '''Cotação de um carro: diárias com as regras de preço, desconto, taxa de devolução e total'''
+    carroId: int
+    categoria: str
+    dias: int
+    valorDiarias: float
+    desconto: float
+    taxaDevolucao: float
+    valorTotal: float
+
+class CotacaoResponse(BaseModel):
+    '''Classe para resposta das cotações'''
+    cotacoes: list[CotacaoCarroResponse]
+    naoEncontrados: list[int]
+
+class CotacoesRequest(BaseModel):
+    '''Classe para requisições de totais de uma página de busca: carroIds e/ou filtros'''
+    dataRetirada: DataLocal
+    dataDevolucao: DataLocal
+    carroIds: list[int] | None = Field(None, min_length=1, max_length=500)
+    localizacaoId: int | None = None
+    categoria: str | None = None
+    apenasDisponiveis: bool = False
+    localizacaoRetiradaId: int | None = None
+    localizacaoDevolucaoId: int | None = None
+
+class CotacaoTotalResponse(BaseModel):
+    '''Total de um carro e se ele está livre no período'''
+    carroId: int
+    valorTotal: float
+    disponivel: bool
+
+class CotacoesResponse(BaseModel):
+    '''Classe para resposta dos totais da busca'''
+    dias: int
+    totais: list[CotacaoTotalResponse]
+    naoEncontrados: list[int]
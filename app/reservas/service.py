@@ -0,0 +1,306 @@
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, exists, insert, literal, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..model.model import Carros, Cliente, Localizacao, Reserva, StatusCarro, StatusReserva
+from ..pagination import Page, PageParams, paginate
+from ..precos.motor import Cotacao, dias_cobrados, motor_precos
+from .repository import ReservasRepository
+from .rollups import EstadoReserva, RollupsService
+from .schema import CotacaoRequest, CotacoesRequest, ReservaRequest
+
+CONFLITO = "Carro já reservado no período"
+# SQLSTATE exclusion_violation (restrição reservas_sem_sobreposicao)
+EXCLUSAO_VIOLADA = "23P01"
+
+
+@dataclass(frozen=True)
+class Transicao:
+    '''Status de origem aceitos, status de destino e a mensagem quando a reserva não está em uma origem'''
+    origens: tuple[StatusReserva, ...]
+    destino: StatusReserva
+    recusa: str
+
+
+# Máquina de estados das reservas: usada pelos PATCH individuais e pelo /bulk/{acao}
+TRANSICOES = {
+    "confirmar": Transicao(
+        (StatusReserva.PENDENTE,), StatusReserva.CONFIRMADA,
+        "Apenas reservas pendentes podem ser confirmadas",
+    ),
+    "cancelar": Transicao(
+        (StatusReserva.CANCELADA, StatusReserva.PENDENTE, StatusReserva.CONFIRMADA), StatusReserva.CANCELADA,
+        "Reservas concluídas não podem ser canceladas",
+    ),
+    "concluir": Transicao(
+        (StatusReserva.CONFIRMADA,), StatusReserva.CONCLUIDA,
+        "Apenas reservas confirmadas podem ser concluídas",
+    ),
+}
+
+
+class ReservasService:
+    @staticmethod
+    def validar(database: Session, request: ReservaRequest) -> Row:
+        '''Valida cliente, carro, localizações e disponibilidade em um único SELECT
+
+        Retorna a diária e a categoria do carro (None se o carro não existe) e um flag
+        por verificação.
+        '''
+        clientes = Cliente.__table__
+        localizacoes = Localizacao.__table__
+        return database.execute(select(
+            select(Carros.precoDia).where(Carros.id == request.carroId).scalar_subquery().label("precoDia"),
+            select(Carros.categoria).where(Carros.id == request.carroId).scalar_subquery().label("categoria"),
+            exists().where(clientes.c.id == request.clienteId).label("cliente"),
+            exists().where(localizacoes.c.id == request.localizacaoRetiradaId).label("retirada"),
+            exists().where(localizacoes.c.id == request.localizacaoDevolucaoId).label("devolucao"),
+            ReservasRepository.ocupacao(request.carroId, request.dataRetirada, request.dataDevolucao).label("conflito"),
+        )).one()
+
+    @staticmethod
+    def criar(database: Session, request: ReservaRequest) -> Row:
+        '''Cria uma reserva pendente: validação e INSERT ... SELECT ... WHERE NOT EXISTS RETURNING
+
+        A verificação de sobreposição da validação só antecipa o 409. Quem garante a
+        exclusividade sob concorrência é o INSERT condicional, que grava nada se outro
+        pedido reservou o período nesse meio tempo:
+        - SQLite: o INSERT roda sob o lock de escrita do banco, então verificação e
+          gravação são atômicas;
+        - Postgres: SELECT ... FOR UPDATE na linha do carro serializa só as reservas do
+          mesmo carro (READ COMMITTED não basta para o NOT EXISTS), e a restrição
+          reservas_sem_sobreposicao (migração 0006) barra o que escapar disso.
+        '''
+        if database.get_bind().dialect.name == "postgresql":
+            database.execute(select(Carros.id).where(Carros.id == request.carroId).with_for_update())
+        validacao = ReservasService.validar(database, request)
+
+        if not validacao.cliente:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Cliente não encontrado"
+            )
+        if validacao.precoDia is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Carro não encontrado"
+            )
+        if not validacao.retirada:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Localização de retirada não encontrada"
+            )
+        if not validacao.devolucao:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Localização de devolução não encontrada"
+            )
+        if request.dataDevolucao <= request.dataRetirada:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Data de devolução deve ser posterior à data de retirada"
+            )
+        if validacao.conflito:
+            database.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=CONFLITO
+            )
+
+        reserva_data = request.dict()
+        reserva_data['valorTotal'] = motor_precos.calendario(database).cotar(
+            validacao.precoDia,
+            validacao.categoria,
+            request.localizacaoRetiradaId,
+            request.localizacaoDevolucaoId,
+            request.dataRetirada,
+            request.dataDevolucao,
+        ).valorTotal
+        reserva_data['status'] = StatusReserva.PENDENTE
+        reserva_data['criadoEm'] = reserva_data['atualizadoEm'] = datetime.now()
+
+        # INSERT ... RETURNING com a tabela (Core): a linha volta pronta, sem refresh
+        # e sem expirar no commit
+        reservas = Reserva.__table__
+        linha = select(
+            *(literal(valor, reservas.c[coluna].type) for coluna, valor in reserva_data.items())
+        ).where(~ReservasRepository.ocupacao(request.carroId, request.dataRetirada, request.dataDevolucao))
+        try:
+            reserva = database.execute(
+                insert(reservas).from_select(list(reserva_data), linha).returning(*reservas.c)
+            ).first()
+        except IntegrityError as erro:
+            database.rollback()
+            if getattr(erro.orig, "pgcode", None) != EXCLUSAO_VIOLADA:
+                raise
+            reserva = None
+        if reserva is None:
+            database.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=CONFLITO
+            )
+        database.commit()
+        return reserva
+
+    @staticmethod
+    def _cotar_carros(database: Session, carros: list[Row], request: CotacaoRequest | CotacoesRequest) -> list[tuple[Row, Cotacao]]:
+        '''Cota as linhas (id, precoDia, categoria, localizacaoId) com o calendário de tarifas
+
+        A localização de retirada da requisição (ou a atual de cada carro) seleciona
+        as regras de preço.
+        '''
+        if request.dataDevolucao <= request.dataRetirada:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Data de devolução deve ser posterior à data de retirada"
+            )
+        calendario = motor_precos.calendario(database)
+        cotacoes = []
+        for carro in carros:
+            retirada = request.localizacaoRetiradaId or carro.localizacaoId
+            devolucao = request.localizacaoDevolucaoId or retirada
+            cotacoes.append((carro, calendario.cotar(
+                carro.precoDia, carro.categoria, retirada, devolucao, request.dataRetirada, request.dataDevolucao
+            )))
+        return cotacoes
+
+    @staticmethod
+    def cotar(database: Session, request: CotacaoRequest) -> dict:
+        '''Cota vários carros no período: um SELECT ... WHERE id IN (...) e o calendário de tarifas'''
+        carro_ids = list(dict.fromkeys(request.carroIds))
+        carros = database.execute(
+            select(Carros.id, Carros.precoDia, Carros.categoria, Carros.localizacaoId)
+            .where(Carros.id.in_(carro_ids))
+        ).all()
+        ordem = {carro_id: posicao for posicao, carro_id in enumerate(carro_ids)}
+        carros.sort(key=lambda carro: ordem[carro.id])
+        cotacoes = ReservasService._cotar_carros(database, carros, request)
+        encontrados = {carro.id for carro in carros}
+        return {
+            "cotacoes": [
+                {"carroId": carro.id, "categoria": carro.categoria, **asdict(cotacao)} for carro, cotacao in cotacoes
+            ],
+            "naoEncontrados": [carro_id for carro_id in carro_ids if carro_id not in encontrados],
+        }
+
+    @staticmethod
+    def cotar_totais(database: Session, request: CotacoesRequest, params: PageParams) -> tuple[dict, Page]:
+        '''Totais de uma página de resultados de busca: carroIds e/ou filtros em um único SELECT
+
+        Cada carro vem com o flag de disponibilidade no período (fora de manutenção e sem
+        reserva ativa sobreposta), calculado na mesma query; apenasDisponiveis descarta
+        os demais. Sem carroIds, a busca é paginada por cursor (params, X-Next-Cursor);
+        com carroIds, a lista já é limitada pelo schema e params é ignorado.
+        '''
+        if request.carroIds is None and request.localizacaoId is None and request.categoria is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Informe carroIds ou um filtro (localizacaoId, categoria)"
+            )
+        disponivel = and_(
+            Carros.status != StatusCarro.MANUTENCAO,
+            ~ReservasRepository.ocupacao(Carros.id, request.dataRetirada, request.dataDevolucao),
+        )
+        stmt = select(
+            Carros.id, Carros.precoDia, Carros.categoria, Carros.localizacaoId, disponivel.label("disponivel")
+        )
+        nao_encontrados: list[int] = []
+        if request.carroIds is not None:
+            # Filtros e disponibilidade aplicados depois: só IDs inexistentes entram em naoEncontrados
+            carro_ids = list(dict.fromkeys(request.carroIds))
+            carros = database.execute(stmt.where(Carros.id.in_(carro_ids)).order_by(Carros.id)).all()
+            encontrados = {carro.id for carro in carros}
+            nao_encontrados = [carro_id for carro_id in carro_ids if carro_id not in encontrados]
+            carros = [
+                carro for carro in carros
+                if request.localizacaoId in (None, carro.localizacaoId)
+                and request.categoria in (None, carro.categoria)
+                and (carro.disponivel or not request.apenasDisponiveis)
+            ]
+            pagina = Page(itens=carros)
+        else:
+            if request.localizacaoId is not None:
+                stmt = stmt.where(Carros.localizacaoId == request.localizacaoId)
+            if request.categoria is not None:
+                stmt = stmt.where(Carros.categoria == request.categoria)
+            if request.apenasDisponiveis:
+                stmt = stmt.where(disponivel)
+            pagina = paginate(database, stmt, params, id_coluna=Carros.id, ordenacoes={"id": Carros.id})
+        corpo = {
+            "dias": dias_cobrados(request.dataRetirada, request.dataDevolucao),
+            "totais": [
+                {"carroId": carro.id, "valorTotal": cotacao.valorTotal, "disponivel": bool(carro.disponivel)}
+                for carro, cotacao in ReservasService._cotar_carros(database, pagina.itens, request)
+            ],
+            "naoEncontrados": nao_encontrados,
+        }
+        return corpo, pagina
+
+    @staticmethod
+    def transicionar(database: Session, id: int, acao: str) -> Reserva:
+        '''Aplica a ação de TRANSICOES a uma reserva (404 se não existe, 400 se o status não permite)'''
+        transicao = TRANSICOES[acao]
+        reserva = ReservasRepository.get_or_404(database, id)
+        if reserva.status not in transicao.origens:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=transicao.recusa
+            )
+
+        antes = EstadoReserva.de(reserva)
+        reserva.status = transicao.destino
+        RollupsService.aplicar(database, antes, EstadoReserva.de(reserva))
+        return ReservasRepository.save(database, reserva)
+
+    @staticmethod
+    def transicionar_em_lote(
+        database: Session, acao: str, ids: list[int], origens: tuple[StatusReserva, ...] | None = None
+    ) -> tuple[list[int], dict[int, str]]:
+        '''Aplica a ação a várias reservas com UPDATE ... WHERE status = origem RETURNING
+
+        Um UPDATE por status de origem (um só para confirmar/concluir) e uma transação
+        para tudo, incluindo os agregados. origens restringe os status de origem da
+        ação (ex.: o ciclo de vida só cancela pendentes). Retorna os IDs atualizados e
+        o motivo de recusa de cada um dos demais.
+        '''
+        transicao = TRANSICOES[acao]
+        if origens is not None:
+            transicao = replace(transicao, origens=tuple(set(transicao.origens).intersection(origens)))
+        tabela = Reserva.__table__
+        ids = list(dict.fromkeys(ids))
+        atualizadas: list[int] = []
+        estados: list[tuple[EstadoReserva, EstadoReserva]] = []
+        # Origem igual ao destino primeiro: as linhas que este comando acabou de mover
+        # para o destino não casam com as origens seguintes
+        for origem in sorted(transicao.origens, key=lambda origem: origem != transicao.destino):
+            linhas = database.execute(
+                update(tabela)
+                .where(tabela.c.id.in_(ids), tabela.c.status == origem)
+                .values(status=transicao.destino)
+                .returning(*tabela.c)
+            ).all()
+            for linha in linhas:
+                atualizadas.append(linha.id)
+                depois = EstadoReserva.de(linha)
+                estados.append((replace(depois, status=origem), depois))
+        RollupsService.aplicar_varios(database, estados)
+        database.commit()
+
+        recusadas: dict[int, str] = {}
+        restantes = set(ids).difference(atualizadas)
+        if restantes:
+            atuais = dict(database.execute(
+                select(tabela.c.id, tabela.c.status).where(tabela.c.id.in_(restantes))
+            ).all())
+            for id in sorted(restantes):
+                if id in atuais:
+                    recusadas[id] = f"{transicao.recusa} (status atual: {StatusReserva(atuais[id]).value})"
+                else:
+                    recusadas[id] = ReservasRepository.nao_encontrado
+        return sorted(atualizadas), recusadas
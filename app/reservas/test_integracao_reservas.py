@@ -1,71 +1,32 @@
-from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
 
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import httpx
+from fastapi import HTTPException
+from sqlalchemy import func, select
 
-from ..database import Base, get_db
+from ..clientes.repository import ClientesRepository
+from ..conftest import (
+    TestingAsyncSessionLocal,
+    TestingSessionLocal,
+    client,
+    criar_carro,
+    criar_cliente,
+    criar_localizacao,
+    sufixo_unico,
+)
+from ..idempotencia import Idempotencia
 from ..main import app
+from ..model.model import Reserva, RollupReservaDiaria
+from ..pagination import PageParams
+from .ciclo import CicloReservasService
+from .rollups import RollupsService
+from .schema import ReservaRequest
+from .service import ReservasService
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test_integracao.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-client = TestClient(app)
-
-def criar_localizacao():
-    resp = client.post(
-        "/localizacoes/",
-        json={"nome": "Agencia Centro", "endereco": "Rua A, 123"},
-    )
-    assert resp.status_code == 201
-    return resp.json()["id"]
-
-def criar_cliente():
-    resp = client.post(
-        "/clientes/",
-        json={
-            "nome": "Cliente Teste",
-            "email": f"cliente{datetime.now().timestamp()}@teste.com",
-            "senha": "senha123",
-            "telefone": "61999999999",
-            "cnh": f"CNH{int(datetime.now().timestamp())}",
-            "cpf": f"{int(datetime.now().timestamp()):011d}",
-        },
-    )
-    assert resp.status_code == 201
-    return resp.json()["id"]
-
-def criar_carro(localizacao_id: int):
-    resp = client.post(
-        "/carros/",
-        json={
-            "placa": f"{int(datetime.now().timestamp())}ABC",
-            "marca": "Toyota",
-            "modelo": "Corolla",
-            "ano": 2023,
-            "cor": "Branco",
-            "precoDia": 150.0,
-            "categoria": "Sedan",
-            "descricao": "Carro econômico",
-            "disponivel": True,
-            "destaque": False,
-            "localizacaoId": localizacao_id,
-        },
-    )
-    assert resp.status_code == 201
-    return resp.json()["id"]
 
 def test_fluxo_integrado_reserva():
     loc_retirada = criar_localizacao()
@@ -99,3 +60,632 @@ def test_fluxo_integrado_reserva():
     resp = client.patch(f"/reservas/{reserva['id']}/concluir")
     assert resp.status_code == 200
     assert resp.json()["status"] == "Concluida"
+
+def test_disponibilidade_por_periodo():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    carro_id = criar_carro(loc)
+
+    inicio = datetime(2030, 1, 10)
+    fim = inicio + timedelta(days=5)
+    payload = {
+        "dataRetirada": inicio.isoformat(),
+        "dataDevolucao": fim.isoformat(),
+        "clienteId": cliente_id,
+        "carroId": carro_id,
+        "localizacaoRetiradaId": loc,
+        "localizacaoDevolucaoId": loc,
+    }
+    resp = client.post("/reservas/", json=payload)
+    assert resp.status_code == 201
+
+    # Período sobreposto: carro fora da busca e nova reserva recusada
+    params = {
+        "inicio": (inicio + timedelta(days=2)).isoformat(),
+        "fim": (fim + timedelta(days=2)).isoformat(),
+        "localizacaoId": loc,
+    }
+    resp = client.get("/carros/disponivel", params=params)
+    assert resp.status_code == 200
+    assert carro_id not in [carro["id"] for carro in resp.json()]
+
+    resp = client.post("/reservas/", json={
+        **payload,
+        "dataRetirada": params["inicio"],
+        "dataDevolucao": params["fim"],
+    })
+    assert resp.status_code == 409
+
+    # Período adjacente: carro disponível
+    params = {"inicio": fim.isoformat(), "fim": (fim + timedelta(days=1)).isoformat()}
+    resp = client.get("/carros/disponivel", params=params)
+    assert carro_id in [carro["id"] for carro in resp.json()]
+
+    # Datas com fuso valem como a hora local equivalente
+    def utc(data: datetime) -> str:
+        return data.astimezone(UTC).replace(tzinfo=None).isoformat() + "Z"
+
+    resp = client.get("/carros/disponivel", params={"inicio": utc(fim), "fim": utc(fim + timedelta(days=1))})
+    assert resp.status_code == 200
+    assert carro_id in [carro["id"] for carro in resp.json()]
+    resp = client.post("/reservas/", json={
+        **payload,
+        "dataRetirada": utc(fim - timedelta(hours=1)),
+        "dataDevolucao": utc(fim + timedelta(days=1)),
+    })
+    assert resp.status_code == 409
+
+def test_criar_reserva_valida_referencias():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    carro_id = criar_carro(loc)
+    payload = {
+        "dataRetirada": datetime(2031, 5, 1).isoformat(),
+        "dataDevolucao": datetime(2031, 5, 2).isoformat(),
+        "clienteId": cliente_id,
+        "carroId": carro_id,
+        "localizacaoRetiradaId": loc,
+        "localizacaoDevolucaoId": loc,
+    }
+
+    resp = client.post("/reservas/", json={**payload, "clienteId": 999999})
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == "Cliente não encontrado"
+
+    resp = client.post("/reservas/", json={**payload, "carroId": 999999})
+    assert resp.json()["detail"] == "Carro não encontrado"
+
+    resp = client.post("/reservas/", json={**payload, "localizacaoDevolucaoId": 999999})
+    assert resp.json()["detail"] == "Localização de devolução não encontrada"
+
+    resp = client.post("/reservas/", json=payload)
+    assert resp.status_code == 201
+    assert resp.json()["valorTotal"] == 150.0
+
+def test_rollups_receita_e_ocupacao():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    categoria = f"Rollup{sufixo_unico()}"
+    carro_id = criar_carro(loc, categoria)
+
+    def reservar(dia: int):
+        resp = client.post(
+            "/reservas/",
+            json={
+                "dataRetirada": datetime(2041, 3, dia, 12).isoformat(),
+                "dataDevolucao": datetime(2041, 3, dia + 2, 12).isoformat(),
+                "clienteId": cliente_id,
+                "carroId": carro_id,
+                "localizacaoRetiradaId": loc,
+                "localizacaoDevolucaoId": loc,
+            },
+        )
+        assert resp.status_code == 201
+        return resp.json()["id"]
+
+    def relatorio(**params):
+        resp = client.get(
+            "/dashboards/relatorios",
+            params={"inicio": "2041-03-01", "fim": "2041-03-31", "categoria": categoria, **params},
+        )
+        assert resp.status_code == 200
+        return resp.json()
+
+    cancelada = reservar(1)
+    assert client.patch(f"/reservas/{cancelada}/confirmar").status_code == 200
+    dias = {item["periodo"]: item for item in relatorio()}
+    assert dias["2041-03-01"]["receita"] == 300.0
+    assert dias["2041-03-01"]["carroDias"] == 0.5
+    assert dias["2041-03-02"]["carroDias"] == 1.0
+    assert dias["2041-03-03"]["carroDias"] == 0.5
+
+    # Cancelar desfaz a contribuição; concluir mantém
+    assert client.patch(f"/reservas/{cancelada}/cancelar").status_code == 200
+    concluida = reservar(10)
+    assert client.patch(f"/reservas/{concluida}/confirmar").status_code == 200
+    assert client.patch(f"/reservas/{concluida}/concluir").status_code == 200
+
+    (mes,) = relatorio(granularidade="mes")
+    assert mes["periodo"] == "2041-03-01"
+    assert mes["receita"] == 300.0
+    assert mes["reservas"] == 1
+    assert mes["carroDias"] == 2.0
+    assert mes["capacidade"] == 31
+    assert mes["utilizacao"] == round(2.0 / 31, 4)
+
+    # O backfill a partir do histórico chega ao mesmo resultado
+    with TestingSessionLocal() as db:
+        RollupsService.reconstruir(db)
+    assert relatorio(granularidade="mes") == [mes]
+
+    # Trocar a categoria do carro leva as reservas dele junto nos agregados
+    nova = f"{categoria}Suv"
+    assert client.put(f"/carros/{carro_id}", json={"categoria": nova}).status_code == 200
+    assert relatorio(granularidade="mes")[0]["receita"] == 0.0
+    assert relatorio(granularidade="mes", categoria=nova)[0]["receita"] == 300.0
+    with TestingSessionLocal() as db:
+        RollupsService.reconstruir(db)
+    assert relatorio(granularidade="mes", categoria=nova)[0]["receita"] == 300.0
+
+    resp = client.get("/dashboards/relatorios", params={"inicio": "2041-03-01", "fim": "2041-03-31", "granularidade": "ano"})
+    assert resp.status_code == 400
+
+    # Linhas zeradas dos agregados não impedem excluir a localização
+    for id in (cancelada, concluida):
+        assert client.delete(f"/reservas/{id}").status_code == 204
+    assert client.delete(f"/localizacoes/{loc}").status_code == 204
+    with TestingSessionLocal() as db:
+        assert not db.scalar(select(func.count()).where(RollupReservaDiaria.localizacaoId == loc))
+
+def test_put_reserva_com_nome_do_status_e_datas_com_fuso():
+    loc = criar_localizacao()
+    carro_id = criar_carro(loc, f"Put{sufixo_unico()}")
+    resp = client.post(
+        "/reservas/",
+        json={
+            "dataRetirada": "2042-05-01T10:00:00",
+            "dataDevolucao": "2042-05-03T10:00:00",
+            "clienteId": criar_cliente(),
+            "carroId": carro_id,
+            "localizacaoRetiradaId": loc,
+            "localizacaoDevolucaoId": loc,
+        },
+    )
+    reserva_id = resp.json()["id"]
+
+    # Nome do enum, como a coluna grava
+    resp = client.put(f"/reservas/{reserva_id}", json={"status": "CONFIRMADA"})
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "Confirmada"
+
+    # Datas com fuso em uma reserva confirmada (que entra nos agregados)
+    retirada = datetime(2042, 5, 2, 10).astimezone(UTC).replace(tzinfo=None).isoformat() + "Z"
+    resp = client.put(f"/reservas/{reserva_id}", json={"dataRetirada": retirada})
+    assert resp.status_code == 200
+    assert resp.json()["dataRetirada"] == "2042-05-02T10:00:00"
+
+def test_requisicoes_condicionais_304():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    carro_id = criar_carro(loc)
+    retirada = datetime.now() + timedelta(days=40)
+    resp = client.post(
+        "/reservas/",
+        json={
+            "dataRetirada": retirada.isoformat(),
+            "dataDevolucao": (retirada + timedelta(days=2)).isoformat(),
+            "clienteId": cliente_id,
+            "carroId": carro_id,
+            "localizacaoRetiradaId": loc,
+            "localizacaoDevolucaoId": loc,
+        },
+    )
+    reserva_id = resp.json()["id"]
+
+    # Listagem do cliente: marca d'água das reservas dele
+    resp = client.get(f"/reservas/cliente/{cliente_id}")
+    etag = resp.headers["ETag"]
+    resp = client.get(f"/reservas/cliente/{cliente_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+    # Reservas de outro cliente não mudam a versão; a transição desta muda
+    outro = criar_cliente()
+    client.post(
+        "/reservas/",
+        json={
+            "dataRetirada": (retirada + timedelta(days=10)).isoformat(),
+            "dataDevolucao": (retirada + timedelta(days=11)).isoformat(),
+            "clienteId": outro,
+            "carroId": carro_id,
+            "localizacaoRetiradaId": loc,
+            "localizacaoDevolucaoId": loc,
+        },
+    )
+    assert client.get(f"/reservas/cliente/{cliente_id}", headers={"If-None-Match": etag}).status_code == 304
+    client.patch(f"/reservas/{reserva_id}/confirmar")
+    resp = client.get(f"/reservas/cliente/{cliente_id}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+    # Item: ETag de (id, atualizadoEm) e Last-Modified
+    resp = client.get(f"/carros/{carro_id}")
+    assert client.get(f"/carros/{carro_id}", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+    resp = client.get(f"/carros/{carro_id}", headers={"If-Modified-Since": resp.headers["Last-Modified"]})
+    assert resp.status_code == 304
+    assert client.get("/carros/999999", headers={"If-None-Match": "*"}).status_code == 404
+
+    # Catálogo servido do cache também responde 304
+    resp = client.get("/carros/", params={"limit": 5})
+    resp = client.get("/carros/", params={"limit": 5}, headers={"If-None-Match": resp.headers["ETag"]})
+    assert resp.status_code == 304
+
+    # Busca por trecho do tipo: a marca d'água usa o mesmo ilike da consulta
+    sufixo = sufixo_unico()
+    resp = client.post(
+        "/admins/",
+        json={"nome": "Admin", "email": f"etag{sufixo}@teste.com", "senha": "senha123", "cargo": "Gerente"},
+    )
+    dashboard_id = client.post("/dashboards/", json={"nome": "Painel", "adminId": resp.json()["id"]}).json()["id"]
+    tipo = f"vendas{sufixo}"
+    metrica = {"nome": "Vendas", "valor": "1", "dashboardId": dashboard_id}
+    assert client.post("/metricas/", json={**metrica, "tipo": tipo}).status_code == 201
+    resp = client.get(f"/metricas/tipo/{tipo}")
+    assert len(resp.json()) == 1
+    etag = resp.headers["ETag"]
+    client.post("/metricas/", json={**metrica, "tipo": f"{tipo}_mensal"})
+    resp = client.get(f"/metricas/tipo/{tipo}", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert len(resp.json()) == 2
+
+def test_listagens_projetam_colunas_sem_senha():
+    cliente_id = criar_cliente()
+    with TestingSessionLocal() as db:
+        pagina = ClientesRepository.find_all(db, PageParams(limit=500))
+        linha = next(item for item in pagina.itens if item.id == cliente_id)
+        assert "senha" not in linha._fields
+        assert not db.identity_map
+
+    resp = client.get("/clientes/", params={"limit": 1})
+    assert resp.status_code == 200
+    assert "senha" not in resp.json()[0]
+    resp = client.get("/clientes/", params={"limit": 1, "cursor": resp.headers["X-Next-Cursor"]})
+    assert resp.status_code == 200
+
+def test_transicoes_em_lote():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    carro_id = criar_carro(loc)
+    retirada = datetime(2032, 5, 1, 10)
+    ids = []
+    for semana in range(3):
+        resp = client.post(
+            "/reservas/",
+            json={
+                "dataRetirada": (retirada + timedelta(weeks=semana)).isoformat(),
+                "dataDevolucao": (retirada + timedelta(weeks=semana, days=2)).isoformat(),
+                "clienteId": cliente_id,
+                "carroId": carro_id,
+                "localizacaoRetiradaId": loc,
+                "localizacaoDevolucaoId": loc,
+            },
+        )
+        ids.append(resp.json()["id"])
+
+    resp = client.patch("/reservas/bulk/confirmar", json={"ids": ids[:2]})
+    assert resp.status_code == 200
+    assert resp.json()["atualizadas"] == ids[:2]
+
+    resp = client.patch("/reservas/bulk/concluir", json={"ids": [*ids, 999999]})
+    corpo = resp.json()
+    assert corpo["atualizadas"] == ids[:2]
+    recusadas = {item["id"]: item["motivo"] for item in corpo["recusadas"]}
+    assert recusadas[ids[2]].startswith("Apenas reservas confirmadas podem ser concluídas")
+    assert recusadas[999999] == "Reserva não encontrada"
+
+    # Cancelar aceita pendentes e recusa concluídas, com a mesma regra do PATCH individual
+    corpo = client.patch("/reservas/bulk/cancelar", json={"ids": ids}).json()
+    assert corpo["atualizadas"] == [ids[2]]
+    assert client.patch(f"/reservas/{ids[0]}/cancelar").status_code == 400
+    assert [client.get(f"/reservas/{id}").json()["status"] for id in ids] == ["Concluida", "Concluida", "Cancelada"]
+
+    # A receita entra nos agregados uma única vez por reserva concluída
+    resp = client.get(
+        "/dashboards/relatorios",
+        params={"inicio": "2032-05-01", "fim": "2032-05-31", "granularidade": "mes", "localizacaoId": loc},
+    )
+    assert resp.json()[0]["reservas"] == 2
+
+    assert client.patch("/reservas/bulk/apagar", json={"ids": ids}).status_code == 404
+
+def test_ciclo_de_vida_automatico():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    carro_id = criar_carro(loc)
+    agora = datetime.now().replace(microsecond=0)
+
+    def reservar(inicio, fim):
+        resp = client.post(
+            "/reservas/",
+            json={
+                "dataRetirada": inicio.isoformat(),
+                "dataDevolucao": fim.isoformat(),
+                "clienteId": cliente_id,
+                "carroId": carro_id,
+                "localizacaoRetiradaId": loc,
+                "localizacaoDevolucaoId": loc,
+            },
+        )
+        assert resp.status_code == 201
+        return resp.json()["id"]
+
+    devolvida = reservar(agora - timedelta(days=5), agora - timedelta(days=3))
+    em_andamento = reservar(agora - timedelta(days=1), agora + timedelta(days=1))
+    esquecida = reservar(agora + timedelta(days=10), agora + timedelta(days=12))
+    recente = reservar(agora + timedelta(days=20), agora + timedelta(days=22))
+    client.patch("/reservas/bulk/confirmar", json={"ids": [devolvida, em_andamento]})
+    with TestingSessionLocal() as db:
+        db.query(Reserva).filter(Reserva.id == esquecida).update({"criadoEm": agora - timedelta(hours=2)})
+        db.commit()
+
+    assert client.get(f"/carros/{carro_id}").json()["disponivel"] is True
+    with TestingSessionLocal() as db:
+        resultado = CicloReservasService.executar(db, agora=agora, ttl=1800, lote=1)
+    assert resultado["expiradas"] >= 1 and resultado["concluidas"] >= 1
+    assert resultado["atrasoSeg"]["pendentes"] >= 5400
+    status = {id: client.get(f"/reservas/{id}").json()["status"] for id in (devolvida, em_andamento, esquecida, recente)}
+    assert status == {devolvida: "Concluida", em_andamento: "Confirmada", esquecida: "Cancelada", recente: "Pendente"}
+    carro = client.get(f"/carros/{carro_id}").json()
+    assert (carro["status"], carro["disponivel"]) == ("Alugado", False)
+
+    # Após a devolução o carro volta ao pátio
+    with TestingSessionLocal() as db:
+        CicloReservasService.executar(db, agora=agora + timedelta(days=2), ttl=10**9)
+    assert client.get(f"/reservas/{em_andamento}").json()["status"] == "Concluida"
+    carro = client.get(f"/carros/{carro_id}").json()
+    assert (carro["status"], carro["disponivel"]) == ("Disponivel", True)
+
+def test_motor_de_precos_e_cotacao():
+    loc = criar_localizacao()
+    outra_loc = criar_localizacao()
+    categoria = f"Premium{sufixo_unico()}"
+    carro_id = criar_carro(loc, categoria=categoria)
+    carro_sem_regras = criar_carro(loc)
+    regras = [
+        {"nome": "Alta temporada", "tipo": "Sazonal", "inicio": "2033-01-10", "fim": "2033-01-11", "multiplicador": 2.0},
+        {"nome": "Fim de semana", "tipo": "FimDeSemana", "multiplicador": 1.5},
+        {"nome": "Semanal", "tipo": "LongaDuracao", "diasMinimos": 7, "multiplicador": 0.9},
+        {"nome": "One-way", "tipo": "TaxaDevolucao", "valorFixo": 80.0},
+    ]
+    ids = []
+    for regra in regras:
+        resp = client.post("/precos/regras", json={**regra, "categoria": categoria})
+        assert resp.status_code == 201
+        ids.append(resp.json()["id"])
+    assert client.post("/precos/regras", json={"nome": "x", "tipo": "LongaDuracao"}).status_code == 400
+
+    # Listagem paginada por cursor, com filtros
+    resp = client.get("/precos/regras", params={"categoria": categoria, "limit": 3})
+    assert [regra["id"] for regra in resp.json()] == ids[:3]
+    resp = client.get("/precos/regras", params={"categoria": categoria, "cursor": resp.headers["X-Next-Cursor"]})
+    assert [regra["id"] for regra in resp.json()] == ids[3:]
+    resp = client.get("/precos/regras", params={"categoria": categoria, "tipo": "TaxaDevolucao"})
+    assert [regra["id"] for regra in resp.json()] == ids[3:]
+
+    # Seg 10/01 a seg 17/01: 2 dias em alta (x2), sábado e domingo (x1,5) e 3 dias normais
+    cotacao = {
+        "dataRetirada": "2033-01-10T10:00:00",
+        "dataDevolucao": "2033-01-17T10:00:00",
+        "carroIds": [carro_id, carro_sem_regras, 999999],
+        "localizacaoRetiradaId": loc,
+        "localizacaoDevolucaoId": outra_loc,
+    }
+    corpo = client.post("/reservas/cotacao", json=cotacao).json()
+    assert corpo["naoEncontrados"] == [999999]
+    com_regras, sem_regras = corpo["cotacoes"]
+    assert (com_regras["dias"], com_regras["valorDiarias"], com_regras["desconto"]) == (7, 1500.0, 150.0)
+    assert (com_regras["taxaDevolucao"], com_regras["valorTotal"]) == (80.0, 1430.0)
+    assert (sem_regras["carroId"], sem_regras["valorTotal"]) == (carro_sem_regras, 1050.0)
+
+    # A reserva usa o mesmo calendário
+    resp = client.post(
+        "/reservas/",
+        json={
+            "dataRetirada": cotacao["dataRetirada"],
+            "dataDevolucao": cotacao["dataDevolucao"],
+            "clienteId": criar_cliente(),
+            "carroId": carro_id,
+            "localizacaoRetiradaId": loc,
+            "localizacaoDevolucaoId": outra_loc,
+        },
+    )
+    assert resp.json()["valorTotal"] == 1430.0
+
+    # Alterar as regras recompila o calendário
+    assert client.delete(f"/precos/regras/{ids[0]}").status_code == 204
+    corpo = client.post("/reservas/cotacao", json={**cotacao, "carroIds": [carro_id]}).json()
+    assert corpo["cotacoes"][0]["valorTotal"] == 1160.0
+
+def test_cotacoes_da_pagina_de_busca():
+    loc = criar_localizacao()
+    categoria = f"Busca{sufixo_unico()}"
+    carros = [criar_carro(loc, categoria=categoria) for _ in range(3)]
+    periodo = {"dataRetirada": "2034-03-01T10:00:00", "dataDevolucao": "2034-03-04T10:00:00"}
+    resp = client.post(
+        "/reservas/",
+        json={
+            **periodo,
+            "clienteId": criar_cliente(),
+            "carroId": carros[0],
+            "localizacaoRetiradaId": loc,
+            "localizacaoDevolucaoId": loc,
+        },
+    )
+    assert resp.status_code == 201
+
+    corpo = client.post("/reservas/cotacoes", json={**periodo, "categoria": categoria}).json()
+    assert corpo["dias"] == 3
+    assert [(total["carroId"], total["valorTotal"], total["disponivel"]) for total in corpo["totais"]] == [
+        (carros[0], 450.0, False), (carros[1], 450.0, True), (carros[2], 450.0, True),
+    ]
+
+    corpo = client.post(
+        "/reservas/cotacoes", json={**periodo, "carroIds": [*carros, 999999], "apenasDisponiveis": True}
+    ).json()
+    assert [total["carroId"] for total in corpo["totais"]] == carros[1:]
+    assert corpo["naoEncontrados"] == [999999]
+
+    # Carro fora do filtro é descartado, não reportado como inexistente
+    outro = criar_carro(loc, categoria=f"{categoria}Outra")
+    corpo = client.post(
+        "/reservas/cotacoes", json={**periodo, "carroIds": [carros[1], outro], "categoria": categoria}
+    ).json()
+    assert [total["carroId"] for total in corpo["totais"]] == [carros[1]]
+    assert corpo["naoEncontrados"] == []
+
+    # Por filtro, a busca é paginada por cursor
+    resp = client.post("/reservas/cotacoes", params={"limit": 2}, json={**periodo, "categoria": categoria})
+    assert [total["carroId"] for total in resp.json()["totais"]] == carros[:2]
+    resp = client.post(
+        "/reservas/cotacoes",
+        params={"limit": 2, "cursor": resp.headers["X-Next-Cursor"]},
+        json={**periodo, "categoria": categoria},
+    )
+    assert [total["carroId"] for total in resp.json()["totais"]] == carros[2:]
+    assert "X-Next-Cursor" not in resp.headers
+
+    assert client.post("/reservas/cotacoes", json=periodo).status_code == 400
+
+def test_reservas_concorrentes_sem_sobreposicao():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    disputado = criar_carro(loc)
+    outros = [criar_carro(loc) for _ in range(20)]
+
+    def reservar(carro_id: int, dia: int) -> int:
+        request = ReservaRequest(
+            dataRetirada=datetime(2035, 1, dia, 10),
+            dataDevolucao=datetime(2035, 1, dia + 2, 10),
+            clienteId=cliente_id,
+            carroId=carro_id,
+            localizacaoRetiradaId=loc,
+            localizacaoDevolucaoId=loc,
+        )
+        with TestingSessionLocal() as db:
+            try:
+                return ReservasService.criar(db, request).id
+            except HTTPException as erro:
+                assert erro.status_code == 409
+                return 0
+
+    # Períodos diferentes, todos sobrepostos ao dia 10: só um pedido pode vencer
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        resultados = list(executor.map(lambda i: reservar(disputado, 9 + i % 2), range(200)))
+    assert sum(1 for id in resultados if id) == 1
+    assert len(client.get(f"/reservas/carro/{disputado}").json()) == 1
+
+    # Reabrir uma cancelada via PUT também passa pela checagem de sobreposição
+    vencedora = next(id for id in resultados if id)
+    client.patch(f"/reservas/{vencedora}/cancelar")
+    assert reservar(disputado, 10)
+    resp = client.put(f"/reservas/{vencedora}", json={"status": "Pendente"})
+    assert resp.status_code == 409
+    resp = client.put(f"/reservas/{vencedora}", json={"status": "CONFIRMADA"})
+    assert resp.status_code == 409
+    assert client.get(f"/reservas/{vencedora}").json()["status"] == "Cancelada"
+
+    # Carros diferentes não disputam entre si
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        resultados = list(executor.map(lambda carro_id: reservar(carro_id, 10), outros))
+    assert all(resultados)
+
+def test_idempotency_key_repete_resposta():
+    sufixo = sufixo_unico()
+    cliente = {
+        "nome": "Cliente Idempotente",
+        "email": f"idem{sufixo}@teste.com",
+        "senha": "senha123",
+        "cnh": f"CNH{sufixo}",
+        "cpf": f"{sufixo:011d}",
+    }
+    headers = {"Idempotency-Key": f"cliente-{sufixo}"}
+    primeira = client.post("/clientes/", json=cliente, headers=headers)
+    repetida = client.post("/clientes/", json=cliente, headers=headers)
+    assert primeira.status_code == repetida.status_code == 201
+    assert repetida.json() == primeira.json()
+    assert "Idempotent-Replayed" not in primeira.headers
+    assert repetida.headers["Idempotent-Replayed"] == "true"
+    # Mesma chave com outro corpo
+    outra = client.post("/clientes/", json={**cliente, "nome": "Outro"}, headers=headers)
+    assert outra.status_code == 422
+
+    # Repetições concorrentes da mesma reserva: uma execução, as demais recebem a mesma resposta
+    loc = criar_localizacao()
+    carro_id = criar_carro(loc)
+    reserva = {
+        "dataRetirada": "2036-02-01T10:00:00",
+        "dataDevolucao": "2036-02-03T10:00:00",
+        "clienteId": primeira.json()["id"],
+        "carroId": carro_id,
+        "localizacaoRetiradaId": loc,
+        "localizacaoDevolucaoId": loc,
+    }
+
+    async def repetir():
+        async with httpx.AsyncClient(app=app, base_url="http://testserver") as cliente_async:
+            return await asyncio.gather(*(
+                cliente_async.post("/reservas/", json=reserva, headers={"Idempotency-Key": f"reserva-{sufixo}"})
+                for _ in range(10)
+            ))
+
+    respostas = asyncio.run(repetir())
+    assert {resposta.status_code for resposta in respostas} == {201}
+    assert len({resposta.json()["id"] for resposta in respostas}) == 1
+    assert sum(resposta.headers.get("Idempotent-Replayed") == "true" for resposta in respostas) == 9
+    assert len(client.get(f"/reservas/carro/{carro_id}").json()) == 1
+
+    # Outro worker (outra instância, só o banco em comum) já reservou a chave: a
+    # requisição espera a resposta dele em vez de executar o handler
+    outro_worker = Idempotencia(ttl=60, espera=5, fabrica=TestingAsyncSessionLocal)
+    chave_cliente = f"reserva-worker-{sufixo}"
+    chave = Idempotencia.chave("/reservas/", chave_cliente)
+    corpo = json.dumps({**reserva, "dataRetirada": "2036-03-01T10:00:00", "dataDevolucao": "2036-03-03T10:00:00"})
+
+    async def worker_concorrente():
+        assert await outro_worker.reservar(chave, hashlib.sha256(corpo.encode()).hexdigest())
+        async with httpx.AsyncClient(app=app, base_url="http://testserver") as cliente_async:
+            requisicao = asyncio.create_task(cliente_async.post(
+                "/reservas/", content=corpo,
+                headers={"Idempotency-Key": chave_cliente, "Content-Type": "application/json"},
+            ))
+            await asyncio.sleep(0.2)
+            assert not requisicao.done()
+            await outro_worker.guardar(chave, 201, [(b"content-type", b"application/json")], b'{"id": -1}')
+            return await requisicao
+
+    resposta = asyncio.run(worker_concorrente())
+    assert resposta.status_code == 201
+    assert resposta.json() == {"id": -1}
+    assert resposta.headers["Idempotent-Replayed"] == "true"
+    assert len(client.get(f"/reservas/carro/{carro_id}").json()) == 1
+
+def test_calendario_do_carro():
+    loc = criar_localizacao()
+    cliente_id = criar_cliente()
+    carro_id = criar_carro(loc)
+    base = datetime(2036, 12, 31, 10)
+    ids = []
+    for inicio, fim in ((1, 3), (3, 5), (10, 12), (20, 22), (28, 35)):
+        resp = client.post(
+            "/reservas/",
+            json={
+                "dataRetirada": (base + timedelta(days=inicio)).isoformat(),
+                "dataDevolucao": (base + timedelta(days=fim)).isoformat(),
+                "clienteId": cliente_id,
+                "carroId": carro_id,
+                "localizacaoRetiradaId": loc,
+                "localizacaoDevolucaoId": loc,
+            },
+        )
+        ids.append(resp.json()["id"])
+    client.patch(f"/reservas/{ids[2]}/confirmar")
+    client.patch(f"/reservas/{ids[3]}/cancelar")
+
+    resp = client.get(f"/carros/{carro_id}/calendario", params={"de": "2037-01-01T00:00:00", "ate": "2037-01-30T00:00:00"})
+    assert resp.status_code == 200
+    # Reservas encostadas unidas, cancelada fora e a última recortada no fim do período
+    assert resp.json()["ocupados"] == [
+        {"inicio": "2037-01-01T10:00:00", "fim": "2037-01-05T10:00:00"},
+        {"inicio": "2037-01-10T10:00:00", "fim": "2037-01-12T10:00:00"},
+        {"inicio": "2037-01-28T10:00:00", "fim": "2037-01-30T00:00:00"},
+    ]
+    assert client.get(f"/carros/{carro_id}/calendario").json()["ocupados"] == []
+    assert client.get("/carros/999999/calendario").status_code == 404
+    resp = client.get(f"/carros/{carro_id}/calendario", params={"de": "2037-01-01T00:00:00", "ate": "2038-06-01T00:00:00"})
+    assert resp.status_code == 400
+
+    # Datas com fuso são convertidas para a hora local das colunas (sem 500)
+    resp = client.get(f"/carros/{carro_id}/calendario", params={"de": "2037-01-01T00:00:00Z"})
+    assert resp.status_code == 200
+    local = datetime(2037, 1, 1, tzinfo=UTC).astimezone().replace(tzinfo=None)
+    assert resp.json()["de"] == local.isoformat()
@@ -1,14 +1,109 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 
+from .config import settings
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max iguais ao custo configurado: hashes com outro custo são refeitos no login (needs_update)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+
+class PasswordHasher:
+    '''Pool dedicado e limitado para o bcrypt, fora do event loop e do threadpool do Starlette
+
+    Quando há mais de max_pendentes operações (em execução + na fila) a requisição
+    é recusada com 503, em vez de acumular latência para todos os endpoints.
+    '''
+
+    def __init__(self, workers: int, max_pendentes: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.max_pendentes = max_pendentes
+        self.pendentes = 0
+        self.em_execucao = 0
+        self.concluidas = 0
+        self.rejeitadas = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.duracao_total = 0.0
+
+    def _executar(self, enviado_em: float, func, *args):
+        inicio = time.perf_counter()
+        with self._lock:
+            espera = inicio - enviado_em
+            self.espera_total += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+            self.em_execucao += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.em_execucao -= 1
+                self.concluidas += 1
+                self.duracao_total += time.perf_counter() - inicio
+
+    async def run(self, func, *args):
+        '''Executa func(*args) no pool e aguarda o resultado sem bloquear o event loop'''
+        with self._lock:
+            if self.pendentes >= self.max_pendentes:
+                self.rejeitadas += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Serviço de autenticação sobrecarregado, tente novamente",
+                    headers={"Retry-After": "1"},
+                )
+            self.pendentes += 1
+        try:
+            futuro = self._executor.submit(self._executar, time.perf_counter(), func, *args)
+        except BaseException:
+            self._liberar()
+            raise
+        # A pendência só sai quando o job termina (ou é cancelado ainda na fila), mesmo que
+        # a requisição que o aguarda seja cancelada antes
+        futuro.add_done_callback(self._liberar)
+        return await asyncio.wrap_future(futuro)
+
+    def _liberar(self, _futuro=None) -> None:
+        with self._lock:
+            self.pendentes -= 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "maxPendentes": self.max_pendentes,
+                "emExecucao": self.em_execucao,
+                "naFila": self.pendentes - self.em_execucao,
+                "concluidas": self.concluidas,
+                "rejeitadas": self.rejeitadas,
+                "esperaMediaMs": round(self.espera_total / self.concluidas * 1000, 3) if self.concluidas else 0.0,
+                "esperaMaximaMs": round(self.espera_maxima * 1000, 3),
+                "duracaoMediaMs": round(self.duracao_total / self.concluidas * 1000, 3) if self.concluidas else 0.0,
+            }
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_pending)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def hash_password(password: str) -> str:
+    '''Gera o hash bcrypt no pool dedicado'''
+    return await password_hasher.run(pwd_context.hash, password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    '''Verifica a senha no pool dedicado; retorna um novo hash se o atual usa outro custo'''
+    return await password_hasher.run(pwd_context.verify_and_update, plain_password, hashed_password)
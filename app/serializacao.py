@@ -0,0 +1,58 @@
+'''Serialização das listagens direto para bytes JSON com TypeAdapter do Pydantic v2
+
+O caminho padrão valida cada linha com from_orm, o FastAPI valida a lista de novo
+contra o response_model e o json da stdlib serializa o resultado. Aqui a lista de
+objetos ORM (ou Rows com as mesmas colunas) é validada uma única vez e convertida
+em JSON pelo pydantic-core. Como a rota retorna uma Response pronta, o FastAPI
+não a valida novamente. O response_model continua no decorator e documenta o
+schema no OpenAPI.
+'''
+
+from functools import lru_cache
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy import Row
+
+MEDIA_TYPE = "application/json"
+
+
+@lru_cache
+def adaptador_lista(schema: type) -> TypeAdapter:
+    '''TypeAdapter(list[schema]); montar o validador é caro, então ele é reutilizado'''
+    return TypeAdapter(list[schema])
+
+
+def _atributos(objeto):
+    '''Colunas já carregadas de um objeto ORM (ou de uma Row) como dict
+
+    Ler o __dict__ evita o descritor instrumentado do SQLAlchemy em cada campo. Objetos
+    com atributos expirados seguem por from_attributes, que dispara o refresh.
+    '''
+    if isinstance(objeto, Row):
+        return objeto._asdict()
+    estado = getattr(objeto, "_sa_instance_state", None)
+    if estado is not None and not estado.expired_attributes:
+        return objeto.__dict__
+    return objeto
+
+
+def serializar_lista(schema: type, objetos) -> bytes:
+    '''Valida os objetos uma única vez e gera o JSON em uma passada do pydantic-core'''
+    adaptador = adaptador_lista(schema)
+    valores = adaptador.validate_python([_atributos(objeto) for objeto in objetos], from_attributes=True)
+    return adaptador.dump_json(valores)
+
+
+def resposta_lista(schema: type, objetos, response: Response | None = None) -> Response:
+    '''Response JSON da listagem, com os headers já definidos na response da rota
+
+    Headers gravados por dependências (ETag) ou pela paginação (X-Next-Cursor) no
+    parâmetro response não são copiados pelo FastAPI quando a rota retorna uma
+    Response, por isso são repassados aqui.
+    '''
+    return Response(
+        content=serializar_lista(schema, objetos),
+        media_type=MEDIA_TYPE,
+        headers=dict(response.headers) if response is not None else None,
+    )
@@ -0,0 +1,75 @@
+'''Tarefas periódicas executadas em segundo plano junto com a API'''
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class TarefaPeriodica:
+    '''Executa uma função síncrona a cada intervalo segundos no threadpool
+
+    Iniciada/parada nos eventos de startup/shutdown da aplicação. Falhas são
+    registradas e não interrompem as execuções seguintes. O atraso é quanto cada
+    execução começou depois do horário previsto (event loop ou threadpool ocupados).
+    '''
+
+    def __init__(self, nome: str, intervalo: float, funcao: Callable[[], object]):
+        self.nome = nome
+        self.intervalo = intervalo
+        self.funcao = funcao
+        self._task: asyncio.Task | None = None
+        self.execucoes = 0
+        self.falhas = 0
+        self.ultima_execucao: float | None = None
+        self.ultima_duracao = 0.0
+        self.ultimo_atraso = 0.0
+        self.maior_atraso = 0.0
+        self.ultimo_resultado: object = None
+
+    async def _loop(self) -> None:
+        while True:
+            previsto = time.perf_counter() + self.intervalo
+            await asyncio.sleep(self.intervalo)
+            inicio = time.perf_counter()
+            try:
+                self.ultimo_resultado = await run_in_threadpool(self.funcao)
+            except Exception:
+                self.falhas += 1
+                logger.exception("Falha na tarefa periódica %s", self.nome)
+            self.execucoes += 1
+            self.ultima_execucao = time.time()
+            self.ultima_duracao = time.perf_counter() - inicio
+            self.ultimo_atraso = max(inicio - previsto, 0.0)
+            self.maior_atraso = max(self.maior_atraso, self.ultimo_atraso)
+
+    def iniciar(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop(), name=self.nome)
+
+    async def parar(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "nome": self.nome,
+            "intervalo": self.intervalo,
+            "ativa": self._task is not None,
+            "execucoes": self.execucoes,
+            "falhas": self.falhas,
+            "ultimaExecucao": self.ultima_execucao,
+            "ultimaDuracaoMs": round(self.ultima_duracao * 1000, 3),
+            "ultimoAtrasoMs": round(self.ultimo_atraso * 1000, 3),
+            "maiorAtrasoMs": round(self.maior_atraso * 1000, 3),
+            "ultimoResultado": self.ultimo_resultado,
+        }
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""Script para recalcular as tabelas de agregados a partir do histórico"""
+
+from app.avaliacoes.repository import AvaliacoesRepository
+from app.database import SessionLocal
+from app.reservas.rollups import RollupsService
+
+
+def backfill():
+    """Recria os agregados diários de reservas e os resumos de avaliações
+
+    As tabelas vêm das migrações (`alembic upgrade head`, revisão 0007).
+    """
+    with SessionLocal() as db:
+        print("Recalculando receita e ocupação diárias...")
+        lidas = RollupsService.reconstruir(db)
+        print(f"{lidas} reservas confirmadas/concluídas processadas")
+        print("Recalculando resumos de avaliações por carro...")
+        AvaliacoesRepository.reconstruir_resumos(db)
+    print("Agregados recalculados com sucesso!")
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Benchmark da serialização das listagens: from_orm + response_model vs TypeAdapter.dump_json
+
+Uso:
+    python benchmarks/serializacao.py --linhas 10000 --repeticoes 10
+
+Os objetos ORM são montados em memória (sem banco) para medir só a serialização.
+"antes" reproduz o caminho antigo das rotas: from_orm por linha, validação da
+lista contra o response_model pelo FastAPI e JSONResponse (json da stdlib).
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app.carros.schema import CarrosResponse  # noqa: E402
+from app.model.model import Carros, Reserva, StatusCarro, StatusReserva  # noqa: E402
+from app.reservas.schema import ReservaResponse  # noqa: E402
+from app.serializacao import resposta_lista  # noqa: E402
+
+
+def carros(linhas: int) -> list[Carros]:
+    agora = datetime(2025, 1, 1)
+    return [
+        Carros(
+            id=i, placa=f"P{i:07d}", marca="Toyota", modelo=f"Modelo {i % 97}", ano=2020, cor="Branco",
+            precoDia=100.0 + i % 200, categoria="Sedan", status=StatusCarro.DISPONIVEL,
+            descricao="Carro econômico e confiável", disponivel=True, destaque=i % 50 == 0,
+            localizacaoId=i % 10 + 1, criadoEm=agora, atualizadoEm=agora,
+        )
+        for i in range(1, linhas + 1)
+    ]
+
+
+def reservas(linhas: int) -> list[Reserva]:
+    agora = datetime(2025, 1, 1)
+    return [
+        Reserva(
+            id=i, dataRetirada=agora + timedelta(hours=i), dataDevolucao=agora + timedelta(hours=i + 72),
+            valorTotal=450.0, status=StatusReserva.CONFIRMADA, clienteId=i % 500 + 1, carroId=i % 1000 + 1,
+            localizacaoRetiradaId=1, localizacaoDevolucaoId=2, criadoEm=agora, atualizadoEm=agora,
+        )
+        for i in range(1, linhas + 1)
+    ]
+
+
+def antes(schema, objetos) -> bytes:
+    campo = create_response_field(name="Response", type_=list[schema])
+    conteudo = [schema.from_orm(objeto) for objeto in objetos]
+    dados = asyncio.run(serialize_response(field=campo, response_content=conteudo, is_coroutine=True))
+    return JSONResponse(dados).body
+
+
+def depois(schema, objetos) -> bytes:
+    return resposta_lista(schema, objetos).body
+
+
+def medir(funcao, schema, objetos, repeticoes: int) -> float:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(schema, objetos)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=10000)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    for nome, schema, objetos in (
+        ("/carros/", CarrosResponse, carros(args.linhas)),
+        ("/reservas/", ReservaResponse, reservas(args.linhas)),
+    ):
+        # Os dois caminhos devem produzir o mesmo documento JSON
+        assert json.loads(antes(schema, objetos)) == json.loads(depois(schema, objetos))
+        tempo_antes = medir(antes, schema, objetos, args.repeticoes)
+        tempo_depois = medir(depois, schema, objetos, args.repeticoes)
+        print(
+            f"{nome} ({args.linhas} linhas): {tempo_antes:.1f} ms -> {tempo_depois:.1f} ms "
+            f"({tempo_antes / tempo_depois:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,45 @@
 #!/usr/bin/env python3
 """Script para inicializar o banco de dados"""
 
+from pathlib import Path
+
+from sqlalchemy import inspect
 from sqlalchemy.schema import CreateTable
 
 import app.model.model as models
-from app.database import engine
+from alembic import command
+from alembic.config import Config
+from app.avaliacoes.repository import AvaliacoesRepository
+from app.database import SessionLocal, engine
+from app.reservas.rollups import RollupsService
+
+RAIZ = Path(__file__).resolve().parent
 
 
 def init_database():
-    """Cria todas as tabelas no banco de dados"""
-    print("Criando tabelas no banco de dados...")
-    models.Base.metadata.create_all(bind=engine)
+    """Cria as tabelas em um banco vazio ou aplica as migrações pendentes em um existente
+
+    O esquema é do Alembic: create_all só monta um banco vazio já na versão head (e o
+    marca assim); bancos existentes evoluem apenas por `alembic upgrade head`.
+    """
+    alembic_cfg = Config(str(RAIZ / "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", str(RAIZ / "alembic"))
+    inspetor = inspect(engine)
+    if inspetor.has_table("alembic_version") or inspetor.has_table("carros"):
+        print("Aplicando migrações pendentes...")
+        if not inspetor.has_table("alembic_version"):
+            # Banco criado antes do Alembic
+            command.stamp(alembic_cfg, "0001")
+        command.upgrade(alembic_cfg, "head")
+    else:
+        print("Criando tabelas no banco de dados...")
+        models.Base.metadata.create_all(bind=engine)
+        command.stamp(alembic_cfg, "head")
     print("Tabelas criadas com sucesso!")
+    print("Recalculando agregados (reservas e avaliações)...")
+    with SessionLocal() as db:
+        RollupsService.reconstruir(db)
+        AvaliacoesRepository.reconstruir_resumos(db)
     print("Gerando modelo físico do banco em model_fisico.sql...")
     ddl_statements = []
     for table in models.Base.metadata.sorted_tables:
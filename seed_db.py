@@ -14,7 +14,7 @@ from app.model.model import (
     Reserva,
     StatusReserva,
 )
-from app.security import get_password_hash
+from app.security import pwd_context
 
 
 def seed():
@@ -44,7 +44,7 @@ def seed():
                 admin = Admin(
                     nome="Admin Principal",
                     email="admin@ceva.com",
-                    senha=get_password_hash("admin123"),
+                    senha=pwd_context.hash("admin123"),
                     telefone="61999990000",
                     tipo="admin",
                     cargo="Gerente"
@@ -115,7 +115,7 @@ def seed():
                 cli1 = Cliente(
                     nome="João da Silva",
                     email="joao@example.com",
-                    senha=get_password_hash("cliente123"),
+                    senha=pwd_context.hash("cliente123"),
                     telefone="61988887777",
                     tipo="cliente",
                     cnh="01234567890",
@@ -129,7 +129,7 @@ def seed():
                 cli2 = Cliente(
                     nome="Maria Oliveira",
                     email="maria@example.com",
-                    senha=get_password_hash("cliente123"),
+                    senha=pwd_context.hash("cliente123"),
                     telefone="61977776666",
                     tipo="cliente",
                     cnh="09876543210",